@@ -0,0 +1 @@
+# Makes benchmarks a package
@@ -0,0 +1,73 @@
+"""
+Memory saved vs recall lost for compressed VectorStore index types.
+For each type: serialized index size, recall@k against exact search, and recall@k after
+re-scoring rescore_factor * k candidates with the exact vectors (VectorStore(rescore=True)).
+
+    python -m benchmarks.bench_compression --index data/faiss.index --k 10 --rescore-factor 4
+"""
+import argparse
+import time
+import numpy as np
+import faiss
+
+from storage.index_factory import build_index, train_index
+from storage.exact_vectors import rescore_batch
+from benchmarks.bench_index import load_vectors, recall_at_k
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", "--index", dest="vectors", default="data/faiss.index")
+    parser.add_argument("--types", default="flat,fp16,sq8,ivf_pq")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    parser.add_argument("--nlist", type=int, default=8)
+    parser.add_argument("--pq-m", type=int, default=48)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vectors = load_vectors(args.vectors)
+    order = np.random.default_rng(args.seed).permutation(len(vectors))
+    queries = np.ascontiguousarray(vectors[order[:args.queries]])
+    base = np.ascontiguousarray(vectors[order[args.queries:]])
+    print(f"Corpus: {len(base)} vectors of dimension {base.shape[1]}, {len(queries)} held-out queries, k={args.k}")
+
+    flat = build_index(base.shape[1], "flat")
+    flat.add(base)
+    _, truth = flat.search(queries, args.k)
+    flat_bytes = len(faiss.serialize_index(flat))
+
+    def lookup(ids):
+        found = ids >= 0
+        return found, base[np.where(found, ids, 0)]
+
+    print(f"{'type':<8} {'bytes/vec':>10} {'memory':>8} {'recall@' + str(args.k):>10} {'+rescore':>9} {'p50 ms':>8} {'p50 ms +rescore':>16}")
+    for index_type in args.types.split(","):
+        index = build_index(base.shape[1], index_type, nlist=args.nlist, pq_m=args.pq_m)
+        train_index(index, base)
+        index.add(base)
+        if index_type.startswith("ivf"):
+            faiss.extract_index_ivf(index).nprobe = args.nlist
+        size = len(faiss.serialize_index(index))
+
+        plain_ms, rescored_ms = [], []
+        plain = np.empty_like(truth)
+        rescored = np.empty_like(truth)
+        for i, query in enumerate(queries):
+            query = query.reshape(1, -1)
+            start = time.perf_counter()
+            _, I = index.search(query, args.k)
+            plain_ms.append((time.perf_counter() - start) * 1000)
+            plain[i] = I[0]
+            start = time.perf_counter()
+            _, candidates = index.search(query, args.k * args.rescore_factor)
+            _, I = rescore_batch(query, candidates, lookup, args.k)
+            rescored_ms.append((time.perf_counter() - start) * 1000)
+            rescored[i] = I[0]
+
+        print(f"{index_type:<8} {size / len(base):>10.1f} {size / flat_bytes:>7.0%} "
+              f"{recall_at_k(plain, truth):>10.3f} {recall_at_k(rescored, truth):>9.3f} "
+              f"{np.percentile(plain_ms, 50):>8.3f} {np.percentile(rescored_ms, 50):>16.3f}")
+
+if __name__ == "__main__":
+    main()
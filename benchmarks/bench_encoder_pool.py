@@ -0,0 +1,62 @@
+"""
+Bulk encoding throughput of EncoderPool as the number of worker processes grows,
+against a single in-process SentenceTransformer.encode call using all cores.
+
+Texts are abstracts from data/faiss_meta.json, repeated until --texts are available.
+Pool start-up (model load in every worker) is reported separately from encoding time.
+
+    python -m benchmarks.bench_encoder_pool --workers 1,2,4,8,16,32 --texts 20000
+"""
+import argparse
+import json
+import os
+import time
+from itertools import cycle, islice
+
+from embeddings.encoder_pool import EncoderPool
+
+def load_texts(path: str, count: int):
+    with open(path, "r", encoding="utf-8") as f:
+        abstracts = [p["abstract"] for p in json.load(f) if p.get("abstract")]
+    return list(islice(cycle(abstracts), count))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--metadata", default="data/faiss_meta.json")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--texts", type=int, default=5000)
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--skip-baseline", action="store_true")
+    args = parser.parse_args()
+
+    texts = load_texts(args.metadata, args.texts)
+    print(f"{len(texts)} texts, model {args.model}, {os.cpu_count()} CPUs")
+    print(f"{'mode':<12} {'workers':>7} {'start s':>8} {'texts/s':>9} {'speedup':>8}")
+
+    baseline = None
+    if not args.skip_baseline:
+        from sentence_transformers import SentenceTransformer
+        start = time.perf_counter()
+        model = SentenceTransformer(args.model)
+        load_s = time.perf_counter() - start
+        start = time.perf_counter()
+        model.encode(texts, batch_size=args.batch_size, show_progress_bar=False)
+        baseline = len(texts) / (time.perf_counter() - start)
+        print(f"{'in-process':<12} {'-':>7} {load_s:>8.2f} {baseline:>9.1f} {1.0:>8.2f}")
+
+    for workers in (int(w) for w in args.workers.split(",")):
+        start = time.perf_counter()
+        with EncoderPool(args.model, workers=workers, batch_size=args.batch_size,
+                         threads_per_worker=args.threads_per_worker) as pool:
+            pool.encode(texts[:workers * args.batch_size])  # wait until every worker has loaded the model
+            start_s = time.perf_counter() - start
+            start = time.perf_counter()
+            pool.encode(texts)
+            rate = len(texts) / (time.perf_counter() - start)
+        speedup = f"{rate / baseline:>8.2f}" if baseline else f"{'-':>8}"
+        print(f"{'pool':<12} {workers:>7} {start_s:>8.2f} {rate:>9.1f} {speedup}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Query latency of the in-process CSR graph (GraphIndex) on a synthetic citation / co-authorship graph.
+Topics are few and large on purpose (hub topics are what make the Neo4j topic self-join expensive).
+
+    python -m benchmarks.bench_graph --papers 100000 --citations 10 --authors 5
+"""
+import argparse
+import random
+import time
+import numpy as np
+
+from storage.graph_index import GraphIndex
+
+def synthetic(n_papers: int, n_citations: int, n_authors: int, n_topics: int, seed: int = 0):
+    rng = random.Random(seed)
+    author_pool = max(n_papers // 2, 1)
+    papers = [{
+        'arxiv_id': f'p{i}', 'title': f'Paper {i}', 'abstract': '', 'publication_date': '2024-01-01',
+        'primary_category': f't{i % n_topics}',
+        'categories': [f't{rng.randrange(n_topics)}' for _ in range(2)],
+        'authors': [{'full_name': f'Author {rng.randrange(author_pool)}'} for _ in range(n_authors)]
+    } for i in range(n_papers)]
+    citations = [(f'p{i}', f'p{rng.randrange(i)}') for i in range(1, n_papers) for _ in range(n_citations)]
+    return papers, citations
+
+def timed(fn, args_list):
+    latencies = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--papers", type=int, default=100000)
+    parser.add_argument("--citations", type=int, default=10, help="Citations per paper")
+    parser.add_argument("--authors", type=int, default=5, help="Authors per paper")
+    parser.add_argument("--topics", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    papers, citations = synthetic(args.papers, args.citations, args.authors, args.topics)
+    start = time.perf_counter()
+    index = GraphIndex.build(papers, citations)
+    build_s = time.perf_counter() - start
+    start = time.perf_counter()
+    index.ingest([dict(papers[0], arxiv_id='new')], [('new', 'p1'), ('p2', 'new')])
+    refresh_s = time.perf_counter() - start
+    print(f"{len(index)} papers, {len(index.cites.indices)} citations, {len(index.authors)} authors; "
+          f"build {build_s:.2f}s, refresh {refresh_s:.2f}s")
+
+    rng = random.Random(1)
+    ids = [(f'p{rng.randrange(args.papers)}',) for _ in range(args.queries)]
+    names = [(index.authors[rng.randrange(len(index.authors))],) for _ in range(args.queries)]
+    print(f"{'query':<24} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, fn, queries in (
+        ("related_papers(depth 2)", index.related_papers, ids),
+        ("collaborators", index.collaborators, names),
+        ("neighbourhood(k=2)", lambda pid: index.neighbourhood(pid, k=2, limit=50), ids),
+    ):
+        latencies = timed(fn, queries)
+        print(f"{name:<24} {np.percentile(latencies, 50):>8.3f} {np.percentile(latencies, 99):>8.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Neo4j ingestion throughput of per-paper add_paper calls against batched add_papers / add_citations.
+Uses synthetic papers (authors, affiliations and categories per paper as set below) so it runs on an empty database;
+point it at a scratch instance, the papers are written under the 'bench-' arxiv_id prefix.
+
+    python -m benchmarks.bench_graph_ingest --papers 2000 --batch-size 1000
+"""
+import argparse
+import random
+import time
+
+from storage.knowledge_graph import KnowledgeGraph
+
+def synthetic_papers(n: int, authors: int, seed: int = 0):
+    rng = random.Random(seed)
+    for i in range(n):
+        yield {
+            'arxiv_id': f'bench-{i}',
+            'title': f'Synthetic paper {i}',
+            'abstract': 'Synthetic abstract.',
+            'publication_date': f'2024-{i % 12 + 1:02d}-01',
+            'primary_category': 'cs.IR',
+            'categories': rng.sample(['cs.IR', 'cs.CL', 'cs.LG', 'cs.AI', 'stat.ML'], 2),
+            'authors': [{'full_name': f'Bench Author {rng.randrange(n * 2)}', 'affiliation': f'Bench Institute {rng.randrange(50)}'}
+                        for _ in range(authors)]
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri")
+    parser.add_argument("--user")
+    parser.add_argument("--password")
+    parser.add_argument("--papers", type=int, default=2000)
+    parser.add_argument("--authors", type=int, default=10, help="Authors per paper")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--single", type=int, default=200, help="Papers written one add_paper call at a time")
+    args = parser.parse_args()
+
+    graph = KnowledgeGraph(args.uri, args.user, args.password, batch_size=args.batch_size)
+    try:
+        start = time.perf_counter()
+        for paper in synthetic_papers(args.single, args.authors, seed=1):
+            graph.add_paper(paper)
+        single_rate = args.single / (time.perf_counter() - start)
+
+        batched = graph.add_papers(synthetic_papers(args.papers, args.authors))
+        rng = random.Random(2)
+        citations = ((f'bench-{i}', f'bench-{rng.randrange(args.papers)}') for i in range(args.papers) for _ in range(5))
+        cited = graph.add_citations(citations)
+
+        print(f"{args.authors} authors per paper, batch size {args.batch_size}")
+        print(f"{'add_paper':<14} {single_rate:>10.0f} papers/s")
+        print(f"{'add_papers':<14} {batched['per_second']:>10.0f} papers/s ({batched['batches']} transactions)")
+        print(f"{'add_citations':<14} {cited['per_second']:>10.0f} citations/s ({cited['batches']} transactions)")
+    finally:
+        graph.close()
+
+if __name__ == "__main__":
+    main()
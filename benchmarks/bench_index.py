@@ -0,0 +1,107 @@
+"""
+Compare approximate FAISS index types against the exact flat baseline.
+Reports recall@k (overlap with flat top-k) and per-query p50/p99 latency.
+
+Vectors are read from an existing flat index (default: data/faiss.index) or a .npy file.
+A held-out slice is used as queries so no embedding model is needed.
+
+    python -m benchmarks.bench_index --types flat,ivf_flat,ivf_pq,hnsw --nprobe 1,4,16 --ef-search 16,64
+"""
+import argparse
+import time
+from typing import List, Dict, Any
+import numpy as np
+import faiss
+
+from storage.index_factory import INDEX_TYPES, build_index, train_index, set_search_params
+
+def load_vectors(path: str) -> np.ndarray:
+    if path.endswith(".npy"):
+        return np.load(path).astype("float32")
+    index = faiss.read_index(path)
+    return index.reconstruct_n(0, index.ntotal)
+
+def time_queries(index: faiss.Index, queries: np.ndarray, k: int):
+    latencies = []
+    labels = np.empty((len(queries), k), dtype="int64")
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, I = index.search(query.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        labels[i] = I[0]
+    return labels, np.array(latencies)
+
+def recall_at_k(labels: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(row[row >= 0]) & set(ref)) for row, ref in zip(labels, truth))
+    return hits / truth.size
+
+def run(args) -> List[Dict[str, Any]]:
+    vectors = load_vectors(args.vectors)
+    rng = np.random.default_rng(args.seed)
+    order = rng.permutation(len(vectors))
+    queries = vectors[order[:args.queries]]
+    base = vectors[order[args.queries:]]
+    if args.repeat > 1:
+        # Grow the corpus with jittered copies to see how latency scales
+        noise = rng.normal(scale=args.jitter, size=(len(base) * (args.repeat - 1), base.shape[1]))
+        base = np.vstack([base, np.tile(base, (args.repeat - 1, 1)) + noise.astype("float32")])
+    base = np.ascontiguousarray(base, dtype="float32")
+    dimension = base.shape[1]
+    print(f"Corpus: {len(base)} vectors of dimension {dimension}, {len(queries)} queries, k={args.k}")
+
+    flat = build_index(dimension, "flat")
+    flat.add(base)
+    truth, _ = time_queries(flat, queries, args.k)
+
+    rows = []
+    for index_type in args.types.split(","):
+        start = time.perf_counter()
+        index = build_index(dimension, index_type, nlist=args.nlist, pq_m=args.pq_m,
+                            pq_nbits=args.pq_nbits, hnsw_m=args.hnsw_m)
+        train_index(index, base, sample_size=args.train_sample, seed=args.seed)
+        index.add(base)
+        build_s = time.perf_counter() - start
+        if index_type.startswith("ivf"):
+            settings = [{'nprobe': int(n)} for n in args.nprobe.split(",")]
+        elif index_type == "hnsw":
+            settings = [{'ef_search': int(e)} for e in args.ef_search.split(",")]
+        else:
+            settings = [{}]
+        for knobs in settings:
+            set_search_params(index, **knobs)
+            labels, latencies = time_queries(index, queries, args.k)
+            rows.append({
+                'type': index_type,
+                'knobs': ", ".join(f"{k}={v}" for k, v in knobs.items()) or "-",
+                'recall': recall_at_k(labels, truth),
+                'p50_ms': float(np.percentile(latencies, 50)),
+                'p99_ms': float(np.percentile(latencies, 99)),
+                'build_s': build_s
+            })
+
+    print(f"{'type':<10} {'knobs':<14} {'recall@' + str(args.k):>10} {'p50 ms':>9} {'p99 ms':>9} {'build s':>9}")
+    for row in rows:
+        print(f"{row['type']:<10} {row['knobs']:<14} {row['recall']:>10.3f} {row['p50_ms']:>9.3f} "
+              f"{row['p99_ms']:>9.3f} {row['build_s']:>9.2f}")
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", default="data/faiss.index", help="Flat FAISS index or .npy matrix to sample from")
+    parser.add_argument("--types", default=",".join(INDEX_TYPES))
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=1, help="Replicate the corpus N times with jitter")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--nlist", type=int, default=16)
+    parser.add_argument("--pq-m", type=int, default=8)
+    parser.add_argument("--pq-nbits", type=int, default=8)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--nprobe", default="1,4,16")
+    parser.add_argument("--ef-search", default="16,64,128")
+    parser.add_argument("--train-sample", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args())
+
+if __name__ == "__main__":
+    main()
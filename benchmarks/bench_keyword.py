@@ -0,0 +1,84 @@
+"""
+Keyword search latency of the in-process BM25 index against the Elasticsearch backend.
+Queries are the first words of paper titles; both backends get the same queries, fields and top_k.
+Elasticsearch is skipped if --es-host is unreachable (ingest with ingest_all_backends.py first); it is timed
+both per query and batched into _msearch requests of --batch queries (retrieve_many).
+
+    python -m benchmarks.bench_keyword --es-host http://localhost:9200 --es-index papers
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import List
+import numpy as np
+
+from retrievers.keyword_retriever import KeywordRetriever
+from storage.bm25_index import Bm25Index
+
+def time_retriever(retriever: KeywordRetriever, queries: List[str], k: int, fields: List[str]):
+    latencies, ids = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results = retriever.retrieve(query, top_k=k, fields=fields)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids.append([r["id"] for r in results])
+    return np.array(latencies), ids
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--metadata", default="data/faiss_meta.json")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--words", type=int, default=3, help="Title words per query")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--fields", default="title^3,abstract")
+    parser.add_argument("--repeat", type=int, default=1, help="Replicate the corpus N times for the BM25 index")
+    parser.add_argument("--batch", type=int, default=20, help="Queries per _msearch request")
+    parser.add_argument("--es-host", default="http://localhost:9200")
+    parser.add_argument("--es-index", default="papers")
+    args = parser.parse_args()
+
+    with open(args.metadata, "r", encoding="utf-8") as f:
+        papers = json.load(f)
+    queries = [" ".join(p["title"].split()[:args.words]) for p in papers[:args.queries]]
+    fields = args.fields.split(",")
+    corpus = [dict(p, arxiv_id=f"{p['arxiv_id']}#{r}" if r else p["arxiv_id"]) for r in range(args.repeat) for p in papers]
+
+    start = time.perf_counter()
+    index = Bm25Index.build(corpus)
+    build_s = time.perf_counter() - start
+    print(f"{len(corpus)} documents, {len(queries)} queries, k={args.k}, fields {fields}; BM25 build {build_s:.2f}s")
+
+    print(f"{'backend':<14} {'p50 ms':>8} {'p99 ms':>8} {'q/s':>8} {'overlap':>8}")
+    # Time the saved index while its directory still exists
+    with tempfile.TemporaryDirectory() as tmp:
+        index.save(os.path.join(tmp, "bm25.npz"))
+        local = KeywordRetriever(backend="bm25", bm25_path=os.path.join(tmp, "bm25.npz"))
+        bm25_lat, bm25_ids = time_retriever(local, queries, args.k, fields)
+    print(f"{'bm25':<14} {np.percentile(bm25_lat, 50):>8.3f} {np.percentile(bm25_lat, 99):>8.3f} "
+          f"{1000 / bm25_lat.mean():>8.1f} {'-':>8}")
+
+    try:
+        remote = KeywordRetriever(args.es_host, args.es_index)
+        remote.es.info()
+    except Exception as e:
+        print(f"{'elasticsearch':<14} skipped: {args.es_host} unreachable ({type(e).__name__})")
+        return
+    es_lat, es_ids = time_retriever(remote, queries, args.k, fields)
+    overlap = np.mean([len(set(a) & set(b)) / max(len(b), 1) for a, b in zip(bm25_ids, es_ids)])
+    print(f"{'elasticsearch':<14} {np.percentile(es_lat, 50):>8.3f} {np.percentile(es_lat, 99):>8.3f} "
+          f"{1000 / es_lat.mean():>8.1f} {overlap:>8.3f}")
+
+    batch_lat = []
+    for start in range(0, len(queries), args.batch):
+        batch = queries[start:start + args.batch]
+        t0 = time.perf_counter()
+        remote.retrieve_many(batch, top_k=args.k, fields=fields)
+        batch_lat.append((time.perf_counter() - t0) * 1000 / len(batch))
+    batch_lat = np.array(batch_lat)
+    print(f"{'es _msearch':<14} {np.percentile(batch_lat, 50):>8.3f} {np.percentile(batch_lat, 99):>8.3f} "
+          f"{1000 / batch_lat.mean():>8.1f} {'-':>8}  (per query, batches of {args.batch})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Query encoding latency of the PyTorch SentenceTransformer against the ONNX Runtime backend (fp32 and int8).
+Reports per-query p50/p99 latency (batch of one, as in VectorRetriever.retrieve) and batched throughput.
+
+Queries are paper titles from data/faiss_meta.json. Export the model first:
+
+    python -m embeddings.onnx_backend export all-MiniLM-L6-v2 data/onnx/all-MiniLM-L6-v2
+    python -m benchmarks.bench_onnx --onnx-dir data/onnx/all-MiniLM-L6-v2 --threads 1
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+
+from embeddings.onnx_backend import OnnxEncoder, QUANTIZED_MODEL_FILE
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--onnx-dir", required=True)
+    parser.add_argument("--model", help="PyTorch model to compare against (default: the exported model)")
+    parser.add_argument("--metadata", default="data/faiss_meta.json")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=0, help="Intra-op threads for both backends (0 = library default)")
+    args = parser.parse_args()
+
+    with open(args.metadata, "r", encoding="utf-8") as f:
+        queries = [p["title"] for p in json.load(f) if p.get("title")][:args.queries]
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    encoders = {}
+    fp32 = OnnxEncoder(args.onnx_dir, quantized=False, threads=args.threads or None)
+    encoders["torch"] = SentenceTransformer(args.model or fp32.config["model_name"], device="cpu")
+    encoders["onnx"] = fp32
+    if os.path.exists(os.path.join(args.onnx_dir, QUANTIZED_MODEL_FILE)):
+        encoders["onnx-int8"] = OnnxEncoder(args.onnx_dir, quantized=True, threads=args.threads or None)
+    print(f"{len(queries)} queries, batch size {args.batch_size}, threads {args.threads or 'default'}")
+
+    print(f"{'backend':<10} {'p50 ms':>8} {'p99 ms':>8} {'batched q/s':>12}")
+    for name, encoder in encoders.items():
+        encoder.encode(queries[:4])  # warm up
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            encoder.encode([query])
+            latencies.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        encoder.encode(queries, batch_size=args.batch_size)
+        throughput = len(queries) / (time.perf_counter() - start)
+        print(f"{name:<10} {np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 99):>8.2f} {throughput:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Query throughput of ShardedVectorStore as the shard count grows on one host.
+Each configuration runs single-query calls from concurrent clients and batched calls,
+and checks that the merged top-k matches an unsharded flat search.
+
+Vectors come from an existing flat index (default: data/faiss.index) or a .npy file, and a
+held-out slice serves as queries, so no embedding model is needed.
+
+    python -m benchmarks.bench_shards --shards 1,2,4,8 --executors thread,process --repeat 20
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import faiss
+
+from storage.index_factory import build_index
+from storage.metadata_store import arxiv_key
+from storage.sharded_store import ShardedVectorStore
+from benchmarks.bench_index import load_vectors, recall_at_k
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", default="data/faiss.index", help="Flat FAISS index or .npy matrix to sample from")
+    parser.add_argument("--shards", default="1,2,4,8")
+    parser.add_argument("--executors", default="thread,process")
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent callers issuing single queries")
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=1, help="Replicate the corpus N times with jitter")
+    parser.add_argument("--omp-threads", type=int, default=1,
+                        help="FAISS OpenMP threads per search; 1 leaves the parallelism to the shards")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(args.omp_threads)
+    os.environ["OMP_NUM_THREADS"] = str(args.omp_threads)  # inherited by worker processes
+    vectors = load_vectors(args.vectors)
+    rng = np.random.default_rng(args.seed)
+    order = rng.permutation(len(vectors))
+    queries = np.ascontiguousarray(vectors[order[:args.queries]])
+    base = vectors[order[args.queries:]]
+    if args.repeat > 1:
+        noise = rng.normal(scale=0.01, size=(len(base) * (args.repeat - 1), base.shape[1]))
+        base = np.vstack([base, np.tile(base, (args.repeat - 1, 1)) + noise.astype("float32")])
+    base = np.ascontiguousarray(base, dtype="float32")
+    records = [{'arxiv_id': f"bench.{i}"} for i in range(len(base))]
+    print(f"Corpus: {len(base)} vectors of dimension {base.shape[1]}, {len(queries)} queries, k={args.k}, "
+          f"{os.cpu_count()} CPUs")
+
+    flat = build_index(base.shape[1], "flat")
+    flat.add(base)
+    _, truth = flat.search(queries, args.k)
+
+    print(f"{'executor':<9} {'shards':>6} {'single q/s':>11} {'batch q/s':>10} {'recall@' + str(args.k):>10}")
+    for executor in args.executors.split(","):
+        for n_shards in (int(n) for n in args.shards.split(",")):
+            with tempfile.TemporaryDirectory() as tmp:
+                store = ShardedVectorStore(tmp, n_shards=n_shards, executor=executor, dimension=base.shape[1],
+                                           index_type=args.index_type)
+                store.upsert_embeddings(base, records)
+                store.save()
+                # Map keys back to corpus rows to compare with the flat baseline
+                row_of = {arxiv_key(r['arxiv_id']): row for row, r in enumerate(records)}
+                store.search_vectors(queries[:1], args.k)  # start workers
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=args.clients) as clients:
+                    list(clients.map(lambda q: store.search_vectors(q.reshape(1, -1), args.k), queries))
+                single_qps = len(queries) / (time.perf_counter() - start)
+
+                start = time.perf_counter()
+                labels = []
+                for i in range(0, len(queries), args.batch):
+                    _, keys, _ = store.search_vectors(queries[i:i + args.batch], args.k)
+                    labels.append(np.vectorize(lambda key: row_of.get(int(key), -1))(keys))
+                batch_qps = len(queries) / (time.perf_counter() - start)
+
+                recall = recall_at_k(np.vstack(labels), truth)
+                print(f"{executor:<9} {n_shards:>6} {single_qps:>11.1f} {batch_qps:>10.1f} {recall:>10.3f}")
+                store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Measure VectorRetriever startup in fresh interpreters, the way a uvicorn worker or cli.py pays it.
+
+    eager:      faiss.read_index copy + SentenceTransformer loaded at construction (previous behaviour)
+    lazy+mmap:  index memory-mapped, model deferred until the first query
+
+    python -m benchmarks.bench_startup --index data/faiss.index --runs 5
+"""
+import argparse
+import json
+import subprocess
+import sys
+import numpy as np
+
+_PROBE = r'''
+import json, resource, sys, time
+start = time.perf_counter()
+from retrievers.vector_retriever import VectorRetriever
+imported = time.perf_counter()
+retriever = VectorRetriever(sys.argv[1], mmap=sys.argv[2] == "mmap")
+error = None
+if sys.argv[3] == "eager":
+    try:
+        retriever.model
+    except Exception as e:
+        error = type(e).__name__
+ready = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - start,
+    "construct_s": ready - imported,
+    "total_s": ready - start,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "model_error": error,
+}))
+'''
+
+MODES = {
+    'eager': ("memory", "eager"),
+    'lazy+mmap': ("mmap", "lazy"),
+}
+
+def measure(index_path: str, mode: str, runs: int):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _PROBE, index_path, *MODES[mode]],
+                             capture_output=True, text=True, check=True)
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", default="data/faiss.index")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    print(f"{'mode':<10} {'total s (median)':>17} {'construct s':>12} {'max RSS MB':>11}  note")
+    for mode in MODES:
+        samples = measure(args.index, mode, args.runs)
+        errors = {s['model_error'] for s in samples if s['model_error']}
+        note = f"model load failed: {', '.join(errors)}" if errors else ""
+        print(f"{mode:<10} {np.median([s['total_s'] for s in samples]):>17.3f} "
+              f"{np.median([s['construct_s'] for s in samples]):>12.4f} "
+              f"{np.median([s['max_rss_mb'] for s in samples]):>11.1f}  {note}")
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,280 @@
 # build_arxiv_faiss.py
 """
-Automate the full arXiv-to-FAISS pipeline:
-1. Download arXiv metadata (title, abstract, arxiv_id) for a given query/category.
-2. Generate embeddings for abstracts using Sentence Transformers.
-3. Build and save a FAISS index and metadata file.
+Automate the full arXiv-to-FAISS pipeline as a streaming, resumable build:
+1. Fetch arXiv metadata (title, abstract, arxiv_id, categories, date) for a query, or read a local JSONL file.
+2. Encode abstracts batch by batch with Sentence Transformers and add them to the FAISS index.
+3. Checkpoint the partial index and metadata periodically; an interrupted run resumes where it stopped.
+4. Write the final index, metadata (JSON + columnar) and facet bitsets.
+
+    python build_arxiv_faiss.py --query "cat:cs.AI" --max-results 500
+    python build_arxiv_faiss.py --source papers.jsonl --index-type ivf_flat --nlist 1024
 """
-import arxiv
+import argparse
 import json
 import os
+import shutil
+from itertools import islice
+from typing import Dict, Any, List, Iterable, Iterator, Optional
 import numpy as np
 from sentence_transformers import SentenceTransformer
 import faiss
+from storage.metadata_store import write_metadata_store
+from storage.index_factory import INDEX_TYPES, build_index, train_index, set_search_params
+from storage.facets import FacetIndex
+from embeddings.encoder_pool import EncoderPool, batched
+from embeddings.doc_cache import DocumentEmbeddingCache
 
-# --- Config ---
-QUERY = "cat:cs.AI"  # Change to your desired arXiv category or query
-MAX_RESULTS = 500     # Number of papers to fetch
+# --- Defaults ---
+QUERY = "cat:cs.AI"  # Change with --query to target another arXiv category or query
+MAX_RESULTS = 500     # Number of papers to fetch (--max-results)
 DATA_DIR = "data"
-INDEX_PATH = os.path.join(DATA_DIR, "faiss.index")
-META_PATH = os.path.join(DATA_DIR, "faiss_meta.json")
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+INDEX_TYPE = "flat"   # flat, ivf_flat, ivf_pq or hnsw (see `python -m benchmarks.bench_index`)
+NLIST = 16            # IVF cells (ivf_flat, ivf_pq); needs at least this many papers to train
+PQ_M = 8              # PQ sub-vectors (ivf_pq); must divide the embedding dimension
+NPROBE = 4            # IVF cells visited per query, stored in the index
+EF_SEARCH = 64        # HNSW search beam width, stored in the index
 
-os.makedirs(DATA_DIR, exist_ok=True)
-
-print(f"[1/3] Downloading arXiv papers for query: {QUERY} (max {MAX_RESULTS})...")
-search = arxiv.Search(query=QUERY, max_results=MAX_RESULTS)
-papers = []
-for result in search.results():
-    papers.append({
+def paper_record(result) -> Dict[str, Any]:
+    """Metadata record for an arxiv.Result."""
+    return {
         "arxiv_id": result.get_short_id(),
         "title": result.title,
-        "abstract": result.summary.replace("\n", " ").strip()
+        "abstract": result.summary.replace("\n", " ").strip(),
+        "primary_category": result.primary_category,
+        "categories": list(result.categories),
+        "publication_date": result.published.date().isoformat() if result.published else None
+    }
+
+def fetch_arxiv(query: str, max_results: int, offset: int = 0) -> Iterator[Dict[str, Any]]:
+    """Stream papers from the arXiv API, starting after the first offset results."""
+    import arxiv
+    search = arxiv.Search(query=query, max_results=max_results)
+    if hasattr(arxiv, "Client"):
+        results = arxiv.Client(page_size=100, num_retries=5).results(search, offset=offset)
+    else:
+        # arxiv < 2.0 has no offset; skipped results are still downloaded
+        results = islice(search.results(), offset, None)
+    for result in results:
+        yield paper_record(result)
+
+def read_jsonl(path: str, max_results: Optional[int] = None, offset: int = 0) -> Iterator[Dict[str, Any]]:
+    """Stream papers from a JSONL file with one metadata record per line (offline source and fixtures)."""
+    with open(path, "r", encoding="utf-8") as f:
+        lines = (line for line in f if line.strip())
+        for line in islice(lines, offset, max_results):
+            yield json.loads(line)
+
+class BuildCheckpoint:
+    def __init__(self, work_dir: str, settings: Dict[str, Any]):
+        """
+        Partial build state in work_dir. The index file is the commit point: records.jsonl may run ahead of it
+        after a crash and is cut back to index.ntotal lines on resume.
+        Each line also stores the source position after its paper, so the source resumes from the last kept one.
+        settings: Build options that must match for a run to resume (source, model, index type)
+        """
+        self.work_dir = work_dir
+        self.index_path = os.path.join(work_dir, "index.partial")
+        self.records_path = os.path.join(work_dir, "records.jsonl")
+        self.settings_path = os.path.join(work_dir, "settings.json")
+        self.settings = settings
+
+    def exists(self) -> bool:
+        return os.path.exists(self.settings_path)
+
+    def start(self) -> None:
+        os.makedirs(self.work_dir, exist_ok=True)
+        with open(self.settings_path, "w", encoding="utf-8") as f:
+            json.dump(self.settings, f, indent=2)
+        open(self.records_path, "w").close()
+
+    def resume(self):
+        """Return (index or None, papers kept, source position) and truncate records.jsonl to match the index."""
+        with open(self.settings_path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved != self.settings:
+            raise ValueError(f"Checkpoint in {self.work_dir} was made with {saved}; "
+                             f"rerun with the same options or pass --restart")
+        if not os.path.exists(self.index_path):
+            open(self.records_path, "w").close()
+            return None, 0, 0
+        index = faiss.read_index(self.index_path)
+        position = 0
+        with open(self.records_path, "rb+") as f:
+            for _ in range(index.ntotal):
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    raise ValueError(f"{self.records_path} has fewer records than the checkpointed index")
+                position = json.loads(line)["source_position"]
+            f.truncate(f.tell())
+        return index, index.ntotal, position
+
+    def append(self, records_file, papers: List[Dict[str, Any]], positions: List[int]) -> None:
+        for paper, position in zip(papers, positions):
+            records_file.write(json.dumps({"source_position": position, "paper": paper}, ensure_ascii=False) + "\n")
+
+    def save(self, index: faiss.Index, records_file) -> None:
+        # Records first, then the index: records.jsonl must never be behind the committed index
+        records_file.flush()
+        os.fsync(records_file.fileno())
+        tmp_path = f"{self.index_path}.tmp"
+        faiss.write_index(index, tmp_path)
+        os.replace(tmp_path, self.index_path)
+
+    def papers(self) -> Iterator[Dict[str, Any]]:
+        with open(self.records_path, "r", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)["paper"]
+
+    def clear(self) -> None:
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+def write_json_array(path: str, records: Iterable[Dict[str, Any]]) -> None:
+    """Stream records into a JSON array file without holding them in memory."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for i, record in enumerate(records):
+            f.write(("," if i else "") + "\n  " + json.dumps(record, ensure_ascii=False))
+        f.write("\n]\n")
+    os.replace(tmp_path, path)
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--query", default=QUERY, help="arXiv search query")
+    parser.add_argument("--max-results", type=int, default=MAX_RESULTS, help="Number of papers to index")
+    parser.add_argument("--source", help="Read papers from this JSONL file instead of the arXiv API")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--model", default=EMBEDDING_MODEL, help="SentenceTransformer model name")
+    parser.add_argument("--index-type", default=INDEX_TYPE, choices=INDEX_TYPES)
+    parser.add_argument("--nlist", type=int, default=NLIST)
+    parser.add_argument("--pq-m", type=int, default=PQ_M)
+    parser.add_argument("--nprobe", type=int, default=NPROBE)
+    parser.add_argument("--ef-search", type=int, default=EF_SEARCH)
+    parser.add_argument("--train-size", type=int, default=20000,
+                        help="Vectors buffered to train IVF/PQ/SQ indexes before the first add")
+    parser.add_argument("--batch-size", type=int, default=256, help="Papers encoded and added per step")
+    parser.add_argument("--checkpoint-every", type=int, default=20, help="Batches between checkpoints")
+    parser.add_argument("--encode-workers", type=int, default=0,
+                        help="Encode in this many worker processes (0 encodes in-process); use a --batch-size "
+                             "several times workers x 64 to keep them busy")
+    parser.add_argument("--embedding-cache", help="Content-addressed embedding cache directory "
+                                                  "(default: <data-dir>/embedding_cache)")
+    parser.add_argument("--no-embedding-cache", action="store_true", help="Encode every abstract again")
+    parser.add_argument("--restart", action="store_true", help="Discard an existing checkpoint and start over")
+    return parser.parse_args(argv)
+
+def build(args: argparse.Namespace, model=None) -> int:
+    """Run the pipeline and return the number of papers indexed. model may be an EncoderPool."""
+    os.makedirs(args.data_dir, exist_ok=True)
+    index_path = os.path.join(args.data_dir, "faiss.index")
+    meta_path = os.path.join(args.data_dir, "faiss_meta.json")
+    columnar_meta_path = os.path.join(args.data_dir, "faiss_meta.cmeta")
+    checkpoint = BuildCheckpoint(os.path.join(args.data_dir, ".build"), {
+        "source": args.source or args.query, "model": args.model, "index_type": args.index_type,
+        "nlist": args.nlist, "pq_m": args.pq_m
     })
-print(f"Downloaded {len(papers)} papers.")
-
-print("[2/3] Generating embeddings for abstracts...")
-model = SentenceTransformer(EMBEDDING_MODEL)
-abstracts = [p["abstract"] for p in papers]
-embeddings = model.encode(abstracts, show_progress_bar=True)
-embeddings = np.array(embeddings, dtype="float32")
-
-print("[3/3] Building and saving FAISS index and metadata...")
-index = faiss.IndexFlatL2(embeddings.shape[1])
-index.add(embeddings)
-faiss.write_index(index, INDEX_PATH)
-with open(META_PATH, "w", encoding="utf-8") as f:
-    json.dump(papers, f, indent=2, ensure_ascii=False)
-
-print(f"Done! FAISS index: {INDEX_PATH}\nMetadata: {META_PATH}\nPapers indexed: {len(papers)}")
+
+    index, count, position = None, 0, 0
+    if checkpoint.exists() and not args.restart:
+        index, count, position = checkpoint.resume()
+        print(f"Resuming from checkpoint: {count} papers indexed, source position {position}")
+    else:
+        checkpoint.clear()
+        checkpoint.start()
+
+    model = model or SentenceTransformer(args.model)
+    if index is None:
+        index = build_index(model.get_sentence_embedding_dimension(), args.index_type, nlist=args.nlist, pq_m=args.pq_m)
+    set_search_params(index, nprobe=args.nprobe, ef_search=args.ef_search)
+    # Unchanged abstracts are looked up instead of re-encoded
+    doc_cache = None
+    if not args.no_embedding_cache:
+        doc_cache = DocumentEmbeddingCache(args.embedding_cache or os.path.join(args.data_dir, "embedding_cache"))
+
+    if args.source:
+        print(f"[1/3] Reading papers from {args.source} (max {args.max_results})...")
+        source = read_jsonl(args.source, args.max_results, offset=position)
+    else:
+        print(f"[1/3] Fetching arXiv papers for query: {args.query} (max {args.max_results})...")
+        source = fetch_arxiv(args.query, args.max_results, offset=position)
+
+    print(f"[2/3] Encoding and indexing in batches of {args.batch_size}...")
+    # Untrained index types buffer vectors until there are enough to train on; nothing is checkpointed meanwhile
+    pending_vectors: List[np.ndarray] = []
+    pending_papers: List[Dict[str, Any]] = []
+    pending_positions: List[int] = []
+    batches_since_checkpoint = 0
+
+    with open(checkpoint.records_path, "a", encoding="utf-8") as records_file:
+        def add(vectors, papers, positions):
+            nonlocal count
+            index.add(vectors)
+            checkpoint.append(records_file, papers, positions)
+            count += len(papers)
+
+        def flush_pending():
+            if pending_papers:
+                vectors = np.vstack(pending_vectors)
+                train_index(index, vectors, sample_size=args.train_size)
+                add(vectors, list(pending_papers), list(pending_positions))
+                pending_vectors.clear()
+                pending_papers.clear()
+                pending_positions.clear()
+
+        for batch in batched(source, args.batch_size):
+            positions = list(range(position + 1, position + len(batch) + 1))
+            position += len(batch)
+            kept = [(paper, pos) for paper, pos in zip(batch, positions) if paper.get("abstract")]
+            if not kept:
+                continue
+            papers = [paper for paper, _ in kept]
+            abstracts = [p["abstract"] for p in papers]
+            if doc_cache is not None:
+                vectors = doc_cache.encode(model, args.model, abstracts)
+            else:
+                vectors = np.array(model.encode(abstracts, show_progress_bar=False), dtype="float32")
+            if index.is_trained:
+                add(vectors, papers, [pos for _, pos in kept])
+            else:
+                pending_vectors.append(vectors)
+                pending_papers.extend(papers)
+                pending_positions.extend(pos for _, pos in kept)
+                if len(pending_papers) < args.train_size:
+                    continue
+                flush_pending()
+            batches_since_checkpoint += 1
+            if batches_since_checkpoint >= args.checkpoint_every:
+                checkpoint.save(index, records_file)
+                batches_since_checkpoint = 0
+                print(f"  checkpoint: {count} papers indexed")
+        flush_pending()
+        checkpoint.save(index, records_file)
+    print(f"Indexed {count} papers.")
+    if doc_cache is not None:
+        stats = doc_cache.stats()
+        print(f"Embedding cache: {stats['hits']} reused, {stats['misses']} encoded "
+              f"({stats['hit_rate']:.1%} hit rate), {stats['entries']} entries in {doc_cache.path}")
+
+    print("[3/3] Writing FAISS index, metadata and facets...")
+    tmp_index_path = f"{index_path}.tmp"
+    faiss.write_index(index, tmp_index_path)
+    os.replace(tmp_index_path, index_path)
+    write_json_array(meta_path, checkpoint.papers())
+    write_metadata_store(columnar_meta_path, checkpoint.papers())
+    FacetIndex.build(checkpoint.papers()).save(index_path + ".facets.npz")
+    checkpoint.clear()
+
+    print(f"Done! FAISS index: {index_path}\nMetadata: {meta_path}, {columnar_meta_path}\nPapers indexed: {count}")
+    return count
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.encode_workers:
+        with EncoderPool(args.model, workers=args.encode_workers) as pool:
+            build(args, model=pool)
+    else:
+        build(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Makes embeddings a package
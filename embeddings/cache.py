@@ -0,0 +1,204 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    def __init__(self,
+                 max_size: int = 10000,
+                 ttl: Optional[float] = None,
+                 disk_path: Optional[str] = None):
+        """
+        Bounded cache of query embeddings keyed by model name plus normalized text.
+        max_size: Maximum number of entries kept in memory (least recently used are evicted first)
+        ttl: Optional time-to-live in seconds for an entry, applied to both tiers
+        disk_path: Optional SQLite file used as a persistent second tier
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.disk_path = disk_path
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (created, vector)
+        self._lock = threading.RLock()
+        self._db = None
+        if disk_path:
+            self._open_disk(disk_path)
+
+    def _open_disk(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vector BLOB NOT NULL, created REAL NOT NULL)"
+        )
+        self._db.commit()
+        self.prune()
+        logger.info(f"Opened on-disk embedding cache at {path}")
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize unicode and collapse whitespace so trivially different queries share an entry."""
+        return " ".join(unicodedata.normalize("NFKC", text).split())
+
+    @classmethod
+    def make_key(cls, model_name: str, text: str) -> str:
+        return f"{model_name}\x00{cls.normalize(text)}"
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, model_name: str, text: str) -> Optional[np.ndarray]:
+        """Return the cached embedding or None, updating hit/miss counters."""
+        key = self.make_key(model_name, text)
+        with self._lock:
+            vector = self._lookup(key)
+            if vector is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return vector
+
+    def _lookup(self, key: str) -> Optional[np.ndarray]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            created, vector = entry
+            if not self._expired(created):
+                self._entries.move_to_end(key)
+                return vector
+            del self._entries[key]
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT dim, vector, created FROM embeddings WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        dim, blob, created = row
+        if self._expired(created):
+            self._db.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+            self._db.commit()
+            return None
+        vector = np.frombuffer(blob, dtype="float32").reshape(dim)
+        self.disk_hits += 1
+        self._remember(key, vector, created)
+        return vector
+
+    def put(self, model_name: str, text: str, vector: np.ndarray) -> None:
+        """Store an embedding in memory and, if configured, on disk."""
+        key = self.make_key(model_name, text)
+        vector = np.array(vector, dtype="float32").reshape(-1)
+        vector.setflags(write=False)
+        created = time.time()
+        with self._lock:
+            self._remember(key, vector, created)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, dim, vector, created) VALUES (?, ?, ?, ?)",
+                    (key, vector.shape[0], vector.tobytes(), created)
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, vector: np.ndarray, created: float) -> None:
+        self._entries[key] = (created, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def encode(self, model: Any, model_name: str, texts: List[str]) -> np.ndarray:
+        """
+        Return a float32 (len(texts), dim) matrix of embeddings for texts.
+        Cache misses are encoded together in one model.encode call and stored.
+        """
+        vectors: List[Optional[np.ndarray]] = [self.get(model_name, text) for text in texts]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = np.array(model.encode([texts[i] for i in missing])).astype("float32")
+            for i, vector in zip(missing, encoded):
+                self.put(model_name, texts[i], vector)
+                vectors[i] = vector
+        if not vectors:
+            return np.zeros((0, 0), dtype="float32")
+        return np.vstack(vectors).astype("float32")
+
+    def prune(self) -> int:
+        """Drop expired entries from both tiers. Returns the number of entries removed."""
+        if self.ttl is None:
+            return 0
+        cutoff = time.time() - self.ttl
+        removed = 0
+        with self._lock:
+            for key in [k for k, (created, _) in self._entries.items() if created < cutoff]:
+                del self._entries[key]
+                removed += 1
+            if self._db is not None:
+                removed += self._db.execute("DELETE FROM embeddings WHERE created < ?", (cutoff,)).rowcount
+                self._db.commit()
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'disk_hits': self.disk_hits,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+    def clear(self) -> None:
+        """Remove all entries from both tiers and reset counters."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+            self.hits = self.misses = self.disk_hits = self.evictions = 0
+
+    def close(self) -> None:
+        """Close the on-disk tier, if any."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+                logger.info(f"Closed on-disk embedding cache at {self.disk_path}")
+
+_default_cache: Optional[EmbeddingCache] = None
+_default_lock = threading.Lock()
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Return the process-wide embedding cache, creating it on first use.
+    Configured from EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL (seconds) and EMBEDDING_CACHE_PATH.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            ttl = os.environ.get("EMBEDDING_CACHE_TTL")
+            _default_cache = EmbeddingCache(
+                max_size=int(os.environ.get("EMBEDDING_CACHE_SIZE", "10000")),
+                ttl=float(ttl) if ttl else None,
+                disk_path=os.environ.get("EMBEDDING_CACHE_PATH") or None
+            )
+        return _default_cache
+
+def set_embedding_cache(cache: Optional[EmbeddingCache]) -> None:
+    """Replace the process-wide embedding cache (None resets it to the environment defaults)."""
+    global _default_cache
+    with _default_lock:
+        _default_cache = cache
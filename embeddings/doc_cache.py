@@ -0,0 +1,233 @@
+"""
+Content-addressed embedding cache for document (re-)indexing.
+
+    python -m embeddings.doc_cache stats data/embedding_cache
+    python -m embeddings.doc_cache gc data/embedding_cache data/faiss_meta.json --model all-MiniLM-L6-v2
+"""
+import os
+import sys
+import json
+import hashlib
+import logging
+import argparse
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+KEY_SIZE = 16
+
+def content_key(model_name: str, text: str) -> bytes:
+    """16-byte digest of the model name and the exact text."""
+    return hashlib.blake2b(f"{model_name}\x00{text}".encode("utf-8"), digest_size=KEY_SIZE).digest()
+
+class DocumentEmbeddingCache:
+    def __init__(self, path: str, dimension: Optional[int] = None):
+        """
+        Append-only embedding cache keyed by content_key(model_name, text), so unchanged texts are never re-encoded.
+        Files: <path>/vectors.f32 (raw float32 rows, memory-mapped), <path>/keys.bin (one 16-byte key per row)
+        and <path>/info.json (dimension). Keys are sorted once on open into a hash index searched with
+        np.searchsorted; entries added since then are held in a dict. One writer at a time.
+        path: Cache directory
+        dimension: Embedding size (optional, taken from info.json or the first add)
+        """
+        self.path = path
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.keys_path = os.path.join(path, "keys.bin")
+        self.info_path = os.path.join(path, "info.json")
+        self.dimension = dimension
+        self.hits = 0
+        self.misses = 0
+        self.added = 0
+        self._lock = threading.RLock()
+        self._recent: Dict[bytes, int] = {}
+        self._sorted_keys = np.zeros(0, dtype=f"S{KEY_SIZE}")
+        self._sorted_rows = np.zeros(0, dtype="int64")
+        self._vectors: Optional[np.ndarray] = None
+        self._count = 0
+        os.makedirs(path, exist_ok=True)
+        self._open()
+
+    def _open(self) -> None:
+        if os.path.exists(self.info_path):
+            with open(self.info_path, "r", encoding="utf-8") as f:
+                stored = json.load(f)["dimension"]
+            if self.dimension is not None and self.dimension != stored:
+                raise ValueError(f"{self.path} holds {stored}-d embeddings, not {self.dimension}-d")
+            self.dimension = stored
+        if self.dimension is None or not os.path.exists(self.keys_path):
+            return
+        # A crash between the two appends leaves extra vector rows; keys are written last and decide the count
+        key_bytes = os.path.getsize(self.keys_path)
+        row_bytes = 4 * self.dimension
+        count = min(key_bytes // KEY_SIZE, os.path.getsize(self.vectors_path) // row_bytes)
+        for file_path, size in ((self.keys_path, count * KEY_SIZE), (self.vectors_path, count * row_bytes)):
+            if os.path.getsize(file_path) != size:
+                logger.warning(f"Truncating torn tail of {file_path}")
+                with open(file_path, "r+b") as f:
+                    f.truncate(size)
+        keys = np.fromfile(self.keys_path, dtype=f"S{KEY_SIZE}", count=count)
+        order = np.argsort(keys, kind="stable")
+        self._sorted_keys = keys[order]
+        self._sorted_rows = order.astype("int64")
+        self._count = count
+        self._remap()
+        logger.info(f"Opened document embedding cache {self.path} with {count} entries")
+
+    def _remap(self) -> None:
+        self._vectors = (np.memmap(self.vectors_path, dtype="float32", mode="r", shape=(self._count, self.dimension))
+                         if self._count else None)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _rows(self, keys: List[bytes]) -> np.ndarray:
+        """Row of each key, -1 if absent. Duplicate keys map to the latest appended row."""
+        rows = np.full(len(keys), -1, dtype="int64")
+        if len(self._sorted_keys) and keys:
+            wanted = np.array(keys, dtype=f"S{KEY_SIZE}")
+            # side='right' - 1 picks the last of equal keys, which is the latest row thanks to the stable sort
+            pos = np.searchsorted(self._sorted_keys, wanted, side="right") - 1
+            hit = (pos >= 0) & (self._sorted_keys[np.maximum(pos, 0)] == wanted)
+            rows[hit] = self._sorted_rows[pos[hit]]
+        for i, key in enumerate(keys):
+            recent = self._recent.get(key)
+            if recent is not None:
+                rows[i] = recent
+        return rows
+
+    def lookup(self, model_name: str, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (found mask, vectors); rows of texts not cached are zero."""
+        with self._lock:
+            rows = self._rows([content_key(model_name, text) for text in texts])
+            found = rows >= 0
+            vectors = np.zeros((len(texts), self.dimension or 0), dtype="float32")
+            if found.any():
+                if self._vectors is None or rows.max() >= len(self._vectors):
+                    self._remap()
+                vectors[found] = self._vectors[rows[found]]
+            return found, vectors
+
+    def add(self, model_name: str, texts: List[str], vectors: np.ndarray) -> None:
+        """Append embeddings for texts."""
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if not len(texts):
+            return
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+            if not os.path.exists(self.info_path):
+                with open(self.info_path, "w", encoding="utf-8") as f:
+                    json.dump({"dimension": self.dimension}, f)
+            if vectors.shape[1] != self.dimension:
+                raise ValueError(f"Expected {self.dimension}-d embeddings, got {vectors.shape[1]}-d")
+            keys = [content_key(model_name, text) for text in texts]
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self.keys_path, "ab") as f:
+                f.write(b"".join(keys))
+            for key in keys:
+                self._recent[key] = self._count
+                self._count += 1
+            self.added += len(keys)
+
+    def encode(self, model: Any, model_name: str, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        """
+        Return a float32 (len(texts), dim) matrix, encoding only texts that are not cached yet.
+        model may be a SentenceTransformer or an EncoderPool.
+        """
+        found, vectors = self.lookup(model_name, texts)
+        self.hits += int(found.sum())
+        missing = np.flatnonzero(~found)
+        self.misses += len(missing)
+        if len(missing):
+            # Encode each distinct missing text once
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            encoded = np.asarray(model.encode(unique, show_progress_bar=show_progress_bar), dtype="float32")
+            self.add(model_name, unique, encoded)
+            if vectors.shape[1] != encoded.shape[1]:
+                # The cache was empty, so nothing was found and the dimension was unknown
+                vectors = np.zeros((len(texts), encoded.shape[1]), dtype="float32")
+            by_text = dict(zip(unique, encoded))
+            for i in missing:
+                vectors[i] = by_text[texts[i]]
+        return vectors
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': self._count,
+                'hits': self.hits,
+                'misses': self.misses,
+                'added': self.added,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'bytes': (os.path.getsize(self.vectors_path) + os.path.getsize(self.keys_path)
+                          if os.path.exists(self.keys_path) else 0)
+            }
+
+    def gc(self, model_name: str, texts: Iterable[str]) -> int:
+        """
+        Rewrite the cache keeping only the latest entry for each of texts under model_name.
+        Returns the number of entries removed.
+        """
+        with self._lock:
+            keep = list(dict.fromkeys(content_key(model_name, text) for text in texts))
+            rows = self._rows(keep)
+            keep = [key for key, row in zip(keep, rows) if row >= 0]
+            rows = rows[rows >= 0]
+            removed = self._count - len(rows)
+            if self._vectors is None or (len(rows) and rows.max() >= len(self._vectors)):
+                self._remap()
+            # Keep surviving rows in their original order
+            order = np.argsort(rows, kind="stable")
+            rows = rows[order]
+            tmp_vectors = f"{self.vectors_path}.tmp"
+            tmp_keys = f"{self.keys_path}.tmp"
+            with open(tmp_vectors, "wb") as f:
+                for start in range(0, len(rows), 65536):
+                    f.write(np.ascontiguousarray(self._vectors[rows[start:start + 65536]]).tobytes())
+            with open(tmp_keys, "wb") as f:
+                f.write(b"".join(keep[i] for i in order))
+            self._vectors = None
+            os.replace(tmp_vectors, self.vectors_path)
+            os.replace(tmp_keys, self.keys_path)
+            self._recent = {}
+            self._open()
+            logger.info(f"Garbage-collected {removed} unreferenced embeddings from {self.path}")
+            return removed
+
+    def close(self) -> None:
+        with self._lock:
+            self._vectors = None
+
+def _metadata_texts(path: str, field: str) -> Iterable[str]:
+    from storage.metadata_store import MetadataStore, load_legacy_metadata
+    records = MetadataStore(path) if path.endswith(".cmeta") else load_legacy_metadata(path)
+    for record in records:
+        if record and record.get(field):
+            yield record[field]
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    stats_parser = commands.add_parser("stats", help="Show entry count and size")
+    stats_parser.add_argument("cache")
+    gc = commands.add_parser("gc", help="Drop embeddings of texts no longer in the metadata")
+    gc.add_argument("cache")
+    gc.add_argument("metadata", nargs="+", help="Metadata files (.cmeta, .json or .pkl) whose texts are kept")
+    gc.add_argument("--model", default="all-MiniLM-L6-v2", help="Model name the kept embeddings were made with")
+    gc.add_argument("--field", default="abstract", help="Metadata field that was embedded")
+    args = parser.parse_args(argv)
+
+    cache = DocumentEmbeddingCache(args.cache)
+    if args.command == "gc":
+        texts = (text for path in args.metadata for text in _metadata_texts(path, args.field))
+        removed = cache.gc(args.model, texts)
+        print(f"Removed {removed} unreferenced embeddings, {len(cache)} kept")
+    stats = cache.stats()
+    print(f"{stats['entries']} entries, {stats['bytes'] / 2**20:.1f} MiB in {args.cache}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,144 @@
+import os
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Model loaded once per worker process by _init_worker
+_worker_model = None
+
+def _load_sentence_transformer(model_name: str):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+def _init_worker(model_name: str, model_factory: Callable[[str], Any], threads_per_worker: int) -> None:
+    global _worker_model
+    # Set before torch is imported so each worker stays on its share of the cores
+    os.environ["OMP_NUM_THREADS"] = str(threads_per_worker)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+    _worker_model = model_factory(model_name)
+
+def _encode_batch(texts: List[str]) -> np.ndarray:
+    return np.asarray(_worker_model.encode(texts, show_progress_bar=False), dtype="float32")
+
+def _dimension() -> int:
+    return _worker_model.get_sentence_embedding_dimension()
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Lists of up to size consecutive items."""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+class EncoderPool:
+    def __init__(self,
+                 model_name: str = 'all-MiniLM-L6-v2',
+                 workers: Optional[int] = None,
+                 batch_size: int = 64,
+                 chunk_size: int = 1024,
+                 threads_per_worker: int = 1,
+                 model_factory: Optional[Callable[[str], Any]] = None):
+        """
+        Pool of worker processes that each load the embedding model once and encode batches for bulk ingestion.
+        Results come back in input order. The pool is reused across calls until close().
+        model_name: SentenceTransformer model name
+        workers: Number of worker processes (optional, defaults to cpu_count // threads_per_worker)
+        batch_size: Texts per task sent to a worker
+        chunk_size: Rows per array yielded by encode_stream()
+        threads_per_worker: Torch/OpenMP threads inside each worker
+        model_factory: Picklable callable building the model from model_name (optional, defaults to SentenceTransformer)
+        """
+        self.model_name = model_name
+        self.workers = workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        # Enough queued batches to keep every worker busy without reading the whole input ahead
+        self.max_pending = self.workers * 2
+        self._dimension: Optional[int] = None
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, model_factory or _load_sentence_transformer, threads_per_worker)
+        )
+        logger.info(f"Started encoder pool with {self.workers} workers for {model_name}")
+
+    def encode_stream(self, texts: Iterable[str], chunk_size: Optional[int] = None) -> Iterator[np.ndarray]:
+        """Encode texts lazily, yielding float32 arrays of chunk_size rows (the last may be shorter) in input order."""
+        if self._executor is None:
+            raise RuntimeError("EncoderPool is closed")
+        chunk_size = chunk_size or self.chunk_size
+        pending = deque()
+        ready: List[np.ndarray] = []
+        ready_rows = 0
+
+        def collect():
+            nonlocal ready_rows
+            vectors = pending.popleft().result()
+            ready.append(vectors)
+            ready_rows += len(vectors)
+
+        def take(rows: int) -> np.ndarray:
+            nonlocal ready, ready_rows
+            merged = np.vstack(ready)
+            ready = [merged[rows:]] if rows < len(merged) else []
+            ready_rows = len(merged) - rows
+            return merged[:rows]
+
+        for batch in batched(texts, self.batch_size):
+            pending.append(self._executor.submit(_encode_batch, batch))
+            while len(pending) >= self.max_pending:
+                collect()
+                while ready_rows >= chunk_size:
+                    yield take(chunk_size)
+        while pending:
+            collect()
+            while ready_rows >= chunk_size:
+                yield take(chunk_size)
+        if ready_rows:
+            yield take(ready_rows)
+
+    def encode(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        """Drop-in for model.encode: a float32 (len(texts), dim) matrix."""
+        chunks = list(self.encode_stream(texts))
+        if not chunks:
+            return np.zeros((0, self.dimension), dtype="float32")
+        return np.vstack(chunks)
+
+    @property
+    def dimension(self) -> int:
+        """Embedding size, asked from a worker once."""
+        if self._dimension is None:
+            if self._executor is None:
+                raise RuntimeError("EncoderPool is closed")
+            self._dimension = self._executor.submit(_dimension).result()
+        return self._dimension
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def close(self) -> None:
+        """Stop the workers, cancelling batches that have not started."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            logger.info("Encoder pool shut down")
+
+    def __enter__(self) -> "EncoderPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
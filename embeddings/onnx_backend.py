@@ -0,0 +1,197 @@
+"""
+ONNX Runtime backend for SentenceTransformer query encoding on CPU.
+
+    python -m embeddings.onnx_backend export all-MiniLM-L6-v2 data/onnx/all-MiniLM-L6-v2
+    python -m embeddings.onnx_backend parity data/onnx/all-MiniLM-L6-v2 --index data/faiss.index
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx")
+CONFIG_FILE = "onnx_config.json"
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model.int8.onnx"
+
+def export_onnx(model_name: str, output_dir: str, quantize: bool = True, opset: int = 14) -> str:
+    """
+    Export the transformer of a SentenceTransformer to ONNX, plus its tokenizer and pooling settings.
+    With quantize=True an int8 dynamically quantized copy is written next to the fp32 model.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer, models
+
+    st = SentenceTransformer(model_name, device="cpu")
+    transformer = st[0]
+    pooling = next((m for m in st if isinstance(m, models.Pooling)), None)
+    if pooling is None or not (pooling.pooling_mode_mean_tokens or pooling.pooling_mode_cls_token):
+        raise ValueError(f"{model_name} uses a pooling mode the ONNX backend does not implement")
+    tokenizer = transformer.tokenizer
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids")
+                   if name in tokenizer.model_input_names]
+
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs)))[0]
+
+    os.makedirs(output_dir, exist_ok=True)
+    sample = tokenizer(["an example query", "a"], padding=True, return_tensors="pt")
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+    with torch.no_grad():
+        torch.onnx.export(LastHiddenState(transformer.auto_model.eval()), tuple(sample[n] for n in input_names),
+                          model_path, input_names=input_names, output_names=["last_hidden_state"],
+                          dynamic_axes=axes, opset_version=opset, dynamo=False)
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(model_path, os.path.join(output_dir, QUANTIZED_MODEL_FILE), weight_type=QuantType.QInt8)
+
+    tokenizer.save_pretrained(output_dir)
+    config = {
+        'model_name': model_name,
+        'dimension': st.get_sentence_embedding_dimension(),
+        'max_seq_length': st.max_seq_length,
+        'pooling': 'mean' if pooling.pooling_mode_mean_tokens else 'cls',
+        'normalize': any(isinstance(m, models.Normalize) for m in st),
+        'input_names': input_names,
+        'pad_token': tokenizer.pad_token,
+        'pad_token_id': tokenizer.pad_token_id
+    }
+    with open(os.path.join(output_dir, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    logger.info(f"Exported {model_name} to {output_dir}" + (" (fp32 + int8)" if quantize else ""))
+    return output_dir
+
+class OnnxEncoder:
+    def __init__(self, model_dir: str, quantized: bool = True, threads: Optional[int] = None):
+        """
+        SentenceTransformer-compatible encoder running an exported model with ONNX Runtime.
+        model_dir: Directory written by export_onnx()
+        quantized: Use the int8 model if it was exported
+        threads: ONNX Runtime intra-op threads (optional, defaults to all cores)
+        """
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, CONFIG_FILE), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        model_file = QUANTIZED_MODEL_FILE if quantized else MODEL_FILE
+        if quantized and not os.path.exists(os.path.join(model_dir, model_file)):
+            logger.warning(f"No int8 model in {model_dir}, using fp32")
+            model_file = MODEL_FILE
+        self.variant = "onnx-int8" if model_file == QUANTIZED_MODEL_FILE else "onnx"
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(os.path.join(model_dir, model_file), options,
+                                                    providers=["CPUExecutionProvider"])
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.config['max_seq_length'])
+        self.tokenizer.enable_padding(pad_id=self.config['pad_token_id'] or 0, pad_token=self.config['pad_token'] or "[PAD]")
+        logger.info(f"Loaded {self.variant} encoder from {model_dir}")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config['dimension']
+
+    def encode(self, texts: List[str], batch_size: int = 32, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        """Return a float32 (len(texts), dim) matrix, pooled and normalized like the source SentenceTransformer."""
+        if isinstance(texts, str):
+            texts = [texts]
+        out = np.zeros((len(texts), self.config['dimension']), dtype="float32")
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(list(texts[start:start + batch_size]))
+            columns = {
+                'input_ids': [e.ids for e in encodings],
+                'attention_mask': [e.attention_mask for e in encodings],
+                'token_type_ids': [e.type_ids for e in encodings]
+            }
+            feeds = {name: np.array(columns[name], dtype="int64") for name in self.config['input_names']}
+            hidden = self.session.run(None, feeds)[0]
+            if self.config['pooling'] == 'cls':
+                pooled = hidden[:, 0]
+            else:
+                mask = np.array(columns['attention_mask'], dtype="float32")[:, :, None]
+                pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if self.config['normalize']:
+                pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            out[start:start + len(encodings)] = pooled
+        return out
+
+def load_embedding_model(model_name: str, backend: str = "torch", onnx_dir: Optional[str] = None,
+                         quantized: bool = True) -> Any:
+    """SentenceTransformer (backend='torch') or OnnxEncoder (backend='onnx') exposing the same encode()."""
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    if backend == "onnx":
+        if not onnx_dir:
+            raise ValueError("backend='onnx' needs onnx_dir, created with `python -m embeddings.onnx_backend export`")
+        return OnnxEncoder(onnx_dir, quantized=quantized)
+    raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+
+def parity_check(reference: Any, candidate: Any, texts: List[str], index=None, k: int = 10) -> Dict[str, float]:
+    """
+    Compare two encoders on texts: per-text cosine similarity of their vectors and, given a FAISS index,
+    the mean overlap of their top-k results.
+    """
+    ref = np.asarray(reference.encode(texts), dtype="float32")
+    cand = np.asarray(candidate.encode(texts), dtype="float32")
+    cosine = (ref * cand).sum(axis=1) / np.clip(np.linalg.norm(ref, axis=1) * np.linalg.norm(cand, axis=1), 1e-12, None)
+    result = {'min_cosine': float(cosine.min()), 'mean_cosine': float(cosine.mean())}
+    if index is not None:
+        _, ref_ids = index.search(ref, k)
+        _, cand_ids = index.search(cand, k)
+        result['overlap'] = float(np.mean([len(set(a) & set(b)) / k for a, b in zip(ref_ids, cand_ids)]))
+    return result
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="Export a SentenceTransformer to ONNX (fp32 + int8)")
+    export.add_argument("model_name")
+    export.add_argument("output_dir")
+    export.add_argument("--no-quantize", action="store_true")
+    parity = commands.add_parser("parity", help="Check ONNX vectors and top-k against PyTorch")
+    parity.add_argument("onnx_dir")
+    parity.add_argument("--fp32", action="store_true", help="Check the fp32 model instead of int8")
+    parity.add_argument("--index", default="data/faiss.index")
+    parity.add_argument("--metadata", default="data/faiss_meta.json", help="Paper titles are used as queries")
+    parity.add_argument("--queries", type=int, default=200)
+    parity.add_argument("--k", type=int, default=10)
+    parity.add_argument("--min-cosine", type=float, default=0.98)
+    parity.add_argument("--min-overlap", type=float, default=0.9)
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        export_onnx(args.model_name, args.output_dir, quantize=not args.no_quantize)
+        print(f"Exported {args.model_name} to {args.output_dir}")
+        return 0
+
+    import faiss
+    from sentence_transformers import SentenceTransformer
+    candidate = OnnxEncoder(args.onnx_dir, quantized=not args.fp32)
+    reference = SentenceTransformer(candidate.config['model_name'])
+    with open(args.metadata, "r", encoding="utf-8") as f:
+        texts = [p["title"] for p in json.load(f) if p.get("title")][:args.queries]
+    result = parity_check(reference, candidate, texts, faiss.read_index(args.index), args.k)
+    print(f"{candidate.variant}: cosine min {result['min_cosine']:.4f} mean {result['mean_cosine']:.4f}, "
+          f"top-{args.k} overlap {result['overlap']:.3f} over {len(texts)} queries")
+    if result['min_cosine'] < args.min_cosine or result['overlap'] < args.min_overlap:
+        print(f"FAILED: thresholds are cosine >= {args.min_cosine}, overlap >= {args.min_overlap}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,8 +6,8 @@ import json
 import os
 from elasticsearch import Elasticsearch
 from neo4j import GraphDatabase
-import psycopg2
-from psycopg2.extras import execute_batch
+from storage.db_setup import setup_database
+from storage.pg_bulk_loader import PostgresBulkLoader
 
 # --- Config ---
 META_PATH = "data/faiss_meta.json"
@@ -46,25 +46,11 @@ print(f"Created {len(papers)} Paper nodes in Neo4j.")
 driver.close()
 
 # --- PostgreSQL Ingestion ---
-print("[3/3] Inserting papers into PostgreSQL...")
-import urllib.parse as up
-up.uses_netloc.append("postgres")
-url = up.urlparse(PG_URL)
-conn = psycopg2.connect(
-    database=url.path[1:], user=url.username, password=url.password, host=url.hostname, port=url.port
-)
-cur = conn.cursor()
-cur.execute("""
-CREATE TABLE IF NOT EXISTS papers (
-    arxiv_id TEXT PRIMARY KEY,
-    title TEXT,
-    abstract TEXT
-)
-""")
-execute_batch(cur, "INSERT INTO papers (arxiv_id, title, abstract) VALUES (%s, %s, %s) ON CONFLICT (arxiv_id) DO NOTHING", [(p["arxiv_id"], p["title"], p["abstract"]) for p in papers])
-conn.commit()
-cur.close()
-conn.close()
-print(f"Inserted {len(papers)} papers into PostgreSQL table 'papers'.")
+print("[3/3] Loading papers into PostgreSQL...")
+setup_database(PG_URL)
+stats = PostgresBulkLoader(PG_URL).load(papers)
+print(f"Loaded {stats['tables']['papers']['rows']} papers into PostgreSQL "
+      f"({stats['copy']['stage_papers']['per_second']:,.0f} rows/s COPY, "
+      f"{stats['tables']['papers']['per_second']:,.0f} rows/s upsert).")
 
 print("All backends ingested successfully!")
@@ -14,12 +14,22 @@ from synthesis import deduplicate_results, rank_results, format_for_generation
 
 # --- LangChain Retriever Wrappers ---
 class VectorLC(BaseRetriever):
+    retriever: Any
+
     def __init__(self, retriever: VectorRetriever):
-        super().__init__()
-        self.retriever = retriever
+        super().__init__(retriever=retriever)
     
     def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
         results = self.retriever.retrieve(query, top_k=5)
+        return self._to_documents(results)
+
+    def batch(self, inputs: List[str], config=None, *, return_exceptions: bool = False, **kwargs) -> List[List[Document]]:
+        # One batched encode + index search instead of one retrieve per query
+        results = self.retriever.retrieve_many(list(inputs), top_k=5)
+        return [self._to_documents(r) for r in results]
+
+    @staticmethod
+    def _to_documents(results: List[Dict[str, Any]]) -> List[Document]:
         return [Document(page_content=str(r['metadata']), metadata=r['metadata']) for r in results]
 
 class KeywordLC(BaseRetriever):
@@ -1,8 +1,9 @@
 from retrievers.vector_retriever import VectorRetriever
 from retrievers.graph_retriever import GraphRetriever
-from retrievers.database_retriever import DatabaseRetriever
+from retrievers.database_retriever import DatabaseRetriever, DatabaseKeywordSearch
 from retrievers.keyword_retriever import KeywordRetriever
 from typing import Dict, Any, List, Optional
+import asyncio
 
 class Orchestrator:
     def __init__(
@@ -15,7 +16,11 @@ class Orchestrator:
         self.vector = VectorRetriever(**vector_cfg)
         self.graph = GraphRetriever(**graph_cfg)
         self.database = DatabaseRetriever(**db_cfg)
-        self.keyword = KeywordRetriever(**keyword_cfg)
+        if keyword_cfg.get("backend") == "postgres":
+            # Keyword relevance from Postgres full-text search: no Elasticsearch needed
+            self.keyword = DatabaseKeywordSearch(self.database, source_fields=keyword_cfg.get("source_fields"))
+        else:
+            self.keyword = KeywordRetriever(**keyword_cfg)
 
     def process_query(self, query: str, query_type: Optional[str] = None, top_k: int = 5) -> Dict[str, Any]:
         """
@@ -26,11 +31,11 @@ class Orchestrator:
         # Simple rule-based routing; can be replaced with ML-based intent detection
         if query_type == "author":
             # Author lookup: use graph and database
-            results["graph"] = self.graph.retrieve(self._build_author_cypher(query))
-            results["database"] = self.database.retrieve(self._build_author_sql(query))
+            results["graph"] = self.graph.papers_by_author(self._author_name(query))
+            results["database"] = self.database.papers_by_author(self._author_name(query))
         elif query_type == "recent":
             # Recent papers: use database and keyword
-            results["database"] = self.database.retrieve(self._build_recent_sql(query))
+            results["database"] = self.database.run("recent_papers", limit=10)
             results["keyword"] = self.keyword.retrieve(query, top_k=top_k)
         else:
             # Default: semantic, keyword, and graph
@@ -39,15 +44,43 @@ class Orchestrator:
             # Optionally, graph and database for exploratory queries
         return results
 
-    def _build_author_cypher(self, query: str) -> str:
-        # Naive example: extract author name from query
-        author = query.replace("author:", "").strip()
-        return f"MATCH (a:Author)-[:AUTHORED]->(p:Paper) WHERE a.name CONTAINS '{author}' RETURN p, a"
+    async def aprocess_query(self, query: str, query_type: Optional[str] = None, top_k: int = 5) -> Dict[str, Any]:
+        """
+        Async process_query(): same routing, with the backend calls of a query awaited concurrently on the
+        async clients. Vector search is CPU-bound and runs in a worker thread.
+        """
+        calls = {}
+        if query_type == "author":
+            calls["graph"] = self.graph.apapers_by_author(self._author_name(query))
+            calls["database"] = self.database.apapers_by_author(self._author_name(query))
+        elif query_type == "recent":
+            calls["database"] = self.database.arun("recent_papers", limit=10)
+            calls["keyword"] = self.keyword.aretrieve(query, top_k=top_k)
+        else:
+            calls["vector"] = asyncio.to_thread(self.vector.retrieve, query, top_k=top_k)
+            calls["keyword"] = self.keyword.aretrieve(query, top_k=top_k)
+        return dict(zip(calls, await asyncio.gather(*calls.values())))
+
+    async def aconnect(self) -> None:
+        """Open the async backend clients in the running event loop."""
+        await asyncio.gather(self.keyword.aconnect(), self.graph.aconnect(), self.database.aconnect())
+
+    async def aclose(self) -> None:
+        await asyncio.gather(self.keyword.aclose(), self.graph.aclose(), self.database.aclose())
 
-    def _build_author_sql(self, query: str) -> str:
-        author = query.replace("author:", "").strip()
-        return f"SELECT * FROM papers p JOIN paper_authors pa ON p.id = pa.paper_id JOIN authors a ON pa.author_id = a.id WHERE a.name ILIKE '%{author}%'"
+    def process_queries(self, queries: List[str], query_type: Optional[str] = None, top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Process several queries at once. Returns one result dictionary per query, in input order.
+        Vector retrieval for default-routed queries is batched into a single encode and index search,
+        and keyword retrieval into the keyword backend's retrieve_many (one _msearch on Elasticsearch).
+        """
+        if query_type in ("author", "recent"):
+            return [self.process_query(query, query_type=query_type, top_k=top_k) for query in queries]
+        vector_results = self.vector.retrieve_many(queries, top_k=top_k)
+        keyword_results = self.keyword.retrieve_many(queries, top_k=top_k)
+        return [{"vector": vector_hits, "keyword": keyword_hits}
+                for vector_hits, keyword_hits in zip(vector_results, keyword_results)]
 
-    def _build_recent_sql(self, query: str) -> str:
-        # Example: get recent papers
-        return "SELECT * FROM papers ORDER BY date_published DESC LIMIT 10"
+    def _author_name(self, query: str) -> str:
+        # Naive example: extract author name from query
+        return query.replace("author:", "").strip()
@@ -1,17 +1,241 @@
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine import Engine
-from typing import List, Dict, Any, Optional
+import logging
+from itertools import islice
+from sqlalchemy import text
+from sqlalchemy.engine import Engine, make_url
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator
+from storage.db_setup import get_engine
+from retrievers.query_registry import QUERIES, NamedQuery
+from storage.author_names import normalize_name, escape_like
+
+logger = logging.getLogger(__name__)
+
+# Async drivers used by aretrieve() for URLs that name a sync (or no) driver
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+# Shorter patterns have no trigram to look up in the pg_trgm index; match them as name prefixes
+TRIGRAM_MIN_LENGTH = 3
+
+class RowLimitExceeded(ValueError):
+    """A query returned more rows than the retriever's max_rows; use stream() or add a LIMIT."""
+
+def async_db_url(db_url: str) -> str:
+    """The same database URL with an asyncio driver, e.g. postgresql:// -> postgresql+asyncpg://."""
+    url = make_url(db_url)
+    if url.drivername in ASYNC_DRIVERS:
+        url = url.set(drivername=ASYNC_DRIVERS[url.drivername])
+    return url.render_as_string(hide_password=False)
 
 class DatabaseRetriever:
-    def __init__(self, db_url: str):
-        self.engine: Engine = create_engine(db_url)
+    def __init__(self, db_url: str, async_url: Optional[str] = None, pool_size: Optional[int] = None,
+                 max_overflow: Optional[int] = None, max_rows: Optional[int] = 10000, stream_batch_size: int = 1000):
+        """
+        db_url: SQLAlchemy URL for the sync engine (shared process-wide, see storage.db_setup.get_engine)
+        async_url: URL for the async engine used by aretrieve (derived from db_url if not given)
+        pool_size, max_overflow: Connection pool sizes (default DB_POOL_SIZE, DB_MAX_OVERFLOW); pre-ping is on
+        max_rows: retrieve/run/aretrieve/arun raise RowLimitExceeded beyond this many rows (None: no limit)
+        stream_batch_size: Rows fetched per fetchmany() call, and per round trip from stream() cursors
+        """
+        self.engine: Engine = get_engine(db_url, pool_size=pool_size, max_overflow=max_overflow)
+        self.async_url = async_url or async_db_url(db_url)
+        self.async_engine = None
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.max_rows = max_rows
+        self.stream_batch_size = stream_batch_size
 
     def retrieve(self, sql_query: str, parameters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
         Execute a SQL query and return the results as a list of dictionaries.
+        Rows are fetched stream_batch_size at a time and at most max_rows are accepted;
+        use stream() to read large results from a server-side cursor.
+        """
+        with self.engine.connect() as conn:
+            return self._fetch_limited(conn.execute(text(sql_query), parameters or {}), sql_query)
+
+    def stream(self, sql_query: str, parameters: Optional[Dict[str, Any]] = None,
+               batch_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the rows of a SQL query as dictionaries, fetched batch_size rows at a time from a
+        server-side cursor, so memory stays flat however many rows match. The connection is
+        returned to the pool when the generator is exhausted or closed.
         """
         with self.engine.connect() as conn:
-            result = conn.execute(text(sql_query), parameters or {})
-            rows = result.fetchall()
-            keys = result.keys()
-            return [dict(zip(keys, row)) for row in rows]
+            options = conn.execution_options(stream_results=True, yield_per=batch_size or self.stream_batch_size)
+            result = options.execute(text(sql_query), parameters or {})
+            keys = list(result.keys())
+            for row in result:
+                yield dict(zip(keys, row))
+
+    def _fetch_limited(self, result, description: str) -> List[Dict[str, Any]]:
+        """Rows of an executed statement (none for statements that return no rows), guarded by max_rows."""
+        if not result.returns_rows:
+            return []
+        return self._limited(self._fetch(result), description)
+
+    def _fetch(self, result) -> Iterator[Dict[str, Any]]:
+        keys = list(result.keys())
+        while True:
+            batch = result.fetchmany(self.stream_batch_size)
+            if not batch:
+                break
+            for row in batch:
+                yield dict(zip(keys, row))
+
+    def _limited(self, rows: Iterator[Dict[str, Any]], description: str) -> List[Dict[str, Any]]:
+        """Collect rows, raising RowLimitExceeded past max_rows (closing the generator early)."""
+        if self.max_rows is None:
+            return list(rows)
+        limited = list(islice(rows, self.max_rows + 1))
+        if len(limited) > self.max_rows:
+            if hasattr(rows, "close"):
+                rows.close()
+            raise RowLimitExceeded(f"Query returned more than {self.max_rows} rows; use stream() or add a LIMIT: "
+                                   f"{' '.join(description.split())[:200]}")
+        return limited
+
+    def run(self, name: str, **parameters) -> List[Dict[str, Any]]:
+        """
+        Run the registered SQL query `name` with parameters, timed in QUERIES.stats().
+        On psycopg2 the query is PREPAREd once per pooled connection and then EXECUTEd, so Postgres
+        plans it once; other drivers send the parameterized text (asyncpg prepares and caches it itself).
+        """
+        query = QUERIES.get("sql", name)
+        with QUERIES.timed(query) as timer:
+            with self.engine.connect() as conn:
+                statement = self._prepared(conn, query) if self._prepares() else text(query.text)
+                rows = self._fetch_limited(conn.execute(statement, parameters), query.name)
+            timer.rows = len(rows)
+        return rows
+
+    def papers_by_author(self, author: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Papers of authors whose normalized name contains `author` (prefix matches first), via indexes."""
+        name, parameters = self._author_query(author, limit)
+        return self.run(name, **parameters) if name else []
+
+    def search(self, query: str, top_k: int = 5, source_fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Full-text search over title, abstract and full_text (generated tsvector column, GIN index,
+        ts_rank_cd ranking), as KeywordRetriever results: {'score', 'id', 'source'}.
+        query uses web search syntax: quoted phrases, OR, -excluded.
+        """
+        if not query.strip():
+            return []
+        return self._search_results(self.run("fulltext_papers", query=query, limit=top_k), source_fields)
+
+    @staticmethod
+    def _search_results(rows: List[Dict[str, Any]], source_fields: Optional[List[str]]) -> List[Dict[str, Any]]:
+        results = []
+        for row in rows:
+            source = {key: value for key, value in row.items() if key not in ("id", "score")}
+            if source_fields is not None:
+                source = {key: source[key] for key in source_fields if key in source}
+            results.append({"score": float(row["score"]), "id": row["arxiv_id"], "source": source})
+        return results
+
+    @staticmethod
+    def _author_query(author: str, limit: int):
+        normalized = normalize_name(author)
+        if not normalized:
+            return None, {}
+        name = "author_papers" if len(normalized) >= TRIGRAM_MIN_LENGTH else "author_papers_prefix"
+        return name, {"pattern": escape_like(normalized), "limit": limit}
+
+    def _prepares(self) -> bool:
+        return self.engine.dialect.name == "postgresql" and self.engine.dialect.driver == "psycopg2"
+
+    def _prepared(self, conn, query: NamedQuery):
+        """EXECUTE statement for query, PREPAREd first if this pooled DBAPI connection has not seen it."""
+        statement_name = f"rag_{query.name}"
+        prepared = conn.connection.info.setdefault("prepared_queries", set())
+        positional, names = query.positional()
+        if statement_name not in prepared:
+            # Without parameters, so psycopg2 leaves the '%' of LIKE patterns alone instead of reading placeholders
+            conn.execution_options(no_parameters=True).exec_driver_sql(f"PREPARE {statement_name} AS {positional}")
+            prepared.add(statement_name)
+        arguments = ", ".join(f":{name}" for name in names)
+        return text(f"EXECUTE {statement_name}({arguments})" if names else f"EXECUTE {statement_name}")
+
+    async def aconnect(self) -> None:
+        """Create the async engine and its connection pool (e.g. at app startup)."""
+        if self.async_engine is None:
+            from sqlalchemy.ext.asyncio import create_async_engine
+            kwargs = {"pool_pre_ping": True}
+            url = make_url(self.async_url)
+            if url.get_backend_name() != "sqlite":
+                kwargs.update({k: v for k, v in (("pool_size", self.pool_size), ("max_overflow", self.max_overflow))
+                               if v is not None})
+            self.async_engine = create_async_engine(self.async_url, **kwargs)
+
+    async def aclose(self) -> None:
+        if self.async_engine is not None:
+            await self.async_engine.dispose()
+            self.async_engine = None
+
+    async def aretrieve(self, sql_query: str, parameters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Async retrieve() on the SQLAlchemy async engine, with the same max_rows guard.
+        """
+        await self.aconnect()
+        async with self.async_engine.connect() as conn:
+            result = await conn.execute(text(sql_query), parameters or {})
+            return self._fetch_limited(result, sql_query)
+
+    async def astream(self, sql_query: str, parameters: Optional[Dict[str, Any]] = None,
+                      batch_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Async stream() over a server-side cursor of the async engine."""
+        await self.aconnect()
+        async with self.async_engine.connect() as conn:
+            result = await conn.stream(text(sql_query), parameters or {},
+                                       execution_options={"yield_per": batch_size or self.stream_batch_size})
+            keys = list(result.keys())
+            async for row in result:
+                yield dict(zip(keys, row))
+
+    async def arun(self, name: str, **parameters) -> List[Dict[str, Any]]:
+        """Async run() on the async engine; asyncpg prepares and caches the statement per connection."""
+        query = QUERIES.get("sql", name)
+        with QUERIES.timed(query) as timer:
+            rows = await self.aretrieve(query.text, parameters)
+            timer.rows = len(rows)
+        return rows
+
+    async def apapers_by_author(self, author: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Async papers_by_author()."""
+        name, parameters = self._author_query(author, limit)
+        return await self.arun(name, **parameters) if name else []
+
+    async def asearch(self, query: str, top_k: int = 5, source_fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Async search()."""
+        if not query.strip():
+            return []
+        return self._search_results(await self.arun("fulltext_papers", query=query, limit=top_k), source_fields)
+
+class DatabaseKeywordSearch:
+    def __init__(self, database: DatabaseRetriever, source_fields: Optional[List[str]] = None):
+        """
+        KeywordRetriever interface over DatabaseRetriever.search, for KEYWORD_BACKEND=postgres.
+        database: Retriever whose connection pools are shared (opened and closed by the orchestrator)
+        source_fields: Paper columns to return in 'source' (None returns all selected columns)
+        """
+        self.database = database
+        self.source_fields = source_fields
+
+    def retrieve(self, query: str, top_k: int = 5, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Full-text search; the tsvector always covers title, abstract and full_text, so fields is not used."""
+        return self.database.search(query, top_k=top_k, source_fields=self.source_fields)
+
+    def retrieve_many(self, queries: List[str], top_k: int = 5, fields: Optional[List[str]] = None) -> List[List[Dict[str, Any]]]:
+        return [self.retrieve(query, top_k=top_k) for query in queries]
+
+    async def aretrieve(self, query: str, top_k: int = 5, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        return await self.database.asearch(query, top_k=top_k, source_fields=self.source_fields)
+
+    async def aconnect(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
@@ -1,17 +1,146 @@
-from neo4j import GraphDatabase
+import os
+import logging
+from neo4j import GraphDatabase, AsyncGraphDatabase
 from typing import List, Dict, Any, Optional
+from storage.graph_index import GraphIndex
+from storage.author_names import normalize_name, fulltext_query
+from retrievers.query_registry import QUERIES, check_depth, depth_query
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("neo4j", "csr")
 
 class GraphRetriever:
-    def __init__(self, uri: str, user: str, password: str):
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+    def __init__(self, uri: Optional[str] = None, user: Optional[str] = None, password: Optional[str] = None,
+                 backend: str = "neo4j", graph_path: Optional[str] = None):
+        """
+        uri, user, password: Neo4j connection (backend='neo4j', or the source of the CSR graph)
+        backend: 'neo4j' or 'csr' (in-process GraphIndex, no round trips)
+        graph_path: GraphIndex file; exported from Neo4j and saved here if missing
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown graph backend '{backend}', expected one of {BACKENDS}")
+        self.backend = backend
+        self.uri = uri
+        self.auth = (user, password)
+        self.graph_path = graph_path
+        self.driver = GraphDatabase.driver(uri, auth=self.auth) if uri else None
+        self.async_driver = None
+        self.index: Optional[GraphIndex] = None
+        if backend == "csr":
+            if graph_path and os.path.exists(graph_path):
+                self.index = GraphIndex.load(graph_path)
+            elif self.driver is not None:
+                logger.info(f"Exporting graph index from {uri}")
+                self.index = GraphIndex.from_neo4j(self.driver)
+                if graph_path:
+                    self.index.save(graph_path)
+            else:
+                raise ValueError("backend='csr' needs an existing graph_path or a Neo4j uri to export from")
 
     def close(self):
-        self.driver.close()
+        if self.driver is not None:
+            self.driver.close()
+
+    def refresh(self) -> None:
+        """Merge nodes and edges ingested into Neo4j since the CSR graph was loaded (backend='csr')."""
+        if self.index is None or self.driver is None:
+            raise ValueError("refresh() needs backend='csr' with a Neo4j uri")
+        GraphIndex.from_neo4j(self.driver, index=self.index)
+        if self.graph_path:
+            self.index.save(self.graph_path)
 
     def retrieve(self, cypher_query: str, parameters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
         Execute a Cypher query and return the results as a list of dictionaries.
         """
+        if self.driver is None:
+            raise ValueError("Cypher queries need a Neo4j uri")
         with self.driver.session() as session:
             result = session.run(cypher_query, parameters or {})
             return [record.data() for record in result]
+
+    def run(self, name: str, **parameters) -> List[Dict[str, Any]]:
+        """Run the registered Cypher query `name` with parameters, timed in QUERIES.stats()."""
+        query = QUERIES.get("cypher", name)
+        with QUERIES.timed(query) as timer:
+            results = self.retrieve(query.text, parameters)
+            timer.rows = len(results)
+        return results
+
+    def papers_by_author(self, author: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Papers of authors matching `author`, as {'id', 'source', 'author'}: names starting with it
+        first, then names containing each of its words (Neo4j full-text index).
+        """
+        if self.index is not None:
+            return self.index.papers_by_author(author, limit=limit)
+        if not normalize_name(author):
+            return []
+        return self.run("author_papers", **self._author_parameters(author, limit))
+
+    @staticmethod
+    def _author_parameters(author: str, limit: int) -> Dict[str, Any]:
+        return {"prefix": normalize_name(author), "terms": fulltext_query(author), "limit": limit}
+
+    def related_papers(self, paper_id: str, max_depth: int = 2, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Papers linked by citations within max_depth hops or sharing topics, as {'id', 'source', ...}.
+        max_depth: Any integer >= 1 on both backends (ValueError otherwise); Neo4j plans one query per depth
+        """
+        check_depth("related_papers", max_depth)
+        if self.index is not None:
+            return self.index.related_papers(paper_id, max_depth=max_depth, limit=limit)
+        return self.run(depth_query("related_papers", max_depth).name, paper_id=paper_id, limit=limit)
+
+    def collaborators(self, author_name: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Co-authors by number of shared papers, as {'name', 'affiliation', 'collaboration_count'}."""
+        if self.index is not None:
+            return self.index.collaborators(author_name, limit=limit)
+        return self.run("collaborators", author_name=author_name, limit=limit)
+
+    def neighbourhood(self, paper_id: str, k: int = 2, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Papers within k citation hops in either direction, as {'id', 'source', 'hops'}, closest first.
+        k: Any integer >= 1 on both backends (ValueError otherwise); Neo4j plans one query per depth
+        """
+        check_depth("neighbourhood", k)
+        if self.index is not None:
+            return self.index.neighbourhood(paper_id, k=k, limit=limit)
+        return self.run(depth_query("neighbourhood", k).name, paper_id=paper_id, limit=limit)
+
+    async def aconnect(self) -> None:
+        """Create the async driver; call from the event loop that will use it (e.g. app startup)."""
+        if self.async_driver is None and self.backend == "neo4j":
+            self.async_driver = AsyncGraphDatabase.driver(self.uri, auth=self.auth)
+
+    async def aclose(self) -> None:
+        if self.async_driver is not None:
+            await self.async_driver.close()
+            self.async_driver = None
+
+    async def aretrieve(self, cypher_query: str, parameters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Async retrieve() on the async Neo4j driver.
+        """
+        if self.async_driver is None:
+            self.async_driver = AsyncGraphDatabase.driver(self.uri, auth=self.auth)
+        async with self.async_driver.session() as session:
+            result = await session.run(cypher_query, parameters or {})
+            return [record.data() async for record in result]
+
+    async def arun(self, name: str, **parameters) -> List[Dict[str, Any]]:
+        """Async run() on the async Neo4j driver."""
+        query = QUERIES.get("cypher", name)
+        with QUERIES.timed(query) as timer:
+            results = await self.aretrieve(query.text, parameters)
+            timer.rows = len(results)
+        return results
+
+    async def apapers_by_author(self, author: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Async papers_by_author(); the CSR backend answers in-process."""
+        if self.index is not None:
+            return self.index.papers_by_author(author, limit=limit)
+        if not normalize_name(author):
+            return []
+        return await self.arun("author_papers", **self._author_parameters(author, limit))
@@ -1,31 +1,150 @@
-from elasticsearch import Elasticsearch
+import os
+import logging
+from elasticsearch import Elasticsearch, AsyncElasticsearch
 from typing import List, Dict, Any, Optional
+from storage.bm25_index import Bm25Index, load_records
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("elasticsearch", "bm25")
+# Score, then the unique arxiv_id, so that search_after pages are stable
+RESULT_SORT = [{"_score": "desc"}, {"arxiv_id": "asc"}]
 
 class KeywordRetriever:
-    def __init__(self, es_host: str, index_name: str):
-        self.es = Elasticsearch(es_host)
+    def __init__(self, es_host: Optional[str] = None, index_name: Optional[str] = None, backend: str = "elasticsearch",
+                 bm25_path: Optional[str] = None, metadata_path: Optional[str] = None,
+                 source_fields: Optional[List[str]] = None, async_connections: int = 100):
+        """
+        es_host, index_name: Elasticsearch host and index (backend='elasticsearch')
+        backend: 'elasticsearch' or 'bm25' (in-process index, no cluster needed)
+        bm25_path: BM25 index file; built from metadata_path and saved here if missing
+        metadata_path: Paper metadata (e.g. data/faiss_meta.json) to build the BM25 index from
+        source_fields: Source fields to return, e.g. ['arxiv_id', 'title', 'abstract'] (None returns whole documents)
+        async_connections: Connection pool size of the async client, i.e. concurrent aretrieve calls in flight
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown keyword backend '{backend}', expected one of {BACKENDS}")
+        self.backend = backend
+        self.es_host = es_host
         self.index_name = index_name
+        self.source_fields = source_fields
+        self.es = None
+        self.async_es = None
+        self.async_connections = async_connections
+        self.bm25 = None
+        if backend == "elasticsearch":
+            self.es = Elasticsearch(es_host)
+        elif bm25_path and os.path.exists(bm25_path):
+            self.bm25 = Bm25Index.load(bm25_path)
+        elif metadata_path:
+            logger.info(f"Building BM25 index from {metadata_path}")
+            self.bm25 = Bm25Index.build(load_records(metadata_path))
+            if bm25_path:
+                self.bm25.save(bm25_path)
+        else:
+            raise ValueError("backend='bm25' needs an existing bm25_path or a metadata_path to build from")
 
-    def retrieve(self, query: str, top_k: int = 5, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    def retrieve(self, query: str, top_k: int = 5, fields: Optional[List[str]] = None,
+                 search_after: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
         """
-        Perform a keyword search using Elasticsearch.
+        Perform a keyword search using Elasticsearch or the local BM25 index.
+        search_after: 'sort' of the last result of the previous page (Elasticsearch only), to page without from/size
         """
         search_fields = fields or ["title", "abstract", "full_text"]
-        es_query = {
-            "multi_match": {
-                "query": query,
-                "fields": search_fields,
-                "type": "best_fields",
-                "fuzziness": "AUTO"
-            }
+        if self.bm25 is not None:
+            return self._bm25_results(query, top_k, search_fields)
+        request = self._es_request(query, search_fields, top_k, search_after)
+        response = self.es.search(index=self.index_name, **request)
+        return self._hits_to_results(response)
+
+    def retrieve_many(self, queries: List[str], top_k: int = 5, fields: Optional[List[str]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Keyword search for several queries, one result list per query in input order.
+        Elasticsearch receives a single _msearch request instead of one search per query.
+        """
+        search_fields = fields or ["title", "abstract", "full_text"]
+        if not queries:
+            return []
+        if self.bm25 is not None:
+            return [self._bm25_results(query, top_k, search_fields) for query in queries]
+        searches = []
+        for query in queries:
+            request = self._es_request(query, search_fields, top_k)
+            searches.append({"index": self.index_name})
+            searches.append({"_source" if key == "source" else key: value for key, value in request.items()})
+        response = self.es.msearch(searches=searches)
+        results = []
+        for query, item in zip(queries, response["responses"]):
+            if "error" in item:
+                logger.error(f"Keyword search for '{query}' failed: {item['error']}")
+                results.append([])
+            else:
+                results.append(self._hits_to_results(item))
+        return results
+
+    async def aconnect(self) -> None:
+        """Create the AsyncElasticsearch client; call from the event loop that will use it (e.g. app startup)."""
+        if self.backend == "elasticsearch" and self.async_es is None:
+            self.async_es = AsyncElasticsearch(self.es_host, connections_per_node=self.async_connections)
+
+    async def aclose(self) -> None:
+        if self.async_es is not None:
+            await self.async_es.close()
+            self.async_es = None
+
+    async def aretrieve(self, query: str, top_k: int = 5, fields: Optional[List[str]] = None,
+                        search_after: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Async retrieve() on AsyncElasticsearch. The in-process BM25 backend answers directly.
+        """
+        search_fields = fields or ["title", "abstract", "full_text"]
+        if self.bm25 is not None:
+            return self._bm25_results(query, top_k, search_fields)
+        await self.aconnect()
+        request = self._es_request(query, search_fields, top_k, search_after)
+        response = await self.async_es.search(index=self.index_name, **request)
+        return self._hits_to_results(response)
+
+    def _bm25_results(self, query: str, top_k: int, fields: List[str]) -> List[Dict[str, Any]]:
+        results = []
+        for doc, score in self.bm25.search(query, top_k=top_k, fields=fields):
+            source = self.bm25.docs[doc]
+            if self.source_fields is not None:
+                source = {key: source[key] for key in self.source_fields if key in source}
+            results.append({"score": score, "id": self.bm25.ids[doc], "source": source})
+        return results
+
+    def _es_request(self, query: str, fields: List[str], top_k: int, search_after: Optional[List[Any]] = None) -> Dict[str, Any]:
+        """Keyword arguments of es.search(); 'source' is sent as _source."""
+        request = {
+            "query": {
+                "multi_match": {
+                    "query": query,
+                    "fields": fields,
+                    "type": "best_fields",
+                    "fuzziness": "AUTO"
+                }
+            },
+            "size": top_k,
+            "sort": RESULT_SORT
         }
-        response = self.es.search(index=self.index_name, query=es_query, size=top_k)
+        if self.source_fields is not None:
+            request["source"] = {"includes": self.source_fields}
+        if search_after is not None:
+            request["search_after"] = search_after
+        return request
+
+    @staticmethod
+    def _hits_to_results(response: Dict[str, Any]) -> List[Dict[str, Any]]:
         hits = response.get("hits", {}).get("hits", [])
         results = []
         for hit in hits:
-            results.append({
+            result = {
                 "score": hit.get("_score"),
                 "id": hit.get("_id"),
                 "source": hit.get("_source")
-            })
+            }
+            if "sort" in hit:
+                result["sort"] = hit["sort"]
+            results.append(result)
         return results
@@ -0,0 +1,215 @@
+"""
+Named, parameterized Cypher and SQL queries run by GraphRetriever.run and DatabaseRetriever.run.
+The query text never changes with the user input, so Neo4j and Postgres can reuse cached plans.
+"""
+import re
+import time
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("cypher", "sql")
+_SQL_PARAM = re.compile(r"(?<![:\w]):([A-Za-z_]\w*)")
+
+class NamedQuery:
+    def __init__(self, name: str, kind: str, text: str, description: str = ""):
+        """
+        name: Registry key
+        kind: 'cypher' ($param placeholders) or 'sql' (:param placeholders, as in sqlalchemy.text)
+        text: Query text; user input is only ever passed as parameters
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Unknown query kind '{kind}', expected one of {KINDS}")
+        self.name = name
+        self.kind = kind
+        self.text = text
+        self.description = description
+        self._positional: Optional[Tuple[str, List[str]]] = None
+
+    def positional(self) -> Tuple[str, List[str]]:
+        """SQL text with $1..$n placeholders (for PREPARE) and the parameter name of each position."""
+        if self._positional is None:
+            names: List[str] = []
+            def number(match):
+                if match.group(1) not in names:
+                    names.append(match.group(1))
+                return f"${names.index(match.group(1)) + 1}"
+            self._positional = (_SQL_PARAM.sub(number, self.text), names)
+        return self._positional
+
+class QueryRegistry:
+    def __init__(self):
+        """
+        Named queries plus per-query call counts and timings, to see which plans are hot.
+        Names are per kind: a Cypher and a SQL query can share one (e.g. 'author_papers').
+        """
+        self._queries: Dict[Tuple[str, str], NamedQuery] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, kind: str, text: str, description: str = "") -> NamedQuery:
+        query = NamedQuery(name, kind, " ".join(text.split()), description)
+        self._queries[(kind, name)] = query
+        return query
+
+    def get(self, kind: str, name: str) -> NamedQuery:
+        query = self._queries.get((kind, name))
+        if query is None:
+            raise KeyError(f"No {kind} query named '{name}'; registered: {self.names(kind)}")
+        return query
+
+    def names(self, kind: str) -> List[str]:
+        return sorted(name for k, name in self._queries if k == kind)
+
+    def record(self, name: str, seconds: float, rows: int) -> None:
+        """Add one execution of the query to its stats; name is '<kind>:<name>'."""
+        with self._lock:
+            stats = self._stats.setdefault(name, {'calls': 0, 'rows': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            stats['calls'] += 1
+            stats['rows'] += rows
+            stats['total_ms'] += seconds * 1000
+            stats['max_ms'] = max(stats['max_ms'], seconds * 1000)
+        logger.debug(f"Query {name}: {seconds * 1000:.1f} ms, {rows} rows")
+
+    def timed(self, query: NamedQuery) -> "_Timer":
+        """Context manager timing one execution of query; set .rows on it before it exits."""
+        return _Timer(self, f"{query.kind}:{query.name}")
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-query calls, rows, total/mean/max milliseconds, hottest (most total time) first."""
+        with self._lock:
+            stats = {name: dict(s, mean_ms=s['total_ms'] / s['calls']) for name, s in self._stats.items()}
+        return dict(sorted(stats.items(), key=lambda item: -item[1]['total_ms']))
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+class _Timer:
+    def __init__(self, registry: QueryRegistry, name: str):
+        self.registry = registry
+        self.name = name
+        self.rows = 0
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.registry.record(self.name, time.perf_counter() - self.start, self.rows)
+
+# Paper properties returned as the result 'source', matching GraphIndex paper records
+_PAPER_SOURCE = "p {.arxiv_id, .title, .abstract, .date_published, .category}"
+
+QUERIES = QueryRegistry()
+
+# Prefix hits on the indexed a.name_normalized first, then word-prefix hits from the
+# author_names full-text index (see KnowledgeGraph._init_schema); $terms is fulltext_query(author)
+QUERIES.register("author_papers", "cypher", f"""
+    CALL {{
+        MATCH (a:Author) WHERE a.name_normalized STARTS WITH $prefix
+        RETURN a, 1 AS prefix_hit, 0.0 AS score
+        UNION
+        CALL db.index.fulltext.queryNodes('author_names', $terms) YIELD node, score
+        RETURN node AS a, 0 AS prefix_hit, score
+    }}
+    WITH a, max(prefix_hit) AS prefix_hit, max(score) AS score
+    MATCH (a)-[:AUTHORED]->(p:Paper)
+    RETURN p.arxiv_id AS id, {_PAPER_SOURCE} AS source, a.name AS author
+    ORDER BY prefix_hit DESC, score DESC, id
+    LIMIT $limit
+""", "Papers of authors whose normalized name starts with $prefix or matches the full-text $terms")
+
+QUERIES.register("collaborators", "cypher", """
+    MATCH (a:Author {name: $author_name})-[:AUTHORED]->(p:Paper)<-[:AUTHORED]-(collaborator:Author)
+    WHERE collaborator <> a
+    WITH collaborator, count(p) AS collaboration_count
+    RETURN collaborator.name AS name, collaborator.affiliation AS affiliation, collaboration_count
+    ORDER BY collaboration_count DESC, name
+    LIMIT $limit
+""", "Co-authors by number of shared papers")
+
+# Variable-length bounds cannot be parameters in Cypher: one registered query per depth,
+# created by depth_query() on first use of a depth
+_DEPTH_QUERIES = {
+    "related_papers": ("""
+        MATCH (start:Paper {{arxiv_id: $paper_id}})
+        OPTIONAL MATCH (start)-[:CITES*1..{depth}]->(cited:Paper)
+        OPTIONAL MATCH (start)<-[:CITES*1..{depth}]-(citing:Paper)
+        OPTIONAL MATCH (start)-[:CATEGORIZED_AS]->(:Topic)<-[:CATEGORIZED_AS]-(related:Paper)
+        WHERE related <> start
+        WITH start, collect(distinct cited) + collect(distinct citing) + collect(distinct related) AS papers
+        UNWIND papers AS p
+        WITH DISTINCT start, p WHERE p <> start
+        RETURN p.arxiv_id AS id, {source} AS source
+        LIMIT $limit
+    """, "Papers within {depth} citation hops or sharing a topic"),
+    "neighbourhood": ("""
+        MATCH path = (start:Paper {{arxiv_id: $paper_id}})-[:CITES*1..{depth}]-(p:Paper)
+        WHERE p <> start
+        WITH p, min(length(path)) AS hops
+        RETURN p.arxiv_id AS id, {source} AS source, hops
+        ORDER BY hops, id
+        LIMIT $limit
+    """, "Papers within {depth} citation hops in either direction"),
+}
+
+def check_depth(name: str, depth: int) -> None:
+    """Citation depths are integers of at least 1 on every graph backend."""
+    if isinstance(depth, bool) or not isinstance(depth, int) or depth < 1:
+        raise ValueError(f"{name} needs an integer citation depth of at least 1, got {depth!r}")
+
+def depth_query(name: str, depth: int) -> NamedQuery:
+    """The Cypher query '<name>_<depth>' for a citation depth of at least 1, registered on first use."""
+    check_depth(name, depth)
+    key = f"{name}_{depth}"
+    try:
+        return QUERIES.get("cypher", key)
+    except KeyError:
+        text, description = _DEPTH_QUERIES[name]
+        return QUERIES.register(key, "cypher", text.format(depth=depth, source=_PAPER_SOURCE),
+                                description.format(depth=depth))
+
+for depth in (1, 2, 3):
+    depth_query("related_papers", depth)
+    depth_query("neighbourhood", depth)
+
+# Explicit paper columns: never ship full_text or the search_vector column with SQL results
+_SQL_PAPER_COLUMNS = "p.id, p.arxiv_id, p.title, p.abstract, p.date_published, p.category, p.citation_count"
+
+# authors.name_normalized has a pg_trgm GIN index (substring) and a text_pattern_ops index (prefix);
+# :pattern is normalize_name() + escape_like() of the user input
+QUERIES.register("author_papers", "sql", r"""
+    SELECT {columns}, a.name AS author FROM papers p
+    JOIN paper_authors pa ON p.id = pa.paper_id
+    JOIN authors a ON pa.author_id = a.id
+    WHERE a.name_normalized LIKE '%' || CAST(:pattern AS TEXT) || '%' ESCAPE '\'
+    ORDER BY CASE WHEN a.name_normalized LIKE CAST(:pattern AS TEXT) || '%' ESCAPE '\' THEN 0 ELSE 1 END,
+             p.date_published DESC
+    LIMIT CAST(:limit AS INTEGER)
+""".replace("{columns}", _SQL_PAPER_COLUMNS), "Papers of authors whose normalized name contains :pattern, prefix matches first")
+
+QUERIES.register("author_papers_prefix", "sql", r"""
+    SELECT {columns}, a.name AS author FROM papers p
+    JOIN paper_authors pa ON p.id = pa.paper_id
+    JOIN authors a ON pa.author_id = a.id
+    WHERE a.name_normalized LIKE CAST(:pattern AS TEXT) || '%' ESCAPE '\'
+    ORDER BY p.date_published DESC
+    LIMIT CAST(:limit AS INTEGER)
+""".replace("{columns}", _SQL_PAPER_COLUMNS), "Papers of authors whose normalized name starts with :pattern (inputs too short for trigrams)")
+
+QUERIES.register("recent_papers", "sql", f"""
+    SELECT {_SQL_PAPER_COLUMNS} FROM papers p ORDER BY p.date_published DESC LIMIT CAST(:limit AS INTEGER)
+""", "Most recently published papers")
+
+# papers.search_vector is a generated, GIN-indexed tsvector (storage/db_setup.setup_database) built with
+# the same 'english' configuration; title, abstract and full_text are weighted A, B and C
+QUERIES.register("fulltext_papers", "sql", f"""
+    SELECT {_SQL_PAPER_COLUMNS}, ts_rank_cd(p.search_vector, q) AS score
+    FROM papers p, websearch_to_tsquery('english', :query) q
+    WHERE p.search_vector @@ q
+    ORDER BY score DESC, p.arxiv_id
+    LIMIT CAST(:limit AS INTEGER)
+""", "Postgres full-text search over title, abstract and full_text, best ts_rank_cd first")
@@ -1,35 +1,129 @@
 import os
-import faiss
+import logging
+import threading
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Union
+from embeddings.cache import EmbeddingCache, get_embedding_cache
+from embeddings.onnx_backend import BACKENDS, load_embedding_model
+from storage.index_factory import set_search_params
+from storage.mmap_index import read_index
+from storage.metadata_store import MetadataStore
+from storage.facets import FacetIndex, search_filtered
+
+logger = logging.getLogger(__name__)
 
 class VectorRetriever:
-    def __init__(self, index_path: str, metadata_path: str = None, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, index_path: str, metadata_path: str = None, model_name: str = "all-MiniLM-L6-v2",
+                 cache: Optional[EmbeddingCache] = None, nprobe: Optional[int] = None,
+                 ef_search: Optional[int] = None, mmap: bool = False, facets_path: Optional[str] = None,
+                 backend: str = "torch", onnx_dir: Optional[str] = None, onnx_quantized: bool = True):
         """
         index_path: Path to the FAISS index file
-        metadata_path: Path to a numpy or json file mapping index ids to metadata (optional)
+        metadata_path: Path to a columnar .cmeta, numpy or json file mapping index ids to metadata (optional)
         model_name: SentenceTransformer model name
+        cache: Query embedding cache (optional, defaults to the shared process-wide cache)
+        nprobe, ef_search: Override the IVF/HNSW search knobs stored in the index (optional)
+        mmap: Memory-map the index read-only so workers share its pages through the OS page cache
+        facets_path: Facet bitsets written at build time (optional, defaults to <index_path>.facets.npz)
+        backend: Query encoder, 'torch' (SentenceTransformer) or 'onnx' (ONNX Runtime, see embeddings.onnx_backend)
+        onnx_dir: Exported model directory for backend='onnx'
+        onnx_quantized: Use the int8 ONNX model when available
         """
-        self.model = SentenceTransformer(model_name)
-        self.index = faiss.read_index(index_path)
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+        self.model_name = model_name
+        self.backend = backend
+        self.onnx_dir = onnx_dir
+        self.onnx_quantized = onnx_quantized
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.cache = cache or get_embedding_cache()
+        self.index = read_index(index_path, mmap=mmap)
+        set_search_params(self.index, nprobe=nprobe, ef_search=ef_search)
+        self.facets_path = facets_path or f"{index_path}.facets.npz"
+        self._facets: Optional[FacetIndex] = None
         self.metadata = None
         if metadata_path and os.path.exists(metadata_path):
-            if metadata_path.endswith('.npy'):
+            if metadata_path.endswith('.cmeta'):
+                self.metadata = MetadataStore(metadata_path)
+            elif metadata_path.endswith('.npy'):
                 self.metadata = np.load(metadata_path, allow_pickle=True).item()
             elif metadata_path.endswith('.json'):
                 import json
                 with open(metadata_path, 'r', encoding='utf-8') as f:
                     self.metadata = json.load(f)
 
-    def retrieve(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    @property
+    def model(self):
+        """Query encoder for the configured backend, loaded on first use so startup only pays for opening the index."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = load_embedding_model(self.model_name, self.backend, self.onnx_dir,
+                                                       quantized=self.onnx_quantized)
+        return self._model
+
+    @model.setter
+    def model(self, model) -> None:
+        self._model = model
+
+    @property
+    def cache_name(self) -> str:
+        """
+        Query cache namespace. ONNX vectors differ slightly from PyTorch ones, so they are cached under the
+        variant that was actually loaded (fp32 when the int8 model file is missing).
+        """
+        if self.backend == "torch":
+            return self.model_name
+        return f"{self.model_name}#{getattr(self.model, 'variant', self.backend)}"
+
+    def retrieve(self, query: str, top_k: int = 5,
+                 primary_category: Union[str, List[str], None] = None,
+                 categories: Union[str, List[str], None] = None,
+                 date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict[str, Any]]:
         """
-        Returns top_k most similar documents for the query.
+        Returns top_k most similar documents for the query, optionally restricted by metadata filters.
         """
-        embedding = self.model.encode([query])
-        D, I = self.index.search(np.array(embedding).astype('float32'), top_k)
+        return self.retrieve_many([query], top_k=top_k, primary_category=primary_category,
+                                  categories=categories, date_from=date_from, date_to=date_to)[0]
+
+    def retrieve_many(self, queries: List[str], top_k: int = 5,
+                      primary_category: Union[str, List[str], None] = None,
+                      categories: Union[str, List[str], None] = None,
+                      date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Returns top_k most similar documents for each query, in query order.
+        All queries are encoded in one batched forward pass and searched with a single index call.
+        primary_category, categories: Keep documents matching any of the given values
+        date_from, date_to: Inclusive publication date range (YYYY-MM-DD)
+        Filters are applied inside the FAISS scan through precomputed ID bitsets, so top_k is never under-filled
+        by post-filtering.
+        """
+        if not queries:
+            return []
+        embeddings = self.cache.encode(self.model, self.cache_name, list(queries))
+        if any(f is not None for f in (primary_category, categories, date_from, date_to)):
+            bitmap = self.facets.bitmap(primary_category=primary_category, categories=categories,
+                                        date_from=date_from, date_to=date_to)
+            D, I = search_filtered(self.index, embeddings, top_k, bitmap)
+        else:
+            D, I = self.index.search(embeddings, top_k)
+        return [self._build_results(I[row], D[row]) for row in range(len(queries))]
+
+    @property
+    def facets(self) -> FacetIndex:
+        """Facet bitsets from facets_path, or built once from the metadata if the file is missing or stale."""
+        if self._facets is None:
+            if os.path.exists(self.facets_path):
+                self._facets = FacetIndex.load(self.facets_path)
+            if self._facets is None or self._facets.size != self.index.ntotal:
+                logger.info(f"Building facet bitsets from metadata for {self.index.ntotal} vectors")
+                self._facets = FacetIndex.build(self.get_metadata(i) for i in range(self.index.ntotal))
+        return self._facets
+
+    def _build_results(self, indices, scores) -> List[Dict[str, Any]]:
         results = []
-        for idx, score in zip(I[0], D[0]):
+        for idx, score in zip(indices, scores):
             if idx == -1:
                 continue
             meta = self.get_metadata(idx)
@@ -42,7 +136,9 @@ class VectorRetriever:
 
     def get_metadata(self, idx: int) -> Any:
         if self.metadata is not None:
-            if isinstance(self.metadata, dict):
+            if isinstance(self.metadata, MetadataStore):
+                return self.metadata.get(idx)
+            elif isinstance(self.metadata, dict):
                 return self.metadata.get(str(idx)) or self.metadata.get(idx)
             elif isinstance(self.metadata, list):
                 if 0 <= idx < len(self.metadata):
@@ -0,0 +1,24 @@
+"""
+Author name normalization shared by the Postgres, Neo4j and CSR author lookups.
+The normalized form is stored next to the display name so that lookups are index-backed
+prefix/substring matches instead of case-insensitive scans over every author.
+"""
+import re
+import unicodedata
+
+# Characters with a meaning in Lucene query syntax (Neo4j full-text indexes)
+_LUCENE_SPECIAL = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+def normalize_name(name: str) -> str:
+    """Lowercase, accent-free, single-spaced name: 'José  García-López' -> 'jose garcia-lopez'."""
+    decomposed = unicodedata.normalize("NFKD", name or "")
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.lower().split())
+
+def escape_like(value: str) -> str:
+    """Escape LIKE wildcards so user input only matches literally (use with ESCAPE '\\')."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def fulltext_query(name: str) -> str:
+    """Lucene query matching author names that contain every token of name as a word prefix."""
+    return " AND ".join(_LUCENE_SPECIAL.sub(r"\\\1", term) + "*" for term in normalize_name(name).split())
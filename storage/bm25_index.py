@@ -0,0 +1,174 @@
+"""
+Embedded BM25 keyword index, a local alternative to the Elasticsearch keyword backend.
+
+    python -m storage.bm25_index build data/faiss_meta.json data/bm25.npz
+"""
+import os
+import re
+import sys
+import math
+import logging
+import argparse
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+import numpy as np
+
+from storage.metadata_store import MetadataStore, load_legacy_metadata, write_metadata_store
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FIELDS = ("title", "abstract", "full_text")
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+def analyze(text: str) -> List[str]:
+    """Lowercased word tokens, like the Elasticsearch standard analyzer used by ingest_all_backends.py."""
+    return _TOKEN.findall(text.lower()) if text else []
+
+def parse_field(spec: str) -> Tuple[str, float]:
+    """'title^3' -> ('title', 3.0)."""
+    name, _, boost = spec.partition("^")
+    return name, float(boost) if boost else 1.0
+
+class _FieldPostings:
+    def __init__(self, terms: np.ndarray, offsets: np.ndarray, docs: np.ndarray, tfs: np.ndarray, lengths: np.ndarray):
+        """
+        CSR postings for one field: documents containing terms[i] are docs[offsets[i]:offsets[i+1]].
+        terms: Sorted vocabulary (unicode array, looked up with np.searchsorted)
+        tfs: Term frequency per posting; lengths: tokens per document
+        """
+        self.terms = terms
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.lengths = lengths
+        self.avgdl = float(lengths.mean()) if len(lengths) and lengths.sum() else 1.0
+
+    @classmethod
+    def build(cls, token_lists: List[List[str]]) -> "_FieldPostings":
+        pairs: Dict[str, Dict[int, int]] = {}
+        for doc, tokens in enumerate(token_lists):
+            for token in tokens:
+                counts = pairs.setdefault(token, {})
+                counts[doc] = counts.get(doc, 0) + 1
+        terms = sorted(pairs)
+        offsets = np.zeros(len(terms) + 1, dtype="int64")
+        offsets[1:] = np.cumsum([len(pairs[t]) for t in terms])
+        docs = np.fromiter((d for t in terms for d in pairs[t]), dtype="int32", count=int(offsets[-1]))
+        tfs = np.fromiter((c for t in terms for c in pairs[t].values()), dtype="float32", count=int(offsets[-1]))
+        lengths = np.array([len(tokens) for tokens in token_lists], dtype="float32")
+        return cls(np.array(terms, dtype=str), offsets, docs, tfs, lengths)
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        i = int(np.searchsorted(self.terms, term))
+        if i >= len(self.terms) or self.terms[i] != term:
+            return self.docs[:0], self.tfs[:0]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.docs[start:end], self.tfs[start:end]
+
+class Bm25Index:
+    def __init__(self, fields: Dict[str, _FieldPostings], ids: List[str], docs: Any, k1: float = 1.2, b: float = 0.75):
+        """
+        Per-field inverted index scored with BM25 (Elasticsearch defaults k1=1.2, b=0.75).
+        Postings are array-backed (CSR) and scores accumulate in NumPy arrays over all documents,
+        which suits small and medium corpora.
+        fields: Postings per indexed field
+        ids: arxiv_id per document
+        docs: Source records by document position (list or MetadataStore)
+        """
+        self.fields = fields
+        self.ids = ids
+        self.docs = docs
+        self.k1 = k1
+        self.b = b
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, records: Iterable[Dict[str, Any]], fields: Iterable[str] = DEFAULT_FIELDS, **kwargs) -> "Bm25Index":
+        records = list(records)
+        postings = {field: _FieldPostings.build([analyze(str(r.get(field) or "")) for r in records]) for field in fields}
+        ids = [str(r.get("arxiv_id", i)) for i, r in enumerate(records)]
+        logger.info(f"Built BM25 index over {len(records)} documents: "
+                    + ", ".join(f"{len(p.terms)} {f} terms" for f, p in postings.items()))
+        return cls(postings, ids, records, **kwargs)
+
+    def field_scores(self, field: str, terms: List[str]) -> np.ndarray:
+        postings = self.fields[field]
+        n = len(self.ids)
+        scores = np.zeros(n, dtype="float32")
+        norm = self.k1 * (1 - self.b + self.b * postings.lengths / postings.avgdl)
+        for term in terms:
+            docs, tfs = postings.postings(term)
+            if not len(docs):
+                continue
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm[docs])
+        return scores
+
+    def search(self, query: str, top_k: int = 5, fields: Optional[List[str]] = None) -> List[Tuple[int, float]]:
+        """
+        (document position, score) pairs for the best top_k matches. Fields may carry boosts ('title^3');
+        like a best_fields multi_match, a document's score is its best boosted field score.
+        Fields that were not indexed are ignored.
+        """
+        terms = analyze(query)
+        specs = [parse_field(f) for f in (fields or list(self.fields))]
+        specs = [(name, boost) for name, boost in specs if name in self.fields]
+        if not terms or not specs or not len(self.ids):
+            return []
+        best = np.zeros(len(self.ids), dtype="float32")
+        for name, boost in specs:
+            np.maximum(best, self.field_scores(name, terms) * boost, out=best)
+        matches = np.flatnonzero(best > 0)
+        if len(matches) > top_k:
+            matches = matches[np.argpartition(-best[matches], top_k - 1)[:top_k]]
+        order = matches[np.lexsort((matches, -best[matches]))]
+        return [(int(i), float(best[i])) for i in order]
+
+    def save(self, path: str) -> None:
+        """Write postings to path (.npz) and the source records to <path>.docs.cmeta."""
+        arrays = {'params': np.array([self.k1, self.b]), 'fields': np.array(list(self.fields), dtype=str)}
+        for name, p in self.fields.items():
+            arrays.update({f"{name}__terms": p.terms, f"{name}__offsets": p.offsets, f"{name}__docs": p.docs,
+                           f"{name}__tfs": p.tfs, f"{name}__lengths": p.lengths})
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        write_metadata_store(f"{path}.docs.cmeta", (self.docs[i] for i in range(len(self.ids))))
+        os.replace(tmp_path, path)
+        logger.info(f"Saved BM25 index with {len(self.ids)} documents to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "Bm25Index":
+        docs = MetadataStore(f"{path}.docs.cmeta")
+        with np.load(path) as data:
+            k1, b = data["params"].tolist()
+            fields = {
+                name: _FieldPostings(data[f"{name}__terms"], data[f"{name}__offsets"], data[f"{name}__docs"],
+                                     data[f"{name}__tfs"], data[f"{name}__lengths"])
+                for name in data["fields"].tolist()
+            }
+        ids = [docs.arxiv_id(i) for i in range(len(docs))]
+        logger.info(f"Loaded BM25 index with {len(ids)} documents from {path}")
+        return cls(fields, ids, docs, k1=k1, b=b)
+
+def load_records(path: str) -> List[Dict[str, Any]]:
+    """Source records from a columnar .cmeta or a JSON/pickle metadata file."""
+    if path.endswith(".cmeta"):
+        return list(MetadataStore(path))
+    return load_legacy_metadata(path)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Build a BM25 index from paper metadata")
+    build.add_argument("source", help="faiss_meta.json, .cmeta or .pkl metadata")
+    build.add_argument("output", help="Index file (.npz)")
+    build.add_argument("--fields", default=",".join(DEFAULT_FIELDS))
+    args = parser.parse_args(argv)
+    index = Bm25Index.build(load_records(args.source), fields=args.fields.split(","))
+    index.save(args.output)
+    print(f"Indexed {len(index)} documents into {args.output}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,90 @@
+import os
+import logging
+from typing import Dict, Iterable, Tuple
+import numpy as np
+
+from storage.metadata_store import KeyedMetadataStore
+
+logger = logging.getLogger(__name__)
+
+class ExactVectorStore:
+    def __init__(self, path: str, dimension: int):
+        """
+        Full-precision vectors kept on disk next to a compressed index, used only to re-score candidates.
+        Rows of the .npy file follow the row order of the metadata snapshot, so a key is located
+        with the snapshot's key column; vectors added since the last save are held in memory.
+        """
+        self.path = path
+        self.dimension = dimension
+        self._rows = np.load(path, mmap_mode="r") if os.path.exists(path) else np.zeros((0, dimension), dtype="float32")
+        self._overlay: Dict[int, np.ndarray] = {}
+
+    def put(self, keys: Iterable[int], vectors: np.ndarray) -> None:
+        for key, vector in zip(keys, vectors):
+            self._overlay[int(key)] = np.array(vector, dtype="float32")
+
+    def delete(self, keys: Iterable[int]) -> None:
+        for key in keys:
+            self._overlay.pop(int(key), None)
+
+    def get(self, keys: Iterable[int], metadata: KeyedMetadataStore) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (found mask, vectors) for keys; rows without a stored vector are zero and masked out."""
+        keys = list(keys)
+        found = np.zeros(len(keys), dtype=bool)
+        vectors = np.zeros((len(keys), self.dimension), dtype="float32")
+        for i, key in enumerate(keys):
+            key = int(key)
+            if key in self._overlay:
+                vectors[i] = self._overlay[key]
+                found[i] = True
+                continue
+            row = metadata.base.position_of_key(key)
+            if row is not None and row < len(self._rows) and key in metadata:
+                vectors[i] = self._rows[row]
+                found[i] = True
+        return found, vectors
+
+    def save(self, metadata: KeyedMetadataStore) -> None:
+        """
+        Write vectors in the order metadata.save() will write its rows.
+        Must run before metadata.save(), while the old snapshot still locates existing rows.
+        """
+        tmp_path = f"{self.path}.new.npy"
+        out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype="float32", shape=(len(metadata), self.dimension))
+        for i, (key, _) in enumerate(metadata.items()):
+            found, vectors = self.get([key], metadata)
+            if not found[0]:
+                raise ValueError(f"No exact vector stored for key {key}")
+            out[i] = vectors[0]
+        out.flush()
+        del out
+        self._rows = np.zeros((0, self.dimension), dtype="float32")
+        os.replace(tmp_path, self.path)
+        self._rows = np.load(self.path, mmap_mode="r")
+        self._overlay = {}
+        logger.info(f"Saved {len(metadata)} exact vectors to {self.path}")
+
+def rescore(query: np.ndarray, candidates: np.ndarray, vectors: np.ndarray, found: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Re-rank candidate ids by exact squared L2 distance to the query and keep the best k.
+    Returns (distances, ids) padded with inf / -1 like faiss.
+    """
+    valid = found & (candidates != -1)
+    distances = np.full(len(candidates), np.inf, dtype="float32")
+    distances[valid] = ((vectors[valid] - query.reshape(1, -1)) ** 2).sum(axis=1)
+    order = np.argsort(distances, kind="stable")[:k]
+    ids = np.where(np.isfinite(distances[order]), candidates[order], -1)
+    out_d = np.full(k, np.inf, dtype="float32")
+    out_i = np.full(k, -1, dtype="int64")
+    out_d[:len(order)] = distances[order]
+    out_i[:len(order)] = ids
+    return out_d, out_i
+
+def rescore_batch(queries: np.ndarray, candidates: np.ndarray, lookup, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Apply rescore() row by row; lookup(ids) must return (found mask, vectors) for a 1-d id array."""
+    D = np.empty((len(queries), k), dtype="float32")
+    I = np.empty((len(queries), k), dtype="int64")
+    for row, (query, ids) in enumerate(zip(queries, candidates)):
+        found, vectors = lookup(ids)
+        D[row], I[row] = rescore(query, ids, vectors, found, k)
+    return D, I
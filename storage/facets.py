@@ -0,0 +1,150 @@
+import logging
+from datetime import date, datetime
+from typing import Dict, Any, List, Optional, Iterable, Tuple, Union
+import numpy as np
+import faiss
+
+from storage.index_factory import base_index
+from storage.mmap_index import MmapFlatIndex
+
+logger = logging.getLogger(__name__)
+
+FACETS = ("primary_category", "categories")
+DATE_FIELDS = ("publication_date", "published", "date_published")
+_NO_DATE = np.iinfo("int32").min
+_EPOCH = date(1970, 1, 1)
+
+def _day_number(value: Union[str, date, datetime, None]) -> int:
+    """Days since 1970-01-01 for an ISO date string, date or datetime; _NO_DATE if missing or unparseable."""
+    if value is None or value == "":
+        return _NO_DATE
+    if isinstance(value, datetime):
+        value = value.date()
+    elif isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value[:10]).date()
+        except ValueError:
+            return _NO_DATE
+    return (value - _EPOCH).days
+
+def _as_list(value: Union[str, Iterable[str], None]) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+class FacetIndex:
+    def __init__(self, size: int, bitsets: Dict[str, Dict[str, np.ndarray]], dates: np.ndarray):
+        """
+        Per-facet-value ID bitsets over index positions, packed little-endian as faiss.IDSelectorBitmap expects.
+        size: Number of positions covered
+        bitsets: {facet: {value: packed bitmap}} for primary_category and categories
+        dates: Publication day number per position (int32, days since 1970-01-01)
+        """
+        self.size = size
+        self.bitsets = bitsets
+        self.dates = dates
+
+    @classmethod
+    def build(cls, records: Iterable[Optional[Dict[str, Any]]]) -> "FacetIndex":
+        """Build bitsets from metadata records in index position order (None for positions without metadata)."""
+        positions: Dict[str, Dict[str, List[int]]] = {facet: {} for facet in FACETS}
+        dates: List[int] = []
+        for pos, record in enumerate(records):
+            record = record or {}
+            for facet in FACETS:
+                for value in _as_list(record.get(facet)):
+                    positions[facet].setdefault(value, []).append(pos)
+            dates.append(_day_number(next((record[f] for f in DATE_FIELDS if record.get(f)), None)))
+        size = len(dates)
+        bitsets = {}
+        for facet, values in positions.items():
+            bitsets[facet] = {}
+            for value, rows in values.items():
+                mask = np.zeros(size, dtype=bool)
+                mask[rows] = True
+                bitsets[facet][value] = np.packbits(mask, bitorder="little")
+        logger.info(f"Built facet bitsets over {size} positions: "
+                    + ", ".join(f"{len(v)} {facet} values" for facet, v in bitsets.items()))
+        return cls(size, bitsets, np.array(dates, dtype="int32"))
+
+    def bitmap(self,
+               primary_category: Union[str, List[str], None] = None,
+               categories: Union[str, List[str], None] = None,
+               date_from: Union[str, date, datetime, None] = None,
+               date_to: Union[str, date, datetime, None] = None) -> Optional[np.ndarray]:
+        """
+        Packed bitmap of positions matching every given filter (any-of within a facet), or None if no filter is set.
+        Dates are inclusive; records without a date never match a date filter.
+        """
+        nbytes = (self.size + 7) // 8
+        result = None
+        for facet, wanted in (("primary_category", primary_category), ("categories", categories)):
+            values = _as_list(wanted)
+            if not values:
+                continue
+            facet_bits = np.zeros(nbytes, dtype="uint8")
+            for value in values:
+                bits = self.bitsets[facet].get(value)
+                if bits is not None:
+                    facet_bits |= bits
+            result = facet_bits if result is None else result & facet_bits
+        if date_from is not None or date_to is not None:
+            mask = self.dates != _NO_DATE
+            if date_from is not None:
+                mask &= self.dates >= _day_number(date_from)
+            if date_to is not None:
+                mask &= self.dates <= _day_number(date_to)
+            date_bits = np.packbits(mask, bitorder="little")
+            result = date_bits if result is None else result & date_bits
+        return result
+
+    def save(self, path: str) -> None:
+        arrays = {'size': np.array([self.size], dtype="int64"), 'dates': self.dates}
+        for facet, values in self.bitsets.items():
+            names = sorted(values)
+            arrays[f"{facet}__values"] = np.array(names, dtype=str)
+            arrays[f"{facet}__bits"] = (np.stack([values[n] for n in names]) if names
+                                        else np.zeros((0, (self.size + 7) // 8), dtype="uint8"))
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+        logger.info(f"Saved facet bitsets to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "FacetIndex":
+        with np.load(path) as data:
+            bitsets = {
+                facet: dict(zip(data[f"{facet}__values"].tolist(), data[f"{facet}__bits"]))
+                for facet in FACETS
+            }
+            return cls(int(data["size"][0]), bitsets, data["dates"])
+
+def search_parameters(index: faiss.Index, sel: faiss.IDSelector) -> faiss.SearchParameters:
+    """SearchParameters carrying sel, keeping the index's own nprobe / efSearch."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return faiss.SearchParametersIVF(sel=sel, nprobe=ivf.nprobe)
+    inner = base_index(index)
+    if isinstance(inner, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=sel, efSearch=inner.hnsw.efSearch)
+    return faiss.SearchParameters(sel=sel)
+
+def search_filtered(index, queries: np.ndarray, k: int, bitmap: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Search only the positions set in bitmap. The bitmap is handed to FAISS as an IDSelectorBitmap,
+    so non-matching vectors are skipped inside the scan; memory-mapped flat files scan just the matching rows.
+    """
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    if isinstance(index, MmapFlatIndex):
+        rows = np.flatnonzero(np.unpackbits(bitmap, bitorder="little")[:index.ntotal])
+        return index.search_rows(queries, k, rows)
+    sel = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+    return index.search(queries, k, params=search_parameters(index, sel))
+
+def search_ids(index, queries: np.ndarray, k: int, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Search only the vectors with the given ids, for indexes that store their own ids (IVF)."""
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    ids = np.ascontiguousarray(ids, dtype="int64")
+    sel = faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids))
+    return index.search(queries, k, params=search_parameters(index, sel))
@@ -0,0 +1,368 @@
+"""
+In-memory citation / co-authorship / topic graph in NumPy CSR arrays, a local alternative to Neo4j
+for related-paper, collaborator and k-hop queries.
+
+    python -m storage.graph_index build data/papers.jsonl data/graph.npz --citations data/citations.jsonl
+    python -m storage.graph_index from-neo4j data/graph.npz
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+import numpy as np
+
+from storage.author_names import normalize_name
+from storage.metadata_store import MetadataStore, load_legacy_metadata, write_metadata_store
+
+logger = logging.getLogger(__name__)
+
+PAPER_FIELDS = ("arxiv_id", "title", "abstract", "date_published", "category")
+
+class _Csr:
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray):
+        """Adjacency of row nodes: neighbours of row i are indices[indptr[i]:indptr[i+1]], sorted and unique."""
+        self.indptr = indptr
+        self.indices = indices
+
+    @classmethod
+    def from_edges(cls, src: np.ndarray, dst: np.ndarray, n_rows: int, n_cols: int) -> "_Csr":
+        keys = np.unique(src.astype("int64") * max(n_cols, 1) + dst.astype("int64"))
+        rows = keys // max(n_cols, 1)
+        indptr = np.zeros(n_rows + 1, dtype="int64")
+        indptr[1:] = np.cumsum(np.bincount(rows, minlength=n_rows))
+        return cls(indptr, (keys % max(n_cols, 1)).astype("int32"))
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.indptr) - 1
+
+    def row(self, i: int) -> np.ndarray:
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def gather(self, rows: np.ndarray) -> np.ndarray:
+        """Neighbours of all rows, concatenated (a node appears once per row it is adjacent to)."""
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        total = int(lengths.sum())
+        if not total:
+            return self.indices[:0]
+        shift = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        return self.indices[shift + np.arange(total)]
+
+    def edges(self) -> Tuple[np.ndarray, np.ndarray]:
+        return np.repeat(np.arange(self.n_rows, dtype="int32"), np.diff(self.indptr)), self.indices
+
+    def transpose(self, n_cols: int) -> "_Csr":
+        src, dst = self.edges()
+        return _Csr.from_edges(dst, src, n_cols, self.n_rows)
+
+class GraphIndex:
+    def __init__(self, papers: Optional[MetadataStore] = None, authors: Optional[List[str]] = None,
+                 affiliations: Optional[List[str]] = None, topics: Optional[List[str]] = None,
+                 edges: Optional[Dict[str, _Csr]] = None):
+        """
+        Paper, Author and Topic nodes with CITES (paper -> paper), AUTHORED (author -> paper) and
+        CATEGORIZED_AS (topic -> paper) edges, mirroring the KnowledgeGraph schema. Reverse adjacency
+        is derived on load. Start empty and ingest(), or use build() / from_neo4j() / load().
+        papers: Paper records (arxiv_id, title, abstract, date_published, category) by node position
+        authors, affiliations: Author names and affiliations by node position
+        topics: Topic names by node position
+        edges: 'cites', 'authored' and 'categorized' CSR adjacency
+        """
+        self.papers = papers if papers is not None else MetadataStore()
+        self.authors = list(authors or [])
+        self.affiliations = list(affiliations or [""] * len(self.authors))
+        self.topics = list(topics or [])
+        self._overrides: Dict[int, Dict[str, Any]] = {}
+        self._paper_pos = {self.papers.arxiv_id(i): i for i in range(len(self.papers))}
+        self._author_pos = {name: i for i, name in enumerate(self.authors)}
+        self._topic_pos = {name: i for i, name in enumerate(self.topics)}
+        self._set_edges(edges or {})
+
+    def _set_edges(self, edges: Dict[str, _Csr]) -> None:
+        n_papers, n_authors, n_topics = len(self.papers), len(self.authors), len(self.topics)
+        empty = lambda n: _Csr(np.zeros(n + 1, dtype="int64"), np.zeros(0, dtype="int32"))
+        self.cites = edges.get("cites") or empty(n_papers)
+        self.authored = edges.get("authored") or empty(n_authors)
+        self.categorized = edges.get("categorized") or empty(n_topics)
+        self.cited_by = self.cites.transpose(n_papers)
+        self.paper_authors = self.authored.transpose(n_papers)
+        self.paper_topics = self.categorized.transpose(n_papers)
+        self._author_names = np.array([normalize_name(name) for name in self.authors], dtype=str)
+
+    def __len__(self) -> int:
+        return len(self.papers)
+
+    def paper(self, pos: int) -> Dict[str, Any]:
+        return self._overrides.get(pos) or self.papers[pos]
+
+    def position(self, arxiv_id: str) -> Optional[int]:
+        return self._paper_pos.get(arxiv_id)
+
+    @staticmethod
+    def _as_stored(record: Dict[str, Any]) -> Dict[str, Any]:
+        """record as MetadataStore would return it (values JSON-encoded, dates as strings)."""
+        return json.loads(json.dumps(record, default=str))
+
+    def _node(self, table: Dict[str, int], names: List[str], name: str) -> int:
+        pos = table.get(name)
+        if pos is None:
+            pos = table[name] = len(names)
+            names.append(name)
+        return pos
+
+    def add(self, papers: Iterable[Dict[str, Any]] = (), authors: Iterable[Tuple[str, str]] = (),
+            authored: Iterable[Tuple[str, str]] = (), categorized: Iterable[Tuple[str, str]] = (),
+            citations: Iterable[Tuple[str, str]] = ()) -> None:
+        """
+        Merge nodes and edges given by name: paper records, (author, affiliation), (author, arxiv_id),
+        (topic, arxiv_id) and (citing_id, cited_id). Existing nodes keep their position (and an author its
+        first affiliation, like ON CREATE SET); edges to unknown papers are skipped, like MATCH in Cypher.
+        The CSR arrays are rebuilt once, vectorized, at the end.
+        """
+        new_records = []
+        for record in papers:
+            record = {field: record.get(field) for field in PAPER_FIELDS}
+            pos = self._paper_pos.get(record["arxiv_id"])
+            if pos is None:
+                self._paper_pos[record["arxiv_id"]] = len(self.papers) + len(new_records)
+                new_records.append(record)
+            elif pos >= len(self.papers):
+                new_records[pos - len(self.papers)] = record
+            elif self._as_stored(record) == self.papers[pos]:
+                # Unchanged (e.g. a from_neo4j refresh re-reading every paper): keep the stored record
+                self._overrides.pop(pos, None)
+            else:
+                self._overrides[pos] = record
+        self.papers.extend(new_records)
+        for name, affiliation in authors:
+            if name not in self._author_pos:
+                self._node(self._author_pos, self.authors, name)
+                self.affiliations.append(affiliation or "")
+
+        def edge_arrays(pairs, src_pos):
+            src, dst = [], []
+            for a, b in pairs:
+                target = self._paper_pos.get(b)
+                source = src_pos(a)
+                if target is not None and source is not None:
+                    src.append(source)
+                    dst.append(target)
+            return np.array(src, dtype="int64"), np.array(dst, dtype="int64")
+
+        def author_pos(name):
+            if name not in self._author_pos:
+                self.affiliations.append("")
+            return self._node(self._author_pos, self.authors, name)
+
+        new = {
+            "cites": edge_arrays(citations, self._paper_pos.get),
+            "authored": edge_arrays(authored, author_pos),
+            "categorized": edge_arrays(categorized, lambda t: self._node(self._topic_pos, self.topics, t)),
+        }
+        sizes = {"cites": len(self.papers), "authored": len(self.authors), "categorized": len(self.topics)}
+        old = {"cites": self.cites, "authored": self.authored, "categorized": self.categorized}
+        edges = {}
+        for name, (src, dst) in new.items():
+            old_src, old_dst = old[name].edges()
+            edges[name] = _Csr.from_edges(np.concatenate([old_src, src]), np.concatenate([old_dst, dst]),
+                                          sizes[name], len(self.papers))
+        self._set_edges(edges)
+
+    def ingest(self, papers: Iterable[Dict[str, Any]] = (), citations: Iterable[Tuple[str, ...]] = ()) -> None:
+        """
+        Add papers in the KnowledgeGraph.add_papers format (authors, categories, publication_date,
+        primary_category) and (citing_id, cited_id[, context]) citations. This is also the refresh path
+        for newly ingested data.
+        """
+        records, authors, authored, categorized = [], [], [], []
+        for paper in papers:
+            records.append({
+                "arxiv_id": paper["arxiv_id"],
+                "title": paper.get("title"),
+                "abstract": paper.get("abstract"),
+                "date_published": paper.get("publication_date"),
+                "category": paper.get("primary_category"),
+            })
+            for author in paper.get("authors", []):
+                authors.append((author["full_name"], author.get("affiliation", "")))
+                authored.append((author["full_name"], paper["arxiv_id"]))
+            categorized.extend((category, paper["arxiv_id"]) for category in paper.get("categories", []))
+        self.add(records, authors, authored, categorized, [(c[0], c[1]) for c in citations])
+        logger.info(f"Graph index has {len(self.papers)} papers, {len(self.authors)} authors, {len(self.topics)} topics, "
+                    f"{len(self.cites.indices)} citations")
+
+    @classmethod
+    def build(cls, papers: Iterable[Dict[str, Any]], citations: Iterable[Tuple[str, ...]] = ()) -> "GraphIndex":
+        index = cls()
+        index.ingest(papers, citations)
+        return index
+
+    @classmethod
+    def from_neo4j(cls, driver, index: Optional["GraphIndex"] = None) -> "GraphIndex":
+        """Load (or, given an existing index, refresh) the graph from a Neo4j driver."""
+        index = index or cls()
+        with driver.session() as session:
+            papers = [r.data() for r in session.run(
+                "MATCH (p:Paper) RETURN p.arxiv_id AS arxiv_id, p.title AS title, p.abstract AS abstract, "
+                "p.date_published AS date_published, p.category AS category")]
+            authors = [(r["name"], r["affiliation"]) for r in session.run(
+                "MATCH (a:Author) RETURN a.name AS name, a.affiliation AS affiliation")]
+            authored = [(r["author"], r["paper"]) for r in session.run(
+                "MATCH (a:Author)-[:AUTHORED]->(p:Paper) RETURN a.name AS author, p.arxiv_id AS paper")]
+            categorized = [(r["topic"], r["paper"]) for r in session.run(
+                "MATCH (p:Paper)-[:CATEGORIZED_AS]->(t:Topic) RETURN t.name AS topic, p.arxiv_id AS paper")]
+            citations = [(r["citing"], r["cited"]) for r in session.run(
+                "MATCH (a:Paper)-[:CITES]->(b:Paper) RETURN a.arxiv_id AS citing, b.arxiv_id AS cited")]
+        index.add(papers, authors, authored, categorized, citations)
+        logger.info(f"Loaded {len(papers)} papers and {len(citations)} citations from Neo4j")
+        return index
+
+    def _result(self, pos: int, **extra) -> Dict[str, Any]:
+        record = self.paper(pos)
+        return dict({"id": record["arxiv_id"], "source": record}, **extra)
+
+    def related_papers(self, paper_id: str, max_depth: int = 2, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Papers citing or cited by the paper within max_depth hops (closest first), then papers sharing
+        the most topics with it. Topic overlap is counted with one bincount, so hub topics stay cheap.
+        """
+        start = self.position(paper_id)
+        if start is None:
+            return []
+        seen = np.zeros(len(self.papers), dtype=bool)
+        seen[start] = True
+        found = []  # (positions, extra fields) groups in result order; dicts are only built for the top `limit`
+        # Both directions advance one hop at a time, so every hop-h paper ranks ahead of any hop-(h+1) paper
+        frontiers = {"cites": np.array([start]), "cited_by": np.array([start])}
+        for hops in range(1, max_depth + 1):
+            for relation, csr in (("cites", self.cites), ("cited_by", self.cited_by)):
+                frontier = np.unique(csr.gather(frontiers[relation]))
+                frontier = frontiers[relation] = frontier[~seen[frontier]]
+                seen[frontier] = True
+                found.extend((int(p), {"relation": relation, "hops": hops}) for p in frontier[:limit])
+            if len(found) >= limit:
+                break
+        if len(found) < limit:
+            shared = np.bincount(self.categorized.gather(self.paper_topics.row(start)), minlength=len(self.papers))
+            shared[seen] = 0
+            candidates = np.flatnonzero(shared)
+            take = min(limit - len(found), len(candidates))
+            if take:
+                top = candidates[np.argpartition(-shared[candidates], take - 1)[:take]]
+                top = top[np.lexsort((top, -shared[top]))]
+                found.extend((int(p), {"relation": "topic", "shared_topics": int(shared[p])}) for p in top)
+        return [self._result(pos, **extra) for pos, extra in found[:limit]]
+
+    def collaborators(self, author_name: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Co-authors of the author by number of shared papers, like KnowledgeGraph.query_author_collaborators."""
+        author = self._author_pos.get(author_name)
+        if author is None:
+            return []
+        counts = np.bincount(self.paper_authors.gather(self.authored.row(author)), minlength=len(self.authors))
+        counts[author] = 0
+        found = np.flatnonzero(counts)
+        found = found[np.lexsort((found, -counts[found]))][:limit]
+        return [{"name": self.authors[a], "affiliation": self.affiliations[a], "collaboration_count": int(counts[a])}
+                for a in found]
+
+    def papers_by_author(self, author: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Papers of authors whose normalized name contains the normalized string, prefix matches first."""
+        author = normalize_name(author)
+        if not len(self._author_names) or not author:
+            return []
+        found = np.char.find(self._author_names, author)
+        matches = np.flatnonzero(found == 0).tolist() + np.flatnonzero(found > 0).tolist()
+        results = []
+        for a in matches:
+            for p in self.authored.row(a):
+                results.append(self._result(int(p), author=self.authors[a]))
+                if len(results) >= limit:
+                    return results
+        return results
+
+    def neighbourhood(self, paper_id: str, k: int = 2, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Papers within k citation hops in either direction, ordered by distance."""
+        start = self.position(paper_id)
+        if start is None:
+            return []
+        seen = np.zeros(len(self.papers), dtype=bool)
+        seen[start] = True
+        frontier, results = np.array([start]), []
+        for hops in range(1, k + 1):
+            frontier = np.unique(np.concatenate([self.cites.gather(frontier), self.cited_by.gather(frontier)]))
+            frontier = frontier[~seen[frontier]]
+            if not len(frontier):
+                break
+            seen[frontier] = True
+            results.extend(self._result(int(p), hops=hops) for p in frontier)
+            if limit is not None and len(results) >= limit:
+                return results[:limit]
+        return results
+
+    def save(self, path: str) -> None:
+        """Write adjacency and node names to path (.npz) and paper records to <path>.papers.cmeta."""
+        arrays = {
+            "authors": np.array(self.authors, dtype=str),
+            "affiliations": np.array(self.affiliations, dtype=str),
+            "topics": np.array(self.topics, dtype=str),
+        }
+        for name in ("cites", "authored", "categorized"):
+            csr = getattr(self, name)
+            arrays[f"{name}__indptr"] = csr.indptr
+            arrays[f"{name}__indices"] = csr.indices
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        write_metadata_store(f"{path}.papers.cmeta", (self.paper(i) for i in range(len(self.papers))))
+        os.replace(tmp_path, path)
+        logger.info(f"Saved graph index with {len(self.papers)} papers to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "GraphIndex":
+        papers = MetadataStore(f"{path}.papers.cmeta")
+        with np.load(path) as data:
+            edges = {name: _Csr(data[f"{name}__indptr"], data[f"{name}__indices"])
+                     for name in ("cites", "authored", "categorized")}
+            index = cls(papers, data["authors"].tolist(), data["affiliations"].tolist(), data["topics"].tolist(), edges)
+        logger.info(f"Loaded graph index with {len(papers)} papers from {path}")
+        return index
+
+def read_records(path: str) -> List[Dict[str, Any]]:
+    """Records from a JSONL file or a JSON/pickle metadata file."""
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    return load_legacy_metadata(path)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Build from paper records (KnowledgeGraph.add_papers format)")
+    build.add_argument("source", help="Papers as .jsonl, .json or .pkl")
+    build.add_argument("output", help="Index file (.npz)")
+    build.add_argument("--citations", help="JSONL of {\"citing_id\", \"cited_id\"} records")
+    neo4j = commands.add_parser("from-neo4j", help="Export the Neo4j graph")
+    neo4j.add_argument("output", help="Index file (.npz)")
+    neo4j.add_argument("--uri", default=os.environ.get("NEO4J_URI", "bolt://localhost:7687"))
+    neo4j.add_argument("--user", default=os.environ.get("NEO4J_USER", "neo4j"))
+    neo4j.add_argument("--password", default=os.environ.get("NEO4J_PASSWORD", "password"))
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        citations = [(c["citing_id"], c["cited_id"]) for c in read_records(args.citations)] if args.citations else []
+        index = GraphIndex.build(read_records(args.source), citations)
+    else:
+        from neo4j import GraphDatabase
+        driver = GraphDatabase.driver(args.uri, auth=(args.user, args.password))
+        try:
+            index = GraphIndex.from_neo4j(driver)
+        finally:
+            driver.close()
+    index.save(args.output)
+    print(f"Indexed {len(index)} papers, {len(index.authors)} authors, {len(index.cites.indices)} citations into {args.output}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
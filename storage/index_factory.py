@@ -0,0 +1,111 @@
+import logging
+from typing import Dict, Any, Optional
+import numpy as np
+import faiss
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "fp16", "sq8", "ivf_flat", "ivf_pq", "hnsw")
+
+def build_index(dimension: int,
+                index_type: str = "flat",
+                nlist: int = 100,
+                pq_m: int = 8,
+                pq_nbits: int = 8,
+                hnsw_m: int = 32,
+                ef_construction: int = 40) -> faiss.Index:
+    """
+    Create an empty L2 index of the requested type.
+    index_type: One of flat, fp16, sq8, ivf_flat, ivf_pq, hnsw
+        (fp16 and sq8 are flat scans over scalar-quantized codes: 2 and 1 bytes per dimension)
+    nlist: Number of IVF cells (ivf_flat, ivf_pq)
+    pq_m, pq_nbits: Product quantizer sub-vectors and bits per code (ivf_pq)
+    hnsw_m, ef_construction: Graph degree and build-time beam width (hnsw)
+    """
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dimension)
+    if index_type == "fp16":
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+    if index_type == "sq8":
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+    if index_type == "ivf_flat":
+        return faiss.IndexIVFFlat(faiss.IndexFlatL2(dimension), dimension, nlist, faiss.METRIC_L2)
+    if index_type == "ivf_pq":
+        if dimension % pq_m != 0:
+            raise ValueError(f"pq_m={pq_m} must divide the embedding dimension {dimension}")
+        return faiss.IndexIVFPQ(faiss.IndexFlatL2(dimension), dimension, nlist, pq_m, pq_nbits)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+        return index
+    raise ValueError(f"Unknown index type '{index_type}', expected one of {', '.join(INDEX_TYPES)}")
+
+def base_index(index: faiss.Index) -> faiss.Index:
+    """Return the innermost index, unwrapping ID maps and other wrappers."""
+    index = faiss.downcast_index(index)
+    while hasattr(index, "index") and isinstance(getattr(index, "index"), faiss.Index):
+        index = faiss.downcast_index(index.index)
+    return index
+
+def ivf_ids(index: faiss.Index) -> np.ndarray:
+    """Ids stored in an IVF index, inverted list by inverted list."""
+    ivf = faiss.extract_index_ivf(index)
+    invlists = ivf.invlists
+    parts = [np.zeros(0, dtype="int64")]
+    for list_no in range(ivf.nlist):
+        size = invlists.list_size(list_no)
+        if size:
+            ids = invlists.get_ids(list_no)
+            parts.append(faiss.rev_swig_ptr(ids, size).copy())
+            invlists.release_ids(list_no, ids)
+    return np.concatenate(parts)
+
+def is_compressed(index: faiss.Index) -> bool:
+    """True if the index stores lossy codes rather than the original float32 vectors."""
+    inner = base_index(index)
+    return isinstance(inner, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer,
+                              faiss.IndexPQ, faiss.IndexIVFPQ))
+
+def train_index(index: faiss.Index, vectors: np.ndarray, sample_size: Optional[int] = 50000, seed: int = 0) -> None:
+    """Train the index on a random sample of vectors if it requires training."""
+    if index.is_trained:
+        return
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    if sample_size and len(vectors) > sample_size:
+        rng = np.random.default_rng(seed)
+        vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and len(vectors) < ivf.nlist:
+        raise ValueError(f"Need at least nlist={ivf.nlist} training vectors, got {len(vectors)}")
+    logger.info(f"Training {type(base_index(index)).__name__} on {len(vectors)} vectors")
+    index.train(vectors)
+
+def set_search_params(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> None:
+    """
+    Apply runtime search knobs. They are stored in the index itself,
+    so they are persisted by faiss.write_index and restored by faiss.read_index.
+    """
+    if not isinstance(index, faiss.Index):
+        return
+    if nprobe is not None:
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.nprobe = nprobe
+    if ef_search is not None:
+        inner = base_index(index)
+        if isinstance(inner, faiss.IndexHNSW):
+            inner.hnsw.efSearch = ef_search
+
+def get_search_params(index: faiss.Index) -> Dict[str, Any]:
+    """Describe the index type and its current runtime knobs."""
+    if not isinstance(index, faiss.Index):
+        return {'type': type(index).__name__}
+    inner = base_index(index)
+    params: Dict[str, Any] = {'type': type(inner).__name__}
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        params['nlist'] = ivf.nlist
+        params['nprobe'] = ivf.nprobe
+    if isinstance(inner, faiss.IndexHNSW):
+        params['ef_search'] = inner.hnsw.efSearch
+    return params
@@ -1,13 +1,21 @@
 import os
+import time
 import logging
-from typing import Dict, Any, List, Optional
+from itertools import islice
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 from neo4j import GraphDatabase
+from storage.author_names import normalize_name
 
 logger = logging.getLogger(__name__)
 
 class KnowledgeGraph:
-    def __init__(self, uri: Optional[str] = None, user: Optional[str] = None, password: Optional[str] = None):
-        """Initialize connection to Neo4j database."""
+    def __init__(self, uri: Optional[str] = None, user: Optional[str] = None, password: Optional[str] = None,
+                 batch_size: int = 1000):
+        """
+        Initialize connection to Neo4j database.
+        batch_size: Papers or citations per write transaction in add_papers/add_citations
+        """
+        self.batch_size = batch_size
         self.uri = uri or os.environ.get("NEO4J_URI", "bolt://localhost:7687")
         self.user = user or os.environ.get("NEO4J_USER", "neo4j")
         self.password = password or os.environ.get("NEO4J_PASSWORD", "password")
@@ -31,88 +39,143 @@ class KnowledgeGraph:
             session.run("CREATE INDEX paper_title IF NOT EXISTS FOR (p:Paper) ON (p.title)")
             session.run("CREATE INDEX paper_date IF NOT EXISTS FOR (p:Paper) ON (p.date_published)")
             session.run("CREATE INDEX author_affiliation IF NOT EXISTS FOR (a:Author) ON (a.affiliation)")
+            # Author lookups: range index for STARTS WITH on the normalized name, full-text for word matches
+            session.run("CREATE INDEX author_name_normalized IF NOT EXISTS FOR (a:Author) ON (a.name_normalized)")
+            session.run("CREATE FULLTEXT INDEX author_names IF NOT EXISTS FOR (a:Author) ON EACH [a.name] "
+                        "OPTIONS {indexConfig: {`fulltext.analyzer`: 'standard-folding'}}")
             
             logger.info("Neo4j schema initialized with constraints and indexes")
     
     def add_paper(self, paper: Dict[str, Any]) -> None:
         """Add a paper and its relationships to the knowledge graph."""
-        with self.driver.session() as session:
-            # Create paper node
-            session.run("""
-                MERGE (p:Paper {arxiv_id: $arxiv_id})
-                ON CREATE SET 
-                    p.title = $title,
-                    p.abstract = $abstract,
-                    p.date_published = $date_published,
-                    p.category = $primary_category
-                ON MATCH SET
-                    p.title = $title,
-                    p.abstract = $abstract,
-                    p.date_published = $date_published,
-                    p.category = $primary_category
-            """, {
+        self.add_papers([paper])
+        logger.info(f"Added paper {paper['arxiv_id']} to knowledge graph")
+
+    @staticmethod
+    def _write_papers(tx, papers: List[Dict[str, Any]]) -> None:
+        """Write one batch of papers with a fixed number of UNWIND statements, whatever the batch size."""
+        paper_rows, author_rows, institution_rows, topic_rows = [], [], [], []
+        for paper in papers:
+            paper_rows.append({
                 'arxiv_id': paper['arxiv_id'],
                 'title': paper['title'],
                 'abstract': paper['abstract'],
                 'date_published': paper['publication_date'],
                 'primary_category': paper['primary_category']
             })
-            
-            # Create authors and relationships
             for author in paper.get('authors', []):
-                session.run("""
-                    MERGE (a:Author {name: $name})
-                    ON CREATE SET a.affiliation = $affiliation
-                    WITH a
-                    MATCH (p:Paper {arxiv_id: $arxiv_id})
-                    MERGE (a)-[:AUTHORED]->(p)
-                """, {
+                author_rows.append({
                     'name': author['full_name'],
+                    'name_normalized': normalize_name(author['full_name']),
                     'affiliation': author.get('affiliation', ''),
                     'arxiv_id': paper['arxiv_id']
                 })
-                
-                # If affiliation is known, create institution node
+                # If affiliation is known, link the author to an institution node
                 if author.get('affiliation'):
-                    session.run("""
-                        MERGE (i:Institution {name: $institution})
-                        WITH i
-                        MATCH (a:Author {name: $author_name})
-                        MERGE (a)-[:BELONGS_TO]->(i)
-                    """, {
-                        'institution': author['affiliation'],
-                        'author_name': author['full_name']
-                    })
-            
-            # Create topic relationships
+                    institution_rows.append({'institution': author['affiliation'], 'author_name': author['full_name']})
             for category in paper.get('categories', []):
-                session.run("""
-                    MERGE (t:Topic {name: $category})
-                    WITH t
-                    MATCH (p:Paper {arxiv_id: $arxiv_id})
-                    MERGE (p)-[:CATEGORIZED_AS]->(t)
-                """, {
-                    'category': category,
-                    'arxiv_id': paper['arxiv_id']
-                })
-                
-            logger.info(f"Added paper {paper['arxiv_id']} to knowledge graph")
-    
+                topic_rows.append({'category': category, 'arxiv_id': paper['arxiv_id']})
+
+        tx.run("""
+            UNWIND $rows AS row
+            MERGE (p:Paper {arxiv_id: row.arxiv_id})
+            SET p.title = row.title,
+                p.abstract = row.abstract,
+                p.date_published = row.date_published,
+                p.category = row.primary_category
+        """, rows=paper_rows)
+        if author_rows:
+            tx.run("""
+                UNWIND $rows AS row
+                MERGE (a:Author {name: row.name})
+                ON CREATE SET a.affiliation = row.affiliation, a.name_normalized = row.name_normalized
+                WITH a, row
+                MATCH (p:Paper {arxiv_id: row.arxiv_id})
+                MERGE (a)-[:AUTHORED]->(p)
+            """, rows=author_rows)
+        if institution_rows:
+            tx.run("""
+                UNWIND $rows AS row
+                MERGE (i:Institution {name: row.institution})
+                WITH i, row
+                MATCH (a:Author {name: row.author_name})
+                MERGE (a)-[:BELONGS_TO]->(i)
+            """, rows=institution_rows)
+        if topic_rows:
+            tx.run("""
+                UNWIND $rows AS row
+                MERGE (t:Topic {name: row.category})
+                WITH t, row
+                MATCH (p:Paper {arxiv_id: row.arxiv_id})
+                MERGE (p)-[:CATEGORIZED_AS]->(t)
+            """, rows=topic_rows)
+
+    @staticmethod
+    def _write_citations(tx, citations: List[Dict[str, Any]]) -> None:
+        tx.run("""
+            UNWIND $rows AS row
+            MATCH (citing:Paper {arxiv_id: row.citing_id})
+            MATCH (cited:Paper {arxiv_id: row.cited_id})
+            MERGE (citing)-[c:CITES]->(cited)
+            ON CREATE SET c.context = row.context
+        """, rows=citations)
+
+    @staticmethod
+    def _write_normalized_names(tx, rows: List[Dict[str, str]]) -> None:
+        tx.run("""
+            UNWIND $rows AS row
+            MATCH (a:Author {name: row.name})
+            SET a.name_normalized = row.name_normalized
+        """, rows=rows)
+
+    def _write_batches(self, work, rows: Iterable[Any], batch_size: Optional[int], label: str) -> Dict[str, Any]:
+        """Send rows to work(tx, batch) in explicit write transactions of batch_size rows; report throughput."""
+        batch_size = batch_size or self.batch_size
+        rows = iter(rows)
+        total, batches = 0, 0
+        start = time.perf_counter()
+        with self.driver.session() as session:
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                session.execute_write(work, batch)
+                total += len(batch)
+                batches += 1
+                elapsed = time.perf_counter() - start
+                logger.info(f"Wrote {total} {label} in {batches} transactions ({total / max(elapsed, 1e-9):.0f} {label}/s)")
+        elapsed = time.perf_counter() - start
+        return {label: total, 'batches': batches, 'seconds': elapsed, 'per_second': total / max(elapsed, 1e-9)}
+
+    def add_papers(self, papers: Iterable[Dict[str, Any]], batch_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Add papers and their relationships in batches. Each batch is one write transaction of at most
+        four UNWIND statements (papers, authors, institutions, topics), so round trips no longer grow
+        with the number of authors or categories.
+        Returns {'papers', 'batches', 'seconds', 'per_second'}.
+        """
+        return self._write_batches(self._write_papers, papers, batch_size, "papers")
+
+    def backfill_normalized_names(self, batch_size: Optional[int] = None) -> Dict[str, Any]:
+        """Set name_normalized on authors ingested before it existed, so prefix lookups find them."""
+        with self.driver.session() as session:
+            names = [record["name"] for record in
+                     session.run("MATCH (a:Author) WHERE a.name_normalized IS NULL RETURN a.name AS name")]
+        rows = ({'name': name, 'name_normalized': normalize_name(name)} for name in names)
+        return self._write_batches(self._write_normalized_names, rows, batch_size, 'authors')
+
     def add_citation(self, citing_paper_id: str, cited_paper_id: str, context: Optional[str] = None) -> None:
         """Add citation relationship between papers."""
-        with self.driver.session() as session:
-            session.run("""
-                MATCH (citing:Paper {arxiv_id: $citing_id})
-                MATCH (cited:Paper {arxiv_id: $cited_id})
-                MERGE (citing)-[c:CITES]->(cited)
-                ON CREATE SET c.context = $context
-            """, {
-                'citing_id': citing_paper_id,
-                'cited_id': cited_paper_id,
-                'context': context or ''
-            })
-            
-            logger.info(f"Added citation from {citing_paper_id} to {cited_paper_id}")
+        self.add_citations([(citing_paper_id, cited_paper_id, context)])
+        logger.info(f"Added citation from {citing_paper_id} to {cited_paper_id}")
+
+    def add_citations(self, citations: Iterable[Tuple[str, ...]], batch_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Add citations given as (citing_id, cited_id) or (citing_id, cited_id, context) tuples, one UNWIND
+        statement per batch. Returns {'citations', 'batches', 'seconds', 'per_second'}.
+        """
+        rows = ({'citing_id': c[0], 'cited_id': c[1], 'context': (c[2] if len(c) > 2 else None) or ''} for c in citations)
+        return self._write_batches(self._write_citations, rows, batch_size, "citations")
     
     def query_related_papers(self, paper_id: str, max_depth: int = 2, limit: int = 10) -> List[Dict[str, Any]]:
         """Find papers related to the given paper through citations and common topics."""
@@ -0,0 +1,307 @@
+import os
+import re
+import sys
+import json
+import mmap
+import array
+import pickle
+import struct
+import hashlib
+import logging
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"RAGMETA1"
+# magic, record count, arxiv_id column width, reserved, then byte offsets of
+# the blob, sorted key column, row of each sorted key, arxiv_id column and offset table
+_HEADER = struct.Struct("<8sQIIQQQQQ")
+DEFAULT_ID_WIDTH = 32
+
+def arxiv_key(arxiv_id: str) -> int:
+    """Stable non-negative int64 key for an arXiv id; version suffixes (v1, v2, ...) map to the same key."""
+    base_id = re.sub(r"v\d+$", "", arxiv_id.strip())
+    digest = hashlib.blake2b(base_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") & 0x7FFFFFFFFFFFFFFF
+
+def ensure_arxiv_ids(records: List[Dict[str, Any]], sources: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Give records without an arxiv_id a stable generated one ("doc-" + hash of its source).
+    sources defaults to the canonical JSON of each record; callers with document texts pass those.
+    Records that already have an id are returned unchanged, the others as copies.
+    """
+    missing = [i for i, record in enumerate(records) if not record.get("arxiv_id")]
+    if not missing:
+        return records
+    logger.warning(f"{len(missing)} metadata records have no arxiv_id; storing them under generated ids")
+    records = list(records)
+    for i in missing:
+        source = sources[i] if sources is not None else json.dumps(records[i], sort_keys=True, default=str)
+        digest = hashlib.blake2b(source.encode("utf-8"), digest_size=8).hexdigest()
+        records[i] = {**records[i], "arxiv_id": f"doc-{digest}"}
+    return records
+
+def _pad(f) -> None:
+    f.write(b"\0" * (-f.tell() % 8))
+
+def write_metadata_store(path: str, records: Iterable[Dict[str, Any]], id_width: int = DEFAULT_ID_WIDTH) -> int:
+    """
+    Stream records into a columnar metadata file and return the number written.
+    Each record is stored as compact JSON in a text blob; ids and offsets are fixed-width columns.
+    """
+    id_width = id_width + (-id_width % 8)
+    keys = array.array("q")
+    offsets = array.array("Q", [0])
+    ids: List[bytes] = []
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"\0" * _HEADER.size)
+        blob_offset = f.tell()
+        for record in records:
+            arxiv_id = str(record.get("arxiv_id", ""))
+            encoded_id = arxiv_id.encode("utf-8")
+            if len(encoded_id) > id_width:
+                raise ValueError(f"arxiv_id '{arxiv_id}' is longer than the {id_width}-byte id column")
+            f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8"))
+            offsets.append(f.tell() - blob_offset)
+            keys.append(arxiv_key(arxiv_id) if arxiv_id else len(keys))
+            ids.append(encoded_id)
+        count = len(keys)
+        key_array = np.frombuffer(keys, dtype="int64") if count else np.zeros(0, dtype="int64")
+        order = np.argsort(key_array, kind="stable").astype("int64")
+        _pad(f)
+        keys_offset = f.tell()
+        f.write(key_array[order].tobytes())
+        order_offset = f.tell()
+        f.write(order.tobytes())
+        ids_offset = f.tell()
+        f.write(np.array(ids, dtype=f"S{id_width}").tobytes())
+        _pad(f)
+        offsets_offset = f.tell()
+        f.write(np.frombuffer(offsets, dtype="uint64").tobytes())
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, count, id_width, 0, blob_offset, keys_offset,
+                             order_offset, ids_offset, offsets_offset))
+    os.replace(tmp_path, path)
+    logger.info(f"Wrote {count} metadata records to {path}")
+    return count
+
+class MetadataStore:
+    def __init__(self, path: Optional[str] = None):
+        """
+        Memory-mapped columnar metadata. get(idx) is O(1): two offset reads and one JSON decode.
+        Records appended with extend() are kept in memory until save().
+        path: Metadata file to open (optional, None starts an empty store)
+        """
+        self.path = path
+        self._pending: List[Dict[str, Any]] = []
+        self._file = None
+        self._mmap = None
+        self._count = 0
+        if path and os.path.exists(path):
+            self._open(path)
+
+    def _open(self, path: str) -> None:
+        self._file = open(path, "rb")
+        if os.fstat(self._file.fileno()).st_size == 0:
+            raise ValueError(f"{path} is empty")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, count, id_width, _, blob_offset, keys_offset, order_offset,
+         ids_offset, offsets_offset) = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a columnar metadata file")
+        self._count = count
+        self._blob_offset = blob_offset
+        self._sorted_keys = np.frombuffer(self._mmap, dtype="int64", count=count, offset=keys_offset)
+        self._order = np.frombuffer(self._mmap, dtype="int64", count=count, offset=order_offset)
+        self._ids = np.frombuffer(self._mmap, dtype=f"S{id_width}", count=count, offset=ids_offset)
+        self._offsets = np.frombuffer(self._mmap, dtype="uint64", count=count + 1, offset=offsets_offset)
+
+    def __len__(self) -> int:
+        return self._count + len(self._pending)
+
+    def __getitem__(self, idx: int) -> Dict[str, Any]:
+        record = self.get(idx)
+        if record is None:
+            raise IndexError(f"metadata index {idx} out of range")
+        return record
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for idx in range(len(self)):
+            yield self.get(idx)
+
+    def get(self, idx: int) -> Optional[Dict[str, Any]]:
+        """Decode the record at row idx, or None if out of range."""
+        idx = int(idx)
+        if 0 <= idx < self._count:
+            start = self._blob_offset + int(self._offsets[idx])
+            end = self._blob_offset + int(self._offsets[idx + 1])
+            return json.loads(self._mmap[start:end].decode("utf-8"))
+        if self._count <= idx < len(self):
+            return dict(self._pending[idx - self._count])
+        return None
+
+    def arxiv_id(self, idx: int) -> Optional[str]:
+        """Read the arxiv_id column without decoding the record."""
+        idx = int(idx)
+        if 0 <= idx < self._count:
+            return self._ids[idx].decode("utf-8")
+        if self._count <= idx < len(self):
+            return self._pending[idx - self._count].get("arxiv_id")
+        return None
+
+    def position_of(self, arxiv_id: str) -> Optional[int]:
+        """Row of the record with this arxiv_id (any version), via binary search on the key column."""
+        return self.position_of_key(arxiv_key(arxiv_id))
+
+    def position_of_key(self, key: int) -> Optional[int]:
+        """Row of the record with this arxiv_key, or None."""
+        if self._count:
+            pos = int(np.searchsorted(self._sorted_keys, key))
+            if pos < self._count and self._sorted_keys[pos] == key:
+                return int(self._order[pos])
+        for i, record in enumerate(self._pending):
+            if record.get("arxiv_id") and arxiv_key(record["arxiv_id"]) == key:
+                return self._count + i
+        return None
+
+    def extend(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Append records; they are readable immediately and written on save()."""
+        self._pending.extend(records)
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Write all rows (mapped and pending) to path, then reopen it."""
+        path = path or self.path
+        if not path:
+            raise ValueError("No path given to save metadata to")
+        tmp_path = f"{path}.new"
+        write_metadata_store(tmp_path, iter(self))
+        self.close()
+        os.replace(tmp_path, path)
+        self.path = path
+        self._pending = []
+        self._open(path)
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            # Drop numpy views before closing the map they point into
+            self._sorted_keys = self._order = self._ids = self._offsets = None
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+            self._file = None
+            self._count = 0
+
+class KeyedMetadataStore:
+    def __init__(self, base: Optional[MetadataStore] = None):
+        """
+        Metadata addressed by arxiv_key instead of row position.
+        Reads fall through to the memory-mapped base snapshot; upserts and deletes
+        are held in an in-memory overlay until save() writes a new snapshot.
+        """
+        self.base = base or MetadataStore()
+        self._overlay: Dict[int, Dict[str, Any]] = {}
+        # Keys present in the base snapshot that were replaced or deleted since it was written
+        self._shadowed: set = set()
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> "KeyedMetadataStore":
+        store = cls()
+        store.upsert(records)
+        return store
+
+    def __len__(self) -> int:
+        return len(self.base) - len(self._shadowed) + len(self._overlay)
+
+    def __contains__(self, key: int) -> bool:
+        key = int(key)
+        if key in self._overlay:
+            return True
+        return key not in self._shadowed and self.base.position_of_key(key) is not None
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for _, record in self.items():
+            yield record
+
+    def get(self, key: int) -> Optional[Dict[str, Any]]:
+        """Record stored under key, or None."""
+        key = int(key)
+        if key in self._overlay:
+            return dict(self._overlay[key])
+        if key in self._shadowed:
+            return None
+        pos = self.base.position_of_key(key)
+        return None if pos is None else self.base.get(pos)
+
+    def items(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield (key, record) for every live record: snapshot rows first, then overlay entries."""
+        for idx in range(len(self.base)):
+            key = arxiv_key(self.base.arxiv_id(idx))
+            if key not in self._shadowed:
+                yield key, self.base.get(idx)
+        for key, record in self._overlay.items():
+            yield key, dict(record)
+
+    def upsert(self, records: Iterable[Dict[str, Any]]) -> List[int]:
+        """Insert or replace records by arxiv_id. Returns their keys in input order."""
+        keys = []
+        for record in records:
+            if not record.get("arxiv_id"):
+                raise ValueError("Keyed metadata records need an arxiv_id")
+            key = arxiv_key(record["arxiv_id"])
+            if self.base.position_of_key(key) is not None:
+                self._shadowed.add(key)
+            self._overlay[key] = dict(record)
+            keys.append(key)
+        return keys
+
+    def delete(self, keys: Iterable[int]) -> int:
+        """Remove records by key. Returns how many existed."""
+        removed = 0
+        for key in keys:
+            key = int(key)
+            if key in self:
+                removed += 1
+            self._overlay.pop(key, None)
+            if self.base.position_of_key(key) is not None:
+                self._shadowed.add(key)
+        return removed
+
+    def save(self, path: str) -> None:
+        """Write all live records as a new columnar snapshot and reopen it as the base."""
+        tmp_path = f"{path}.new"
+        write_metadata_store(tmp_path, iter(self))
+        self.base.close()
+        os.replace(tmp_path, path)
+        self.base = MetadataStore(path)
+        self._overlay = {}
+        self._shadowed = set()
+
+    def close(self) -> None:
+        self.base.close()
+
+def load_legacy_metadata(path: str) -> List[Dict[str, Any]]:
+    """Read a JSON list/dict, pickle or .npy metadata file into a list ordered by index position."""
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    elif path.endswith(".npy"):
+        data = np.load(path, allow_pickle=True).item()
+    else:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+    if isinstance(data, dict):
+        return [data[k] for k in sorted(data, key=int)]
+    return list(data)
+
+def convert(src: str, dst: str) -> int:
+    """Convert faiss_meta.json / VectorStore pickle metadata to the columnar format."""
+    return write_metadata_store(dst, load_legacy_metadata(src))
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 4 or sys.argv[1] != "convert":
+        print("Usage: python -m storage.metadata_store convert <faiss_meta.json|metadata.pkl> <out.cmeta>")
+        sys.exit(1)
+    convert(sys.argv[2], sys.argv[3])
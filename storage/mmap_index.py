@@ -0,0 +1,74 @@
+import struct
+import logging
+from typing import Tuple
+import numpy as np
+import faiss
+
+logger = logging.getLogger(__name__)
+
+# FAISS fourcc headers of IndexFlatL2 / IndexFlatIP files
+_FLAT_HEADERS = {b"IxF2": faiss.METRIC_L2, b"IxFI": faiss.METRIC_INNER_PRODUCT}
+# fourcc, d (int32), ntotal (int64), two reserved int64, is_trained (bool), metric_type (int32), code count (uint64)
+_FLAT_LAYOUT = struct.Struct("<4siqqq?iQ")
+
+class MmapFlatIndex:
+    """
+    Read-only flat index whose vectors stay in the memory-mapped FAISS file.
+    FAISS's own IO_FLAG_MMAP only covers IVF inverted lists, so flat files are
+    mapped directly and searched with faiss.knn. Pages are shared through the
+    OS page cache by every process that opens the same file.
+    """
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            header = f.read(_FLAT_LAYOUT.size)
+        fourcc, d, ntotal, _, _, _, _, count = _FLAT_LAYOUT.unpack(header)
+        if fourcc not in _FLAT_HEADERS:
+            raise ValueError(f"{path} is not a flat FAISS index")
+        if count != d * ntotal:
+            raise ValueError(f"{path} is truncated: expected {d * ntotal} floats, header says {count}")
+        self.path = path
+        self.d = d
+        self.ntotal = ntotal
+        self.metric_type = _FLAT_HEADERS[fourcc]
+        self.is_trained = True
+        self.xb = np.memmap(path, dtype="float32", mode="r", offset=_FLAT_LAYOUT.size, shape=(ntotal, d))
+
+    def search(self, x: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self._knn(np.ascontiguousarray(x, dtype="float32"), self.xb, k)
+
+    def search_rows(self, x: np.ndarray, k: int, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Search only the given row positions; only those rows are read from the mapping."""
+        D, I = self._knn(np.ascontiguousarray(x, dtype="float32"), np.ascontiguousarray(self.xb[rows]), k)
+        return D, np.where(I >= 0, rows[np.maximum(I, 0)], -1)
+
+    def _knn(self, x: np.ndarray, xb: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        kk = min(k, len(xb))
+        if kk == 0:
+            return np.full((len(x), k), np.inf, dtype="float32"), np.full((len(x), k), -1, dtype="int64")
+        D, I = faiss.knn(x, xb, kk, metric=self.metric_type)
+        if kk < k:
+            fill = -np.inf if self.metric_type == faiss.METRIC_INNER_PRODUCT else np.inf
+            D = np.hstack([D, np.full((len(x), k - kk), fill, dtype="float32")])
+            I = np.hstack([I, np.full((len(x), k - kk), -1, dtype="int64")])
+        return D, I
+
+    def reconstruct_n(self, i0: int, ni: int) -> np.ndarray:
+        return np.array(self.xb[i0:i0 + ni])
+
+    def reconstruct(self, key: int) -> np.ndarray:
+        return np.array(self.xb[key])
+
+def read_index(path: str, mmap: bool = False):
+    """
+    Load a FAISS index. With mmap=True the index data is mapped read-only instead of copied into RAM:
+    flat indexes through MmapFlatIndex, other types through FAISS's IO_FLAG_MMAP.
+    """
+    if not mmap:
+        return faiss.read_index(path)
+    with open(path, "rb") as f:
+        fourcc = f.read(4)
+    if fourcc in _FLAT_HEADERS:
+        logger.info(f"Memory-mapping flat index {path}")
+        return MmapFlatIndex(path)
+    logger.info(f"Opening {path} with FAISS mmap I/O flags")
+    return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
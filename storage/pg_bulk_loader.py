@@ -0,0 +1,266 @@
+"""
+Bulk load papers, authors, topics and citations into the storage/db_setup Postgres schema.
+
+Rows are streamed once into CSV spool files, sent with COPY FROM STDIN into temporary staging
+tables, and merged into papers, authors, paper_authors, topics, paper_topics and citations with
+one set-based INSERT ... SELECT per table. For large loads, secondary indexes of the target tables
+are dropped first and rebuilt once at the end.
+
+    python -m storage.pg_bulk_loader papers.jsonl --citations citations.jsonl --db-url postgresql://...
+"""
+import os
+import csv
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from sqlalchemy.engine import Engine
+
+from storage.author_names import normalize_name
+from storage.db_setup import get_engine, setup_database
+
+logger = logging.getLogger(__name__)
+
+TARGET_TABLES = ("papers", "authors", "paper_authors", "topics", "paper_topics", "citations")
+
+# Staging tables (dropped at commit) and their CSV columns, in COPY order
+STAGING_TABLES = {
+    "stage_papers": "arxiv_id text, title text, abstract text, full_text text, date_published timestamp, category text",
+    "stage_paper_authors": "arxiv_id text, name text, name_normalized text, affiliation text, position integer",
+    "stage_paper_topics": "arxiv_id text, topic text",
+    "stage_citations": "citing_id text, cited_id text, context_snippet text, citation_type text",
+}
+
+# One set-based statement per target table, in foreign-key order
+UPSERTS = [
+    ("papers", """
+        INSERT INTO papers (arxiv_id, title, abstract, full_text, date_published, category, citation_count)
+        SELECT DISTINCT ON (arxiv_id) arxiv_id, coalesce(title, ''), abstract, full_text, date_published, category, 0
+        FROM stage_papers
+        ORDER BY arxiv_id
+        ON CONFLICT (arxiv_id) DO UPDATE SET
+            title = EXCLUDED.title,
+            abstract = coalesce(EXCLUDED.abstract, papers.abstract),
+            full_text = coalesce(EXCLUDED.full_text, papers.full_text),
+            date_published = coalesce(EXCLUDED.date_published, papers.date_published),
+            category = coalesce(EXCLUDED.category, papers.category)
+    """),
+    ("authors", """
+        INSERT INTO authors (name, name_normalized, affiliation, verified)
+        SELECT DISTINCT ON (s.name) s.name, s.name_normalized, nullif(s.affiliation, ''), 0
+        FROM stage_paper_authors s
+        LEFT JOIN authors a ON a.name = s.name
+        WHERE a.id IS NULL
+        ORDER BY s.name, s.affiliation DESC NULLS LAST
+    """),
+    ("paper_authors", """
+        INSERT INTO paper_authors (paper_id, author_id, position, corresponding)
+        SELECT DISTINCT ON (p.id, a.id) p.id, a.id, s.position, 0
+        FROM stage_paper_authors s
+        JOIN papers p ON p.arxiv_id = s.arxiv_id
+        JOIN (SELECT name, min(id) AS id FROM authors GROUP BY name) a ON a.name = s.name
+        LEFT JOIN paper_authors pa ON pa.paper_id = p.id AND pa.author_id = a.id
+        WHERE pa.id IS NULL
+        ORDER BY p.id, a.id, s.position
+    """),
+    ("topics", """
+        INSERT INTO topics (name)
+        SELECT DISTINCT s.topic
+        FROM stage_paper_topics s
+        LEFT JOIN topics t ON t.name = s.topic
+        WHERE t.id IS NULL
+    """),
+    ("paper_topics", """
+        INSERT INTO paper_topics (paper_id, topic_id, relevance_score)
+        SELECT DISTINCT p.id, t.id, 1.0
+        FROM stage_paper_topics s
+        JOIN papers p ON p.arxiv_id = s.arxiv_id
+        JOIN (SELECT name, min(id) AS id FROM topics GROUP BY name) t ON t.name = s.topic
+        LEFT JOIN paper_topics pt ON pt.paper_id = p.id AND pt.topic_id = t.id
+        WHERE pt.id IS NULL
+    """),
+    ("citations", """
+        INSERT INTO citations (citing_paper_id, cited_paper_id, context_snippet, citation_type)
+        SELECT DISTINCT ON (citing.id, cited.id) citing.id, cited.id, nullif(s.context_snippet, ''),
+               nullif(s.citation_type, '')
+        FROM stage_citations s
+        JOIN papers citing ON citing.arxiv_id = s.citing_id
+        JOIN papers cited ON cited.arxiv_id = s.cited_id
+        LEFT JOIN citations c ON c.citing_paper_id = citing.id AND c.cited_paper_id = cited.id
+        WHERE c.id IS NULL
+        ORDER BY citing.id, cited.id
+    """),
+]
+
+# Keep papers.citation_count in step with the citations table for papers cited in this load
+UPDATE_CITATION_COUNTS = """
+    UPDATE papers SET citation_count = counts.n
+    FROM (
+        SELECT c.cited_paper_id, count(*) AS n FROM citations c
+        WHERE c.cited_paper_id IN (SELECT p.id FROM papers p JOIN stage_citations s ON p.arxiv_id = s.cited_id)
+        GROUP BY c.cited_paper_id
+    ) counts
+    WHERE papers.id = counts.cited_paper_id
+"""
+
+# Non-unique, non-primary-key indexes of the target tables: safe to drop while loading
+SECONDARY_INDEXES = """
+    SELECT i.relname, pg_get_indexdef(ix.indexrelid)
+    FROM pg_index ix
+    JOIN pg_class i ON i.oid = ix.indexrelid
+    JOIN pg_class t ON t.oid = ix.indrelid
+    JOIN pg_namespace n ON n.oid = t.relnamespace
+    WHERE t.relname = ANY(%s) AND n.nspname = current_schema()
+      AND NOT ix.indisunique AND NOT ix.indisprimary
+"""
+
+def _author_name(author: Any) -> Tuple[str, str]:
+    """(name, affiliation) of an author given as a KnowledgeGraph-style dict or a plain name."""
+    if isinstance(author, dict):
+        return author.get("full_name") or author.get("name") or "", author.get("affiliation") or ""
+    return str(author), ""
+
+class PostgresBulkLoader:
+    def __init__(self, db_uri: Optional[str] = None, engine: Optional[Engine] = None,
+                 defer_indexes_over: Optional[int] = 100000, spool_bytes: int = 64 * 1024 * 1024):
+        """
+        db_uri: Postgres URL (psycopg2 driver); ignored if engine is given
+        defer_indexes_over: Drop and rebuild secondary indexes when a load stages at least this many
+            paper rows (0: always, None: never)
+        spool_bytes: Staging CSV kept in memory up to this size per table, then spilled to a temp file
+        """
+        self.engine = engine or get_engine(db_uri)
+        if self.engine.dialect.name != "postgresql" or self.engine.dialect.driver != "psycopg2":
+            raise ValueError(f"PostgresBulkLoader needs a postgresql+psycopg2 engine, got "
+                             f"{self.engine.dialect.name}+{self.engine.dialect.driver}")
+        self.defer_indexes_over = defer_indexes_over
+        self.spool_bytes = spool_bytes
+
+    def stage(self, papers: Iterable[Dict[str, Any]], citations: Iterable[Tuple[str, ...]] = ()) -> Dict[str, Any]:
+        """
+        Write papers (KnowledgeGraph.add_papers format, or records with just arxiv_id/title/abstract)
+        and (citing_id, cited_id[, context[, type]]) citations as one CSV spool file per staging table.
+        Returns {staging table: (file, rows)}.
+        """
+        files = {name: tempfile.SpooledTemporaryFile(max_size=self.spool_bytes, mode="w+", newline="",
+                                                     encoding="utf-8") for name in STAGING_TABLES}
+        writers = {name: csv.writer(f) for name, f in files.items()}
+        counts = dict.fromkeys(STAGING_TABLES, 0)
+
+        def write(table, row):
+            # Empty fields are NULL in CSV COPY; None becomes an empty field
+            writers[table].writerow(["" if value is None else value for value in row])
+            counts[table] += 1
+
+        for paper in papers:
+            arxiv_id = paper["arxiv_id"]
+            write("stage_papers", (arxiv_id, paper.get("title"), paper.get("abstract"), paper.get("full_text"),
+                                   paper.get("publication_date") or paper.get("date_published"),
+                                   paper.get("primary_category") or paper.get("category")))
+            for position, author in enumerate(paper.get("authors", [])):
+                name, affiliation = _author_name(author)
+                if name:
+                    write("stage_paper_authors", (arxiv_id, name, normalize_name(name), affiliation, position))
+            for topic in paper.get("categories", []):
+                write("stage_paper_topics", (arxiv_id, topic))
+        for citation in citations:
+            citation = tuple(citation) + (None, None)
+            write("stage_citations", citation[:4])
+
+        for f in files.values():
+            f.seek(0)
+        return {name: (files[name], counts[name]) for name in STAGING_TABLES}
+
+    def load(self, papers: Iterable[Dict[str, Any]], citations: Iterable[Tuple[str, ...]] = ()) -> Dict[str, Any]:
+        """
+        Load papers and citations in one transaction. Returns per-table {'rows', 'seconds', 'per_second'}
+        for the COPY into each staging table and the upsert into each target table, plus 'indexes'
+        (secondary indexes rebuilt, seconds) and 'seconds' overall.
+        """
+        start = time.perf_counter()
+        staged = self.stage(papers, citations)
+        stats: Dict[str, Any] = {"copy": {}, "tables": {}}
+        raw = self.engine.raw_connection()
+        try:
+            with raw.cursor() as cursor:
+                for table, columns in STAGING_TABLES.items():
+                    cursor.execute(f"CREATE TEMP TABLE {table} ({columns}) ON COMMIT DROP")
+                for table, (f, rows) in staged.items():
+                    t = time.perf_counter()
+                    cursor.copy_expert(f"COPY {table} FROM STDIN WITH (FORMAT csv)", f)
+                    stats["copy"][table] = self._rate(rows, time.perf_counter() - t)
+                    cursor.execute(f"ANALYZE {table}")
+
+                deferred = self._defer_indexes(cursor, staged["stage_papers"][1])
+                for table, statement in UPSERTS:
+                    t = time.perf_counter()
+                    cursor.execute(statement)
+                    stats["tables"][table] = self._rate(cursor.rowcount, time.perf_counter() - t)
+                    logger.info(f"Loaded {table}: {stats['tables'][table]}")
+                if staged["stage_citations"][1]:
+                    cursor.execute(UPDATE_CITATION_COUNTS)
+                stats["indexes"] = self._rebuild_indexes(cursor, deferred)
+                # Fresh planner statistics after a large change in table contents
+                for table in TARGET_TABLES:
+                    cursor.execute(f"ANALYZE {table}")
+            raw.commit()
+        except Exception:
+            raw.rollback()
+            raise
+        finally:
+            raw.close()
+            for f, _ in staged.values():
+                f.close()
+
+        stats["seconds"] = time.perf_counter() - start
+        logger.info(f"Bulk load finished in {stats['seconds']:.1f}s")
+        return stats
+
+    def _defer_indexes(self, cursor, paper_rows: int) -> List[Tuple[str, str]]:
+        """Drop the secondary indexes of the target tables for a large load; returns their definitions."""
+        if self.defer_indexes_over is None or paper_rows < self.defer_indexes_over:
+            return []
+        cursor.execute(SECONDARY_INDEXES, (list(TARGET_TABLES),))
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX "{name}"')
+        logger.info(f"Dropped {len(indexes)} secondary indexes for a load of {paper_rows} papers")
+        return indexes
+
+    def _rebuild_indexes(self, cursor, indexes: List[Tuple[str, str]]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        for _, definition in indexes:
+            cursor.execute(definition)
+        seconds = time.perf_counter() - start
+        if indexes:
+            logger.info(f"Rebuilt {len(indexes)} secondary indexes in {seconds:.1f}s")
+        return {"rebuilt": [name for name, _ in indexes], "seconds": seconds}
+
+    @staticmethod
+    def _rate(rows: int, seconds: float) -> Dict[str, Any]:
+        return {"rows": rows, "seconds": seconds, "per_second": rows / seconds if seconds > 0 else 0.0}
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from storage.graph_index import read_records
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="Papers as .jsonl, .json or .pkl")
+    parser.add_argument("--citations", help="JSONL of {\"citing_id\", \"cited_id\"[, \"context\"]} records")
+    parser.add_argument("--db-url", default=os.environ.get("DB_URL"), help="Postgres URL (default DB_URL/DATABASE_URL)")
+    parser.add_argument("--defer-indexes-over", type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    setup_database(args.db_url)
+    citations = [(c["citing_id"], c["cited_id"], c.get("context")) for c in read_records(args.citations)] \
+        if args.citations else []
+    loader = PostgresBulkLoader(args.db_url, defer_indexes_over=args.defer_indexes_over)
+    stats = loader.load(read_records(args.source), citations)
+    for table, s in {**stats["copy"], **stats["tables"]}.items():
+        print(f"{table:22s} {s['rows']:>10d} rows {s['seconds']:8.2f}s {s['per_second']:>12,.0f} rows/s")
+    print(f"indexes rebuilt: {len(stats['indexes']['rebuilt'])} in {stats['indexes']['seconds']:.2f}s; "
+          f"total {stats['seconds']:.1f}s")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main(sys.argv[1:])
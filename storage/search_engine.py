@@ -1,16 +1,35 @@
 import os
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 from elasticsearch import Elasticsearch
-from elasticsearch.helpers import bulk
+from elasticsearch.helpers import parallel_bulk
 
 logger = logging.getLogger(__name__)
 
+# _source fields a generation prompt needs (see synthesis.format_for_generation); excludes full_text
+LEAN_SOURCE_FIELDS = ["arxiv_id", "title", "abstract", "authors", "publication_date", "primary_category"]
+# Deterministic order for search_after pagination: score, then the unique arxiv_id as tiebreaker
+RESULT_SORT = [{"_score": "desc"}, {"arxiv_id": "asc"}]
+
+class SearchResults(list):
+    """
+    Result documents of one search, shaped as before pagination existed (the _source plus score).
+    next_search_after is the last hit's sort values: pass it as search_after to fetch the next page.
+    """
+    next_search_after: Optional[List[Any]] = None
+
 class SearchEngine:
-    def __init__(self, hosts: Optional[List[str]] = None, index_name: str = "research_papers"):
-        """Initialize connection to Elasticsearch."""
+    def __init__(self, hosts: Optional[List[str]] = None, index_name: str = "research_papers",
+                 source_fields: Optional[List[str]] = None, highlight_fragments: Optional[int] = None):
+        """
+        Initialize connection to Elasticsearch.
+        source_fields: _source fields returned by searches, e.g. LEAN_SOURCE_FIELDS (None returns whole documents)
+        highlight_fragments: Highlight at most this many 150-character fragments per field (None keeps the defaults)
+        """
         self.hosts = hosts or [os.environ.get("ELASTICSEARCH_HOST", "http://localhost:9200")]
         self.index_name = index_name
+        self.source_fields = source_fields
+        self.highlight_fragments = highlight_fragments
         
         logger.info(f"Connecting to Elasticsearch at {self.hosts}")
         self.es = Elasticsearch(self.hosts)
@@ -74,11 +93,8 @@ class SearchEngine:
             self.es.indices.create(index=self.index_name, body=mappings)
             logger.info(f"Created index {self.index_name} with mappings")
     
-    def index_paper(self, paper: Dict[str, Any]) -> None:
-        """Index a single paper document."""
-        doc_id = paper['arxiv_id']
-        
-        # Prepare document
+    def _paper_document(self, paper: Dict[str, Any]) -> Dict[str, Any]:
+        """Indexed fields of a paper."""
         document = {
             'arxiv_id': paper['arxiv_id'],
             'title': paper['title'],
@@ -93,52 +109,71 @@ class SearchEngine:
         # Add full text if available
         if 'full_text' in paper:
             document['full_text'] = paper['full_text']
-        
-        # Index document
-        self.es.index(index=self.index_name, id=doc_id, body=document)
+        return document
+
+    def index_paper(self, paper: Dict[str, Any]) -> None:
+        """Index a single paper document."""
+        doc_id = paper['arxiv_id']
+        self.es.index(index=self.index_name, id=doc_id, body=self._paper_document(paper))
         logger.info(f"Indexed paper {doc_id}")
     
-    def bulk_index_papers(self, papers: List[Dict[str, Any]]) -> None:
-        """Index multiple papers in bulk."""
-        if not papers:
-            logger.warning("No papers provided for bulk indexing")
-            return
-            
-        logger.info(f"Bulk indexing {len(papers)} papers")
-        
-        # Prepare actions
-        actions = []
+    def _paper_actions(self, papers: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Bulk index actions, built one paper at a time."""
         for paper in papers:
-            doc_id = paper['arxiv_id']
-            
-            # Prepare document
-            document = {
+            yield {
                 '_index': self.index_name,
-                '_id': doc_id,
-                '_source': {
-                    'arxiv_id': paper['arxiv_id'],
-                    'title': paper['title'],
-                    'abstract': paper['abstract'],
-                    'authors': paper.get('authors', []),
-                    'publication_date': paper['publication_date'],
-                    'categories': paper.get('categories', []),
-                    'primary_category': paper['primary_category'],
-                    'topics': paper.get('topics', [])
-                }
+                '_id': paper['arxiv_id'],
+                '_source': self._paper_document(paper)
             }
-            
-            # Add full text if available
-            if 'full_text' in paper:
-                document['_source']['full_text'] = paper['full_text']
-                
-            actions.append(document)
-        
-        # Execute bulk indexing
-        success, failed = bulk(self.es, actions, refresh=True)
-        logger.info(f"Bulk indexed {success} papers, {failed} failed")
 
-    def search(self, query: str, fields: List[str] = None, filters: Dict[str, Any] = None, size: int = 10) -> List[Dict[str, Any]]:
-        """Search for papers matching the query."""
+    def _refresh_interval(self) -> Optional[str]:
+        """Current index.refresh_interval, None when the index uses the cluster default."""
+        settings = self.es.indices.get_settings(index=self.index_name, name="index.refresh_interval")
+        return settings.get(self.index_name, {}).get("settings", {}).get("index", {}).get("refresh_interval")
+
+    def bulk_index_papers(self, papers: Iterable[Dict[str, Any]], thread_count: int = 4, chunk_size: int = 500,
+                          max_chunk_bytes: int = 10 * 1024 * 1024, load_refresh_interval: str = "-1") -> Dict[str, Any]:
+        """
+        Index papers in bulk, streaming from any iterable (list, generator, file reader).
+        Actions are built lazily and sent by parallel bulk workers in chunks of at most chunk_size documents
+        or max_chunk_bytes bytes. Refreshes are disabled during the load (index.refresh_interval is set to
+        load_refresh_interval, '-1' meaning off) and restored afterwards, followed by one refresh.
+        Returns {'indexed': count, 'failed': [{'id', 'status', 'error'}, ...]}, one entry per rejected document.
+        """
+        previous_interval = self._refresh_interval()
+        self.es.indices.put_settings(index=self.index_name, settings={"index": {"refresh_interval": load_refresh_interval}})
+        indexed, failed = 0, []
+        try:
+            for ok, item in parallel_bulk(self.es, self._paper_actions(papers), thread_count=thread_count,
+                                          chunk_size=chunk_size, max_chunk_bytes=max_chunk_bytes,
+                                          raise_on_error=False, raise_on_exception=False):
+                if ok:
+                    indexed += 1
+                    continue
+                result = next(iter(item.values()))
+                failed.append({'id': result.get('_id'), 'status': result.get('status'), 'error': result.get('error')})
+                logger.warning(f"Failed to index paper {result.get('_id')}: {result.get('error')}")
+        finally:
+            self.es.indices.put_settings(index=self.index_name, settings={"index": {"refresh_interval": previous_interval}})
+            self.es.indices.refresh(index=self.index_name)
+
+        if indexed == 0 and not failed:
+            logger.warning("No papers provided for bulk indexing")
+        logger.info(f"Bulk indexed {indexed} papers, {len(failed)} failed")
+        return {'indexed': indexed, 'failed': failed}
+
+    def _finish_body(self, body: Dict[str, Any], search_after: Optional[List[Any]] = None) -> Dict[str, Any]:
+        """Add source filtering, the pagination sort and the search_after cursor to a request body."""
+        if self.source_fields is not None:
+            body["_source"] = {"includes": self.source_fields}
+        body["sort"] = RESULT_SORT
+        if search_after is not None:
+            body["search_after"] = search_after
+        return body
+
+    def _text_query(self, query: str, fields: List[str] = None, filters: Dict[str, Any] = None, size: int = 10,
+                    highlight: bool = True, search_after: Optional[List[Any]] = None) -> Dict[str, Any]:
+        """Request body for a full-text search."""
         if fields is None:
             fields = ["title^3", "abstract^2", "full_text"]
             
@@ -158,17 +193,21 @@ class SearchEngine:
                     ]
                 }
             },
-            "highlight": {
+            "size": size
+        }
+        if highlight:
+            field_options = {}
+            if self.highlight_fragments is not None:
+                field_options = {"fragment_size": 150, "number_of_fragments": self.highlight_fragments}
+            search_query["highlight"] = {
                 "fields": {
                     "title": {},
-                    "abstract": {},
-                    "full_text": {}
+                    "abstract": dict(field_options),
+                    "full_text": dict(field_options)
                 },
                 "pre_tags": ["<strong>"],
                 "post_tags": ["</strong>"]
-            },
-            "size": size
-        }
+            }
         
         # Add filters if provided
         if filters:
@@ -179,25 +218,11 @@ class SearchEngine:
                 else:
                     search_query["query"]["bool"]["filter"] = search_query["query"]["bool"].get("filter", [])
                     search_query["query"]["bool"]["filter"].append({"term": {field: value}})
-        
-        # Execute search
-        logger.info(f"Searching for '{query}' in fields {fields}")
-        response = self.es.search(index=self.index_name, body=search_query)
-        
-        # Process results
-        results = []
-        for hit in response["hits"]["hits"]:
-            result = hit["_source"]
-            result["score"] = hit["_score"]
-            result["highlights"] = hit.get("highlight", {})
-            results.append(result)
-            
-        logger.info(f"Found {len(results)} results for query '{query}'")
-        return results
-    
-    def search_by_author(self, author_name: str, size: int = 10) -> List[Dict[str, Any]]:
-        """Search for papers by a specific author."""
-        query = {
+        return self._finish_body(search_query, search_after)
+
+    def _author_query(self, author_name: str, size: int = 10, search_after: Optional[List[Any]] = None) -> Dict[str, Any]:
+        """Request body for papers by an author."""
+        return self._finish_body({
             "query": {
                 "nested": {
                     "path": "authors",
@@ -209,24 +234,11 @@ class SearchEngine:
                 }
             },
             "size": size
-        }
-        
-        logger.info(f"Searching for papers by author '{author_name}'")
-        response = self.es.search(index=self.index_name, body=query)
-        
-        # Process results
-        results = []
-        for hit in response["hits"]["hits"]:
-            result = hit["_source"]
-            result["score"] = hit["_score"]
-            results.append(result)
-            
-        logger.info(f"Found {len(results)} papers by author '{author_name}'")
-        return results
-    
-    def search_by_topic(self, topic: str, size: int = 10) -> List[Dict[str, Any]]:
-        """Search for papers on a specific topic."""
-        query = {
+        }, search_after)
+
+    def _topic_query(self, topic: str, size: int = 10, search_after: Optional[List[Any]] = None) -> Dict[str, Any]:
+        """Request body for papers on a topic."""
+        return self._finish_body({
             "query": {
                 "bool": {
                     "should": [
@@ -237,20 +249,95 @@ class SearchEngine:
                 }
             },
             "size": size
-        }
-        
-        logger.info(f"Searching for papers on topic '{topic}'")
-        response = self.es.search(index=self.index_name, body=query)
-        
-        # Process results
-        results = []
+        }, search_after)
+
+    @staticmethod
+    def _hits_to_results(response: Dict[str, Any], highlights: bool = False) -> "SearchResults":
+        """
+        Flatten hits into source documents with their score (and highlights for text searches).
+        The pagination cursor is kept on the list, not in the paper documents.
+        """
+        results = SearchResults()
         for hit in response["hits"]["hits"]:
-            result = hit["_source"]
+            result = hit.get("_source", {})
             result["score"] = hit["_score"]
+            results.next_search_after = hit.get("sort")
+            if highlights:
+                result["highlights"] = hit.get("highlight", {})
             results.append(result)
-            
+        return results
+
+    def search(self, query: str, fields: List[str] = None, filters: Dict[str, Any] = None, size: int = 10,
+               highlight: bool = True, search_after: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Search for papers matching the query.
+        highlight: Request highlights (skip them when only titles and abstracts are needed)
+        search_after: next_search_after of the previous page's results, to page without deep from/size
+        """
+        logger.info(f"Searching for '{query}' in fields {fields}")
+        body = self._text_query(query, fields, filters, size, highlight, search_after)
+        response = self.es.search(index=self.index_name, body=body)
+        results = self._hits_to_results(response, highlights=highlight)
+        logger.info(f"Found {len(results)} results for query '{query}'")
+        return results
+    
+    def search_by_author(self, author_name: str, size: int = 10, search_after: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
+        """Search for papers by a specific author."""
+        logger.info(f"Searching for papers by author '{author_name}'")
+        response = self.es.search(index=self.index_name, body=self._author_query(author_name, size, search_after))
+        results = self._hits_to_results(response)
+        logger.info(f"Found {len(results)} papers by author '{author_name}'")
+        return results
+    
+    def search_by_topic(self, topic: str, size: int = 10, search_after: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
+        """Search for papers on a specific topic."""
+        logger.info(f"Searching for papers on topic '{topic}'")
+        response = self.es.search(index=self.index_name, body=self._topic_query(topic, size, search_after))
+        results = self._hits_to_results(response)
         logger.info(f"Found {len(results)} papers on topic '{topic}'")
         return results
+
+    def multi_search(self, searches: List[Tuple[str, Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+        """
+        Run several searches in one _msearch round trip, one result list per search in input order.
+        searches: (kind, kwargs) pairs, kind being 'text', 'author' or 'topic' with the arguments of
+        search, search_by_author or search_by_topic, e.g. [('text', {'query': 'rag'}), ('author', {'author_name': 'Lewis'})]
+        A search that fails on the cluster is logged and yields an empty list.
+        """
+        if not searches:
+            return []
+        builders = {"text": self._text_query, "author": self._author_query, "topic": self._topic_query}
+        body = []
+        for kind, kwargs in searches:
+            if kind not in builders:
+                raise ValueError(f"Unknown search kind '{kind}', expected one of {list(builders)}")
+            body.append({"index": self.index_name})
+            body.append(builders[kind](**kwargs))
+        logger.info(f"Running {len(searches)} searches in one multi-search request")
+        response = self.es.msearch(searches=body)
+
+        results = []
+        for (kind, kwargs), item in zip(searches, response["responses"]):
+            if "error" in item:
+                logger.error(f"Multi-search {kind} search {kwargs} failed: {item['error']}")
+                results.append([])
+            else:
+                results.append(self._hits_to_results(item, highlights=kind == "text" and kwargs.get("highlight", True)))
+        return results
+
+    def search_many(self, queries: List[str], fields: List[str] = None, filters: Dict[str, Any] = None, size: int = 10,
+                    highlight: bool = True) -> List[List[Dict[str, Any]]]:
+        """Batched search(): one result list per query, fetched in a single request."""
+        return self.multi_search([("text", {"query": q, "fields": fields, "filters": filters, "size": size, "highlight": highlight})
+                                  for q in queries])
+
+    def search_by_authors(self, author_names: List[str], size: int = 10) -> List[List[Dict[str, Any]]]:
+        """Batched search_by_author(): one result list per author, fetched in a single request."""
+        return self.multi_search([("author", {"author_name": name, "size": size}) for name in author_names])
+
+    def search_by_topics(self, topics: List[str], size: int = 10) -> List[List[Dict[str, Any]]]:
+        """Batched search_by_topic(): one result list per topic, fetched in a single request."""
+        return self.multi_search([("topic", {"topic": topic, "size": size}) for topic in topics])
     
     def get_paper(self, arxiv_id: str) -> Optional[Dict[str, Any]]:
         """Retrieve a specific paper by arXiv ID."""
@@ -0,0 +1,313 @@
+import os
+import json
+import bisect
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Dict, Any, Tuple, Optional, Union
+import numpy as np
+
+from embeddings.cache import EmbeddingCache, get_embedding_cache
+from embeddings.encoder_pool import EncoderPool
+from embeddings.doc_cache import DocumentEmbeddingCache
+from storage.metadata_store import arxiv_key, ensure_arxiv_ids
+from storage.facets import DATE_FIELDS, _day_number
+from storage.vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+SHARD_BY = ("hash", "time")
+MANIFEST = "shards.json"
+
+# Shard opened by a worker process; each worker serves exactly one shard
+_worker_store: Optional[VectorStore] = None
+
+def _open_worker_shard(config: Dict[str, Any]) -> None:
+    global _worker_store
+    _worker_store = VectorStore(**config)
+
+def _search_worker_shard(queries: np.ndarray, k: int, filters: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    return _worker_store.search_vectors(queries, k, **filters)
+
+def merge_top_k(distances: List[np.ndarray], keys: List[np.ndarray], k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Exact top-k merge of per-shard results, each (nq, k) sorted by ascending distance.
+    Returns (distances, keys, shard position) padded with inf / -1.
+    """
+    D = np.hstack(distances)
+    I = np.hstack(keys)
+    S = np.hstack([np.full(d.shape, s, dtype="int64") for s, d in enumerate(distances)])
+    D = np.where(I >= 0, D, np.inf)
+    order = np.argsort(D, axis=1, kind="stable")[:, :k]
+    D, I, S = (np.take_along_axis(a, order, axis=1) for a in (D, I, S))
+    return D, np.where(np.isfinite(D), I, -1), S
+
+class ShardedVectorStore:
+    def __init__(self,
+                 base_path: str,
+                 n_shards: int = 4,
+                 shard_by: str = 'hash',
+                 time_boundaries: Optional[List[str]] = None,
+                 model_name: str = 'all-MiniLM-L6-v2',
+                 cache: Optional[EmbeddingCache] = None,
+                 executor: str = 'thread',
+                 max_workers: Optional[int] = None,
+                 dimension: Optional[int] = None,
+                 encoder_pool: Optional[EncoderPool] = None,
+                 doc_cache: Optional[DocumentEmbeddingCache] = None,
+                 **store_kwargs):
+        """
+        VectorStore split into shards that are searched in parallel and merged exactly.
+        base_path: Directory holding shard-NNN.index / shard-NNN.cmeta files and the shards.json manifest
+        n_shards: Number of shards for shard_by='hash' (papers go to arxiv_key(arxiv_id) % n_shards)
+        shard_by: 'hash' or 'time'; time shards split on publication date at time_boundaries
+        time_boundaries: Sorted YYYY-MM-DD dates; shard i holds papers before boundary i, the last shard the rest.
+            Papers without a date go to shard 0. Date-filtered searches skip shards outside the range.
+        executor: 'thread' searches shards on a thread pool (FAISS releases the GIL); 'process' gives each
+            saved shard its own worker process, restarted after writes so it sees the change log
+        max_workers: Thread pool size (optional, defaults to the number of shards)
+        dimension: Embedding size for new shards (optional, read from the model otherwise)
+        doc_cache: Content-addressed embedding cache so unchanged documents are not re-encoded (optional)
+        encoder_pool: Worker processes used to encode documents (optional, queries still use the model)
+        store_kwargs: Passed to every shard's VectorStore (index_type, nlist, nprobe, rescore, ...)
+        """
+        if shard_by not in SHARD_BY:
+            raise ValueError(f"Unknown shard_by '{shard_by}', expected one of {SHARD_BY}")
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown executor '{executor}', expected 'thread' or 'process'")
+        self.base_path = base_path
+        self.model_name = model_name
+        self._model = None
+        self.encoder_pool = encoder_pool
+        self.doc_cache = doc_cache
+        self.cache = cache or get_embedding_cache()
+        self.executor = executor
+        self.store_kwargs = store_kwargs
+        os.makedirs(base_path, exist_ok=True)
+
+        # The manifest fixes the routing, so reopening never reshuffles papers between shards
+        manifest_path = os.path.join(base_path, MANIFEST)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            shard_by, n_shards, time_boundaries = manifest['shard_by'], manifest['n_shards'], manifest['time_boundaries']
+            logger.info(f"Opening {n_shards} {shard_by} shards from {base_path}")
+        else:
+            if shard_by == 'time':
+                if not time_boundaries:
+                    raise ValueError("shard_by='time' needs time_boundaries")
+                time_boundaries = sorted(time_boundaries)
+                n_shards = len(time_boundaries) + 1
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                json.dump({'shard_by': shard_by, 'n_shards': n_shards, 'time_boundaries': time_boundaries,
+                           'model_name': model_name}, f, indent=2)
+        self.shard_by = shard_by
+        self.n_shards = n_shards
+        self.time_boundaries = time_boundaries or []
+        self._boundary_days = [_day_number(b) for b in self.time_boundaries]
+
+        self.dimension = dimension
+        self.shards = [self._open_shard(i) for i in range(n_shards)]
+        self._threads = ThreadPoolExecutor(max_workers=max_workers or n_shards, thread_name_prefix="shard")
+        self._processes: Optional[Dict[int, Executor]] = None
+
+    @property
+    def model(self):
+        """SentenceTransformer shared by all shards, loaded on first use."""
+        if self._model is None:
+            from storage import vector_store
+            self._model = vector_store.SentenceTransformer(self.model_name)
+        return self._model
+
+    def shard_paths(self, shard_id: int) -> Tuple[str, str]:
+        return (os.path.join(self.base_path, f"shard-{shard_id:03d}.index"),
+                os.path.join(self.base_path, f"shard-{shard_id:03d}.cmeta"))
+
+    def _shard_config(self, shard_id: int) -> Dict[str, Any]:
+        index_path, metadata_path = self.shard_paths(shard_id)
+        return dict(self.store_kwargs, model_name=self.model_name, index_path=index_path, metadata_path=metadata_path)
+
+    def _open_shard(self, shard_id: int, **overrides) -> VectorStore:
+        config = dict(self._shard_config(shard_id), **overrides)
+        if not os.path.exists(config['index_path']) and self.dimension is None:
+            self.dimension = self.model.get_sentence_embedding_dimension()
+        return VectorStore(cache=self.cache, dimension=self.dimension, **config)
+
+    def shard_for(self, record: Dict[str, Any]) -> int:
+        """Shard a metadata record belongs to."""
+        if self.shard_by == 'hash':
+            return arxiv_key(record['arxiv_id']) % self.n_shards
+        day = _day_number(next((record[f] for f in DATE_FIELDS if record.get(f)), None))
+        return bisect.bisect_right(self._boundary_days, day)
+
+    def _shards_for_dates(self, date_from: Optional[str], date_to: Optional[str]) -> List[int]:
+        if self.shard_by != 'time':
+            return list(range(self.n_shards))
+        lo = bisect.bisect_right(self._boundary_days, _day_number(date_from)) if date_from else 0
+        hi = bisect.bisect_right(self._boundary_days, _day_number(date_to)) if date_to else self.n_shards - 1
+        return list(range(lo, hi + 1))
+
+    def __len__(self) -> int:
+        return sum(len(shard.metadata) for shard in self.shards)
+
+    def add_documents(self, texts: List[str], metadata: List[Dict[str, Any]]) -> None:
+        """Add documents, replacing any already stored under the same arxiv_id."""
+        self.upsert(texts, metadata)
+
+    def upsert(self, texts: List[str], metadata: List[Dict[str, Any]]) -> None:
+        if not texts:
+            logger.warning("No texts provided to add to vector store")
+            return
+        if len(texts) != len(metadata):
+            raise ValueError(f"Got {len(texts)} texts but {len(metadata)} metadata records")
+        metadata = ensure_arxiv_ids(metadata, texts)
+        embeddings = self.encode_documents(texts)
+        self.upsert_embeddings(np.array(embeddings).astype('float32'), metadata)
+
+    def encode_documents(self, texts: List[str]) -> np.ndarray:
+        """Embed document texts with the encoder pool or model, reusing doc_cache entries when configured."""
+        encoder = self.encoder_pool or self.model
+        if self.doc_cache is not None:
+            return self.doc_cache.encode(encoder, self.model_name, texts, show_progress_bar=True)
+        return np.array(encoder.encode(texts, show_progress_bar=True)).astype('float32')
+
+    def upsert_embeddings(self, embeddings: np.ndarray, metadata: List[Dict[str, Any]]) -> None:
+        """Route precomputed embeddings to their shards; a paper whose date moved it is removed from its old shard."""
+        if len(embeddings) != len(metadata):
+            raise ValueError(f"Got {len(embeddings)} embeddings but {len(metadata)} metadata records")
+        metadata = ensure_arxiv_ids(metadata)
+        groups: Dict[int, List[int]] = {}
+        for row, record in enumerate(metadata):
+            groups.setdefault(self.shard_for(record), []).append(row)
+        for shard_id, rows in groups.items():
+            if self.shard_by == 'time':
+                ids = [metadata[row]['arxiv_id'] for row in rows]
+                for other_id, other in enumerate(self.shards):
+                    moved = [i for i in ids if other_id != shard_id and arxiv_key(i) in other.metadata]
+                    if moved:
+                        other.delete(moved)
+            self.shards[shard_id].upsert_embeddings(embeddings[rows], [metadata[row] for row in rows])
+        self._stop_processes()
+
+    def delete(self, arxiv_ids: List[str]) -> int:
+        """Delete documents by arxiv_id from whichever shard holds them. Returns the number removed."""
+        removed = 0
+        for shard in self.shards:
+            held = [i for i in arxiv_ids if arxiv_key(i) in shard.metadata]
+            if held:
+                removed += shard.delete(held)
+        self._stop_processes()
+        return removed
+
+    def search(self, query: str, k: int = 5, **filters) -> List[Dict[str, Any]]:
+        """Search every shard in parallel and merge; takes the same filters as VectorStore.search."""
+        return self.search_many([query], k, **filters)[0]
+
+    def search_many(self, queries: List[str], k: int = 5, **filters) -> List[List[Dict[str, Any]]]:
+        if not queries:
+            return []
+        embeddings = self.cache.encode(self.model, self.model_name, list(queries))
+        D, I, S = self.search_vectors(embeddings, k, **filters)
+        return [
+            [result for d, key, s in zip(D[row], I[row], S[row])
+             for result in self.shards[s].build_results([d], [key])]
+            for row in range(len(queries))
+        ]
+
+    def search_vectors(self, query_embeddings: np.ndarray, k: int = 5,
+                       primary_category: Union[str, List[str], None] = None,
+                       categories: Union[str, List[str], None] = None,
+                       date_from: Optional[str] = None, date_to: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Scatter the queries to all shards that can match, gather each shard's top-k and merge.
+        Returns (distances, arxiv keys, shard id) per query.
+        """
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype='float32')
+        filters = {'primary_category': primary_category, 'categories': categories,
+                   'date_from': date_from, 'date_to': date_to}
+        targets = self._shards_for_dates(date_from, date_to)
+        futures = [self._submit(shard_id, query_embeddings, k, filters) for shard_id in targets]
+        gathered = [future.result() for future in futures]
+        D, I, S = merge_top_k([d for d, _ in gathered], [i for _, i in gathered], k)
+        return D, I, np.asarray(targets, dtype='int64')[S]
+
+    def _submit(self, shard_id: int, queries: np.ndarray, k: int, filters: Dict[str, Any]):
+        if self.executor == 'process':
+            pool = self._process_pools().get(shard_id)
+            if pool is not None:
+                return pool.submit(_search_worker_shard, queries, k, filters)
+        return self._threads.submit(self.shards[shard_id].search_vectors, queries, k, **filters)
+
+    def _process_pools(self) -> Dict[int, Executor]:
+        """One single-process pool per shard with an index on disk; unsaved new shards are searched in-process."""
+        if self._processes is None:
+            context = multiprocessing.get_context("spawn")
+            self._processes = {
+                shard_id: ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_open_worker_shard,
+                                              initargs=(self._shard_config(shard_id),))
+                for shard_id in range(self.n_shards) if os.path.exists(self.shard_paths(shard_id)[0])
+            }
+            logger.info(f"Started {len(self._processes)} shard worker processes")
+        return self._processes
+
+    def _stop_processes(self) -> None:
+        # Workers hold a copy of the shard as of their start; restart them on the next search
+        if self._processes is not None:
+            for pool in self._processes.values():
+                pool.shutdown(wait=False, cancel_futures=True)
+            self._processes = None
+
+    def rebuild_shard(self, shard_id: int, texts: Optional[List[str]] = None,
+                      metadata: Optional[List[Dict[str, Any]]] = None, **store_overrides) -> None:
+        """
+        Rebuild one shard without touching the others, e.g. to retrain IVF centroids or change index_type.
+        With texts and metadata the shard is re-ingested from source; otherwise its stored vectors are reused
+        (exact vectors when kept, else reconstructed from the index).
+        """
+        old = self.shards[shard_id]
+        if texts is not None:
+            if metadata is None or len(texts) != len(metadata):
+                raise ValueError("rebuild_shard needs one metadata record per text")
+            misplaced = [r['arxiv_id'] for r in metadata if self.shard_for(r) != shard_id]
+            if misplaced:
+                raise ValueError(f"{len(misplaced)} papers belong to other shards, e.g. {misplaced[0]}")
+            embeddings = self.encode_documents(texts)
+        else:
+            metadata = [record for _, record in old.metadata.items()]
+            keys = [arxiv_key(record['arxiv_id']) for record in metadata]
+            if old.exact is not None:
+                _, embeddings = old.exact.get(keys, old.metadata)
+            else:
+                embeddings = old.reconstruct(keys)
+
+        self._stop_processes()
+        # Build next to the old files and swap them in only after a successful save
+        tmp_paths = [f"{path}.rebuild" for path in self.shard_paths(shard_id)]
+        for path in tmp_paths + [f"{tmp_paths[0]}{suffix}" for suffix in ('.log', '.exact.npy', '.facets.npz')]:
+            if os.path.exists(path):
+                os.remove(path)  # left over from an interrupted rebuild
+        self.dimension = self.dimension or old.dimension
+        rebuilt = self._open_shard(shard_id, index_path=tmp_paths[0], metadata_path=tmp_paths[1], **store_overrides)
+        if len(metadata):
+            rebuilt.upsert_embeddings(embeddings, metadata)
+        rebuilt.save()
+        for new_path, old_path in ((rebuilt.exact_path, old.exact_path), (rebuilt.facets_path, old.facets_path),
+                                   (rebuilt.metadata_path, old.metadata_path), (rebuilt.index_path, old.index_path)):
+            if os.path.exists(new_path):
+                os.replace(new_path, old_path)
+            elif os.path.exists(old_path):
+                os.remove(old_path)
+        # Unsaved changes in the old log are already part of the rebuilt shard
+        if os.path.exists(old.log_path):
+            os.remove(old.log_path)
+        shard = self.shards[shard_id] = self._open_shard(shard_id, **store_overrides)
+        logger.info(f"Rebuilt shard {shard_id} with {len(shard.metadata)} documents")
+
+    def save(self) -> None:
+        for shard in self.shards:
+            shard.save()
+        self._stop_processes()
+
+    def close(self) -> None:
+        self._stop_processes()
+        self._threads.shutdown(wait=True)
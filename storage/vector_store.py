@@ -1,96 +1,444 @@
 import os
+import json
+import base64
 import numpy as np
 import faiss
 import pickle
 import logging
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Tuple, Optional, Union
 from sentence_transformers import SentenceTransformer
+from embeddings.cache import EmbeddingCache, get_embedding_cache
+from embeddings.encoder_pool import EncoderPool
+from embeddings.doc_cache import DocumentEmbeddingCache
+from storage.metadata_store import MetadataStore, KeyedMetadataStore, arxiv_key, ensure_arxiv_ids
+from storage.index_factory import (build_index, base_index, is_compressed, train_index, ivf_ids,
+                                   set_search_params, get_search_params)
+from storage.exact_vectors import ExactVectorStore, rescore_batch
+from storage.facets import FacetIndex, search_filtered, search_ids
 
 logger = logging.getLogger(__name__)
 
 class VectorStore:
-    def __init__(self, 
+    def __init__(self,
                  model_name: str = 'all-MiniLM-L6-v2',
                  index_path: Optional[str] = None,
-                 metadata_path: Optional[str] = None):
-        """Initialize vector store with embedding model."""
+                 metadata_path: Optional[str] = None,
+                 cache: Optional[EmbeddingCache] = None,
+                 index_type: str = 'flat',
+                 nlist: int = 100,
+                 pq_m: int = 8,
+                 nprobe: Optional[int] = None,
+                 ef_search: Optional[int] = None,
+                 rescore: bool = False,
+                 rescore_factor: int = 4,
+                 model: Any = None,
+                 dimension: Optional[int] = None,
+                 encoder_pool: Optional[EncoderPool] = None,
+                 doc_cache: Optional[DocumentEmbeddingCache] = None):
+        """
+        Initialize vector store with embedding model.
+        Vectors are keyed by arxiv_key(arxiv_id), so re-adding a paper replaces it.
+        index_type: flat, fp16, sq8, ivf_flat, ivf_pq or hnsw (only used when creating a new index)
+        nprobe, ef_search: Runtime search knobs; saved with the index and overriding stored values on load
+        rescore: For compressed index types, re-rank rescore_factor * k candidates using the exact
+            float32 vectors, which are kept memory-mapped on disk rather than in RAM
+        model: Already loaded embedding model to share (optional, otherwise loaded on first use)
+        dimension: Embedding size for a new index (optional, read from the model otherwise)
+        doc_cache: Content-addressed embedding cache so unchanged documents are not re-encoded (optional)
+        encoder_pool: Worker processes used to encode documents in upsert() (optional, queries still use the model)
+        """
         self.model_name = model_name
-        self.model = SentenceTransformer(model_name)
-        self.dimension = self.model.get_sentence_embedding_dimension()
+        self._model = model
+        self.encoder_pool = encoder_pool
+        self.doc_cache = doc_cache
+        self.cache = cache or get_embedding_cache()
         self.index_path = index_path or f"faiss_index_{model_name.replace('/', '_')}.idx"
-        self.metadata_path = metadata_path or f"faiss_metadata_{model_name.replace('/', '_')}.pkl"
-        
+        self.metadata_path = metadata_path or self._default_metadata_path(model_name)
+        self.log_path = f"{self.index_path}.log"
+        self.exact_path = f"{self.index_path}.exact.npy"
+        self.facets_path = f"{self.index_path}.facets.npz"
+        self._facets: Optional[FacetIndex] = None
+        self._position_keys: Optional[np.ndarray] = None
+        self.rescore = rescore
+        self.rescore_factor = rescore_factor
+
         # Initialize or load index
         if os.path.exists(self.index_path) and os.path.exists(self.metadata_path):
             self.load()
+        elif os.path.exists(self.index_path):
+            # Never start empty over a saved index: the next save() would overwrite it
+            raise FileNotFoundError(f"Index {self.index_path} exists but its metadata {self.metadata_path} does not; "
+                                    f"pass metadata_path for this index")
         else:
-            self.index = faiss.IndexFlatL2(self.dimension)
-            self.metadata = []
-            logger.info(f"Created new FAISS index with dimension {self.dimension}")
-    
+            dimension = dimension or self.model.get_sentence_embedding_dimension()
+            self.index = self._keyed(build_index(dimension, index_type, nlist=nlist, pq_m=pq_m))
+            self.metadata = KeyedMetadataStore()
+            self.exact = self._open_exact()
+            logger.info(f"Created new {index_type} FAISS index with dimension {self.index.d}")
+            self._replay_log()
+        set_search_params(self.index, nprobe=nprobe, ef_search=ef_search)
+
+    @staticmethod
+    def _keyed(index: faiss.Index) -> faiss.Index:
+        """
+        Index that stores vectors under their arxiv keys. IVF indexes keep ids in their inverted lists and
+        remove by id correctly; IndexIDMap2 only stays aligned over indexes that renumber rows on removal.
+        """
+        if faiss.try_extract_index_ivf(index) is not None:
+            return index
+        return faiss.IndexIDMap2(index)
+
+    @staticmethod
+    def _default_metadata_path(model_name: str) -> str:
+        """Columnar metadata, unless only the pickle written by earlier versions exists."""
+        stem = f"faiss_metadata_{model_name.replace('/', '_')}"
+        if not os.path.exists(f"{stem}.cmeta") and os.path.exists(f"{stem}.pkl"):
+            return f"{stem}.pkl"
+        return f"{stem}.cmeta"
+
+    @property
+    def model(self):
+        """SentenceTransformer, loaded on first use so stores that only search by vector never load it."""
+        if self._model is None:
+            self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    @property
+    def dimension(self) -> int:
+        return self.index.d
+
+    @property
+    def _legacy_metadata(self) -> bool:
+        # Pickled metadata lists predate the columnar format; convert with `python -m storage.metadata_store convert`
+        return self.metadata_path.endswith('.pkl')
+
+    def _open_exact(self) -> Optional[ExactVectorStore]:
+        """Exact vectors are only worth keeping next to a compressed index with columnar metadata."""
+        if not is_compressed(self.index):
+            return None
+        if self._legacy_metadata:
+            logger.warning("Exact vectors for re-scoring need columnar metadata; re-scoring is disabled for .pkl metadata")
+            return None
+        return ExactVectorStore(self.exact_path, self.index.d)
+
     def add_documents(self, texts: List[str], metadata: List[Dict[str, Any]]) -> None:
-        """Add documents to the vector store."""
+        """Add documents to the vector store. Documents whose arxiv_id is already stored are replaced."""
+        self.upsert(texts, metadata)
+
+    def upsert(self, texts: List[str], metadata: List[Dict[str, Any]]) -> None:
+        """
+        Insert or replace documents keyed by the arxiv_id in their metadata.
+        Records without an arxiv_id are stored under an id generated from their text.
+        """
         if not texts:
             logger.warning("No texts provided to add to vector store")
             return
-            
-        logger.info(f"Adding {len(texts)} documents to vector store")
-        
+        if len(texts) != len(metadata):
+            raise ValueError(f"Got {len(texts)} texts but {len(metadata)} metadata records")
+
+        logger.info(f"Upserting {len(texts)} documents into vector store")
+        metadata = ensure_arxiv_ids(metadata, texts)
+
         # Generate embeddings
-        embeddings = self.model.encode(texts, show_progress_bar=True)
-        
-        # Add to index
-        self.index.add(np.array(embeddings).astype('float32'))
-        
-        # Store metadata
-        self.metadata.extend(metadata)
-        
-        logger.info(f"Vector store now contains {len(self.metadata)} documents")
-        
-    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
-        """Search for similar documents."""
+        embeddings = self.encode_documents(texts)
+        self.upsert_embeddings(np.array(embeddings).astype('float32'), metadata)
+
+    def encode_documents(self, texts: List[str]) -> np.ndarray:
+        """Embed document texts with the encoder pool or model, reusing doc_cache entries when configured."""
+        encoder = self.encoder_pool or self.model
+        if self.doc_cache is not None:
+            return self.doc_cache.encode(encoder, self.model_name, texts, show_progress_bar=True)
+        return np.array(encoder.encode(texts, show_progress_bar=True)).astype('float32')
+
+    def upsert_embeddings(self, embeddings: np.ndarray, metadata: List[Dict[str, Any]]) -> None:
+        """Insert or replace documents from precomputed embeddings (one row per metadata record)."""
+        if len(embeddings) != len(metadata):
+            raise ValueError(f"Got {len(embeddings)} embeddings but {len(metadata)} metadata records")
+        embeddings = np.asarray(embeddings, dtype='float32')
+        metadata = ensure_arxiv_ids(metadata)
+        keys = self._apply_upsert(embeddings, metadata)
+        self._append_log([
+            {'op': 'upsert', 'metadata': record, 'vector': self._encode_vector(vector)}
+            for record, vector in zip(metadata, embeddings)
+        ])
+
+        logger.info(f"Vector store now contains {len(self.metadata)} documents ({len(keys)} upserted)")
+
+    def delete(self, arxiv_ids: List[str]) -> int:
+        """Delete documents by arxiv_id (any version). Returns the number removed."""
+        keys = [arxiv_key(arxiv_id) for arxiv_id in arxiv_ids]
+        removed = self._apply_delete(keys)
+        self._append_log([{'op': 'delete', 'key': key} for key in keys])
+        logger.info(f"Deleted {removed} documents, vector store now contains {len(self.metadata)}")
+        return removed
+
+    def reconstruct(self, keys: List[int]) -> np.ndarray:
+        """Vectors stored under keys, as the index holds them (decoded codes for compressed types)."""
+        if not keys:
+            return np.zeros((0, self.dimension), dtype='float32')
+        ivf = faiss.try_extract_index_ivf(self.index)
+        if ivf is None or isinstance(self.index, faiss.IndexIDMap2):
+            return np.vstack([self.index.reconstruct(int(key)) for key in keys])
+        # IVF looks vectors up by id through a direct map, built only for this call
+        ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+        try:
+            return np.vstack([self.index.reconstruct(int(key)) for key in keys])
+        finally:
+            ivf.set_direct_map_type(faiss.DirectMap.NoMap)
+
+    def _apply_upsert(self, embeddings: np.ndarray, metadata: List[Dict[str, Any]]) -> List[int]:
+        # The last record wins when a batch repeats an arxiv_id
+        latest = {arxiv_key(record['arxiv_id']): i for i, record in enumerate(metadata)}
+        rows = sorted(latest.values())
+        keys = np.array([arxiv_key(metadata[i]['arxiv_id']) for i in rows], dtype='int64')
+        vectors = np.ascontiguousarray(embeddings[rows])
+
+        # Train on this batch if the index type requires it, then replace existing vectors
+        train_index(self.index, vectors)
+        self._remove_ids([int(key) for key in keys if int(key) in self.metadata])
+        self.index.add_with_ids(vectors, keys)
+        self.metadata.upsert(metadata[i] for i in rows)
+        self._invalidate_facets()
+        if self.exact is not None:
+            self.exact.put(keys, vectors)
+        return keys.tolist()
+
+    def _apply_delete(self, keys: List[int]) -> int:
+        self._remove_ids([key for key in keys if key in self.metadata])
+        self._invalidate_facets()
+        if self.exact is not None:
+            self.exact.delete(keys)
+        return self.metadata.delete(keys)
+
+    def _remove_ids(self, keys: List[int]) -> None:
+        if not keys:
+            return
+        if isinstance(base_index(self.index), faiss.IndexHNSW):
+            raise ValueError("HNSW indexes cannot remove vectors; rebuild the store to replace or delete papers")
+        self.index.remove_ids(np.array(keys, dtype='int64'))
+
+    @staticmethod
+    def _encode_vector(vector: np.ndarray) -> str:
+        return base64.b64encode(np.asarray(vector, dtype='float32').tobytes()).decode('ascii')
+
+    def _append_log(self, entries: List[Dict[str, Any]]) -> None:
+        """Append changes to the log so they survive a restart before the next save()."""
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _replay_log(self) -> None:
+        if not os.path.exists(self.log_path):
+            return
+        applied = 0
+        # Consecutive upserts are applied as one batch
+        vectors: List[np.ndarray] = []
+        records: List[Dict[str, Any]] = []
+
+        def flush() -> None:
+            if records:
+                self._apply_upsert(np.vstack(vectors), records)
+                vectors.clear()
+                records.clear()
+
+        with open(self.log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-write; everything before it is intact
+                    logger.warning(f"Ignoring truncated entry at the end of {self.log_path}")
+                    break
+                if entry['op'] == 'upsert':
+                    vectors.append(np.frombuffer(base64.b64decode(entry['vector']), dtype='float32').reshape(1, -1))
+                    records.append(entry['metadata'])
+                elif entry['op'] == 'delete':
+                    flush()
+                    self._apply_delete([int(entry['key'])])
+                applied += 1
+        flush()
+        logger.info(f"Replayed {applied} change log entries from {self.log_path}")
+
+    def _invalidate_facets(self) -> None:
+        # Adds and removals shift index positions, so position bitsets must be rebuilt
+        self._facets = None
+        self._position_keys = None
+
+    def _ensure_facets(self) -> FacetIndex:
+        if self._facets is None:
+            self._position_keys = self._index_keys()
+            self._facets = FacetIndex.build(self.metadata.get(key) for key in self._position_keys)
+        return self._facets
+
+    def _index_keys(self) -> np.ndarray:
+        """Key of every vector, in the position order that facet bitsets address."""
+        if isinstance(self.index, faiss.IndexIDMap2):
+            return faiss.vector_to_array(self.index.id_map)
+        return ivf_ids(self.index)
+
+    def _search_keys(self, query_embedding: np.ndarray, k: int, bitmap: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        if bitmap is None:
+            return self.index.search(query_embedding, k)
+        if not isinstance(self.index, faiss.IndexIDMap2):
+            # IVF vectors are stored under their keys, so select the matching keys directly
+            positions = np.flatnonzero(np.unpackbits(bitmap, bitorder="little")[:len(self._position_keys)])
+            return search_ids(self.index, query_embedding, k, self._position_keys[positions])
+        # Bitsets address positions in the wrapped index, so search it directly and translate to keys
+        distances, positions = search_filtered(self.index.index, query_embedding, k, bitmap)
+        return distances, np.where(positions >= 0, self._position_keys[np.maximum(positions, 0)], -1)
+
+    def search(self, query: str, k: int = 5,
+               primary_category: Union[str, List[str], None] = None,
+               categories: Union[str, List[str], None] = None,
+               date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Search for similar documents.
+        primary_category, categories: Keep documents matching any of the given values
+        date_from, date_to: Inclusive publication date range (YYYY-MM-DD)
+        """
         if len(self.metadata) == 0:
             logger.warning("Vector store is empty, no results to return")
             return []
-            
+
         # Generate query embedding
-        query_embedding = self.model.encode([query])[0].reshape(1, -1).astype('float32')
-        
-        # Search
-        distances, indices = self.index.search(query_embedding, k)
-        
-        # Prepare results
+        query_embedding = self.cache.encode(self.model, self.model_name, [query])
+        distances, keys = self.search_vectors(query_embedding, k, primary_category=primary_category,
+                                              categories=categories, date_from=date_from, date_to=date_to)
+        return self.build_results(distances[0], keys[0])
+
+    def search_vectors(self, query_embeddings: np.ndarray, k: int = 5,
+                       primary_category: Union[str, List[str], None] = None,
+                       categories: Union[str, List[str], None] = None,
+                       date_from: Optional[str] = None, date_to: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search with precomputed query embeddings. Returns (squared L2 distances, arxiv keys) per query,
+        padded with inf / -1 like faiss.
+        """
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype='float32')
+        if len(self.metadata) == 0:
+            return (np.full((len(query_embeddings), k), np.inf, dtype='float32'),
+                    np.full((len(query_embeddings), k), -1, dtype='int64'))
+
+        bitmap = None
+        if any(f is not None for f in (primary_category, categories, date_from, date_to)):
+            bitmap = self._ensure_facets().bitmap(primary_category=primary_category, categories=categories,
+                                                  date_from=date_from, date_to=date_to)
+
+        # Search, re-scoring a wider candidate set with exact vectors if requested
+        if self.rescore and self.exact is not None:
+            _, candidates = self._search_keys(query_embeddings, k * self.rescore_factor, bitmap)
+            return rescore_batch(query_embeddings, candidates, lambda ids: self.exact.get(ids, self.metadata), k)
+        return self._search_keys(query_embeddings, k, bitmap)
+
+    def build_results(self, distances: np.ndarray, keys: np.ndarray) -> List[Dict[str, Any]]:
+        """Metadata records with a similarity score for one row of search_vectors() output."""
         results = []
-        for i, idx in enumerate(indices[0]):
-            if idx < len(self.metadata) and idx != -1:
-                result = self.metadata[idx].copy()
-                result['score'] = float(1.0 / (1.0 + distances[0][i]))  # Convert distance to similarity score
+        for distance, key in zip(distances, keys):
+            if key == -1:
+                continue
+            result = self.metadata.get(key)
+            if result is not None:
+                result['score'] = float(1.0 / (1.0 + distance))  # Convert distance to similarity score
                 results.append(result)
-                
         return results
-    
+
     def save(self) -> None:
-        """Save index and metadata to disk."""
+        """Save index and metadata to disk, compacting the change log into them."""
         logger.info(f"Saving vector store to {self.index_path} and {self.metadata_path}")
-        
-        # Save FAISS index
+
+        # Save FAISS index and the facet bitsets over its positions
         faiss.write_index(self.index, self.index_path)
-        
+        self._ensure_facets().save(self.facets_path)
+
+        # Save exact vectors first: they are located through the metadata snapshot being replaced
+        if self.exact is not None:
+            self.exact.save(self.metadata)
+
         # Save metadata
-        with open(self.metadata_path, 'wb') as f:
-            pickle.dump(self.metadata, f)
-            
+        if self._legacy_metadata:
+            with open(self.metadata_path, 'wb') as f:
+                pickle.dump(list(self.metadata), f)
+        else:
+            self.metadata.save(self.metadata_path)
+
+        # Everything in the log is now part of the snapshot
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+
         logger.info("Vector store saved successfully")
-    
+
     def load(self) -> None:
-        """Load index and metadata from disk."""
+        """Load index and metadata from disk, then replay any unsaved changes from the log."""
         logger.info(f"Loading vector store from {self.index_path} and {self.metadata_path}")
-        
+
         # Load FAISS index
         self.index = faiss.read_index(self.index_path)
-        
-        # Load metadata
-        with open(self.metadata_path, 'rb') as f:
-            self.metadata = pickle.load(f)
-            
-        logger.info(f"Loaded vector store with {len(self.metadata)} documents")
\ No newline at end of file
+        self.exact = self._open_exact()
+
+        # Load metadata: columnar files are memory-mapped, legacy pickles are read into memory
+        if self._legacy_metadata:
+            with open(self.metadata_path, 'rb') as f:
+                records = pickle.load(f)
+        else:
+            records = MetadataStore(self.metadata_path)
+
+        if isinstance(self.index, faiss.IndexIDMap2) and faiss.try_extract_index_ivf(self.index) is not None:
+            self.index = self._unwrap_ivf(self.index)
+        if isinstance(self.index, faiss.IndexIDMap2) or faiss.try_extract_index_ivf(self.index) is not None:
+            self.metadata = KeyedMetadataStore.from_records(records) if self._legacy_metadata else KeyedMetadataStore(records)
+        else:
+            self._migrate_positional(list(records))
+
+        if os.path.exists(self.facets_path):
+            facets = FacetIndex.load(self.facets_path)
+            if facets.size == self.index.ntotal:
+                self._position_keys = self._index_keys()
+                self._facets = facets
+
+        logger.info(f"Loaded vector store with {len(self.metadata)} documents ({get_search_params(self.index)})")
+        self._replay_log()
+
+    def _migrate_positional(self, records: List[Dict[str, Any]]) -> None:
+        """Re-key an index saved before arxiv_id keys were introduced (row position == metadata position)."""
+        logger.info(f"Migrating positional index with {self.index.ntotal} vectors to arxiv_id keys")
+        ivf = faiss.try_extract_index_ivf(self.index)
+        if ivf is not None:
+            ivf.make_direct_map()
+        vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        fresh = faiss.clone_index(self.index)
+        fresh.reset()
+        if ivf is not None:
+            faiss.extract_index_ivf(fresh).set_direct_map_type(faiss.DirectMap.NoMap)
+        self.index = self._keyed(fresh)
+        self.metadata = KeyedMetadataStore()
+        self._apply_upsert(vectors, ensure_arxiv_ids(records, [f"row-{i}" for i in range(len(records))]))
+
+    def _unwrap_ivf(self, wrapped: faiss.Index) -> faiss.Index:
+        """
+        Earlier versions wrapped IVF indexes in IndexIDMap2. IVF does not renumber its rows on removal,
+        but IndexIDMap2 compacts id_map in order, so the n-th smallest surviving row id still belongs to
+        id_map[n]. Rewrite the row ids to keys unless rows added after a removal reused an id.
+        """
+        keys = faiss.vector_to_array(wrapped.id_map)
+        rows = np.unique(ivf_ids(wrapped))
+        if len(rows) != len(keys):
+            raise ValueError(f"{self.index_path} has IVF row ids that no longer match its id map; rebuild the store")
+        logger.info(f"Converting IndexIDMap2-wrapped IVF index with {len(keys)} vectors to IVF ids")
+        index = faiss.clone_index(wrapped.index)
+        invlists = faiss.extract_index_ivf(index).invlists
+        for list_no in range(invlists.nlist):
+            size = invlists.list_size(list_no)
+            if not size:
+                continue
+            ids = invlists.get_ids(list_no)
+            new_ids = keys[np.searchsorted(rows, faiss.rev_swig_ptr(ids, size))]
+            invlists.release_ids(list_no, ids)
+            codes = invlists.get_codes(list_no)
+            new_codes = faiss.rev_swig_ptr(codes, size * invlists.code_size).copy()
+            invlists.release_codes(list_no, codes)
+            invlists.update_entries(list_no, 0, size, faiss.swig_ptr(new_ids), faiss.swig_ptr(new_codes))
+        return index
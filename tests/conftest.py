@@ -1,3 +1,107 @@
 import sys
 import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
\ No newline at end of file
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+class StubElasticsearch(ThreadingHTTPServer):
+    """
+    Minimal Elasticsearch HTTP stub: every index exists, searches answer from `handler(body)`,
+    bulk index actions are stored in `documents` unless `reject(doc_id, source)` returns an error,
+    and index settings are kept in `settings`.
+    """
+    def __init__(self, handler):
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.handler = handler
+        self.reject = lambda doc_id, source: None
+        self.requests = []
+        self.documents = {}
+        self.settings = {}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(status)
+        self.send_header("X-Elastic-Product", "Elasticsearch")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+
+    def do_HEAD(self):
+        self.server.requests.append(("HEAD", self.path, None))
+        self._reply(200)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        self.server.requests.append(("GET", path, None))
+        if "/_settings" in path:
+            index = path.strip("/").split("/")[0]
+            settings = {"index": dict(self.server.settings)} if self.server.settings else {}
+            self._reply(200, {index: {"settings": settings}})
+        else:
+            self._reply(404, {"error": f"no stub for {path}"})
+
+    def do_POST(self):
+        raw = self._body()
+        path = self.path.split("?")[0]
+        if path.endswith("/_settings"):
+            body = json.loads(raw or "{}")
+            self.server.requests.append(("PUT", path, body))
+            for key, value in body.get("index", {}).items():
+                if value is None:
+                    self.server.settings.pop(key, None)
+                else:
+                    self.server.settings[key] = value
+            self._reply(200, {"acknowledged": True})
+        elif path.endswith("/_msearch"):
+            lines = [json.loads(line) for line in raw.splitlines() if line.strip()]
+            self.server.requests.append(("POST", path, lines))
+            self._reply(200, {"responses": [self.server.handler(body) for body in lines[1::2]]})
+        elif path.endswith("/_search"):
+            body = json.loads(raw) if raw else {}
+            self.server.requests.append(("POST", path, body))
+            self._reply(200, self.server.handler(body))
+        elif path.endswith("/_bulk"):
+            lines = [json.loads(line) for line in raw.splitlines() if line.strip()]
+            self.server.requests.append((self.command, path, lines))
+            items = []
+            for action, source in zip(lines[::2], lines[1::2]):
+                meta = action["index"]
+                error = self.server.reject(meta["_id"], source)
+                if error:
+                    items.append({"index": {"_index": meta["_index"], "_id": meta["_id"], "status": 400, "error": error}})
+                else:
+                    self.server.documents[meta["_id"]] = source
+                    items.append({"index": {"_index": meta["_index"], "_id": meta["_id"], "status": 201}})
+            self._reply(200, {"took": 1, "errors": any("error" in i["index"] for i in items), "items": items})
+        elif path.endswith("/_refresh"):
+            self.server.requests.append(("POST", path, None))
+            self._reply(200, {"_shards": {"total": 1, "successful": 1, "failed": 0}})
+        else:
+            self._reply(404, {"error": f"no stub for {path}"})
+
+    do_PUT = do_POST
+
+@pytest.fixture
+def stub_es():
+    """Start a StubElasticsearch; tests set `stub_es.handler` to answer search bodies."""
+    server = StubElasticsearch(lambda body: {"hits": {"hits": []}})
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,72 @@
+import json
+import os
+import faiss
+import pytest
+import build_arxiv_faiss
+from storage.metadata_store import MetadataStore
+from tests.test_vector_store import DummyModel
+
+def write_fixture(path, n):
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(n):
+            f.write(json.dumps({'arxiv_id': f'2401.{i:05d}v1', 'title': f'Paper {i}',
+                                'abstract': f'abstract number {i}' if i % 7 else '',
+                                'primary_category': 'cs.AI', 'publication_date': '2024-01-01'}) + '\n')
+
+def run(tmp_path, *extra, model=None):
+    args = build_arxiv_faiss.parse_args(['--source', str(tmp_path / 'papers.jsonl'), '--data-dir', str(tmp_path / 'data'),
+                                         '--batch-size', '4', '--checkpoint-every', '1', *extra])
+    return build_arxiv_faiss.build(args, model=model or DummyModel(None))
+
+def test_build_from_jsonl(tmp_path):
+    write_fixture(tmp_path / 'papers.jsonl', 30)
+    count = run(tmp_path, '--max-results', '25')
+    # Papers with an empty abstract are skipped
+    assert count == 25 - 4
+    data = tmp_path / 'data'
+    assert faiss.read_index(str(data / 'faiss.index')).ntotal == count
+    with open(data / 'faiss_meta.json', encoding='utf-8') as f:
+        assert [p['arxiv_id'] for p in json.load(f)][:2] == ['2401.00001v1', '2401.00002v1']
+    assert len(MetadataStore(str(data / 'faiss_meta.cmeta'))) == count
+    assert os.path.exists(str(data / 'faiss.index.facets.npz'))
+    assert not os.path.exists(str(data / '.build'))
+
+class CrashingModel(DummyModel):
+    def __init__(self, crash_after):
+        self.calls = 0
+        self.crash_after = crash_after
+    def encode(self, texts, show_progress_bar=False):
+        self.calls += 1
+        if self.calls > self.crash_after:
+            raise RuntimeError('killed')
+        return super().encode(texts)
+
+def test_interrupted_build_resumes(tmp_path):
+    write_fixture(tmp_path / 'papers.jsonl', 30)
+    with pytest.raises(RuntimeError):
+        run(tmp_path, model=CrashingModel(crash_after=3))
+    # Simulate records written after the last checkpoint
+    with open(tmp_path / 'data' / '.build' / 'records.jsonl', 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'source_position': 99, 'paper': {'arxiv_id': 'stale'}}) + '\n')
+    assert run(tmp_path) == 30 - 5
+    with open(tmp_path / 'data' / 'faiss_meta.json', encoding='utf-8') as f:
+        ids = [p['arxiv_id'] for p in json.load(f)]
+    assert ids == [f'2401.{i:05d}v1' for i in range(30) if i % 7]
+
+def test_resume_rejects_changed_settings(tmp_path):
+    write_fixture(tmp_path / 'papers.jsonl', 30)
+    with pytest.raises(RuntimeError):
+        run(tmp_path, model=CrashingModel(crash_after=2))
+    with pytest.raises(ValueError):
+        run(tmp_path, '--index-type', 'sq8')
+    assert run(tmp_path, '--index-type', 'ivf_flat', '--nlist', '2', '--train-size', '6', '--restart') == 25
+
+def test_rebuild_reuses_cached_embeddings(tmp_path, capsys):
+    from tests.test_doc_cache import CountingModel
+    write_fixture(tmp_path / 'papers.jsonl', 30)
+    run(tmp_path, '--max-results', '20')
+    model = CountingModel()
+    run(tmp_path, model=model)
+    # Only the 8 new papers with an abstract are encoded
+    assert len(model.encoded) == 8
+    assert '17 reused, 8 encoded' in capsys.readouterr().out
@@ -0,0 +1,56 @@
+import os
+import numpy as np
+from embeddings.doc_cache import DocumentEmbeddingCache, main
+from tests.test_vector_store import DummyModel
+
+class CountingModel(DummyModel):
+    def __init__(self):
+        self.encoded = []
+    def encode(self, texts, show_progress_bar=False):
+        self.encoded.extend(texts)
+        return super().encode(texts)
+
+def test_encodes_only_new_texts_and_persists(tmp_path):
+    path = str(tmp_path / 'cache')
+    model = CountingModel()
+    cache = DocumentEmbeddingCache(path)
+    first = cache.encode(model, 'm', ['a', 'b', 'a'])
+    assert model.encoded == ['a', 'b']
+    assert np.array_equal(first, DummyModel(None).encode(['a', 'b', 'a']))
+
+    reopened = DocumentEmbeddingCache(path)
+    second = reopened.encode(model, 'm', ['b', 'c', 'a'])
+    assert model.encoded == ['a', 'b', 'c']
+    assert np.array_equal(second, DummyModel(None).encode(['b', 'c', 'a']))
+    assert reopened.stats()['hits'] == 2
+    # Model name is part of the key
+    reopened.encode(model, 'other', ['a'])
+    assert model.encoded[-1] == 'a'
+    assert len(reopened) == 4
+
+def test_torn_tail_is_dropped(tmp_path):
+    path = str(tmp_path / 'cache')
+    cache = DocumentEmbeddingCache(path)
+    cache.add('m', ['a', 'b'], DummyModel(None).encode(['a', 'b']))
+    with open(os.path.join(path, 'vectors.f32'), 'ab') as f:
+        f.write(b'\0' * 20)
+    reopened = DocumentEmbeddingCache(path)
+    assert len(reopened) == 2
+    found, _ = reopened.lookup('m', ['a', 'b', 'c'])
+    assert found.tolist() == [True, True, False]
+
+def test_gc_keeps_referenced_texts(tmp_path, capsys):
+    path = str(tmp_path / 'cache')
+    cache = DocumentEmbeddingCache(path)
+    texts = ['a', 'b', 'c', 'd']
+    cache.add('m', texts, DummyModel(None).encode(texts))
+    assert cache.gc('m', ['d', 'b', 'missing']) == 2
+    found, vectors = cache.lookup('m', texts)
+    assert found.tolist() == [False, True, False, True]
+    assert np.array_equal(vectors[[1, 3]], DummyModel(None).encode(['b', 'd']))
+
+    meta = tmp_path / 'meta.json'
+    meta.write_text('[{"arxiv_id": "1", "abstract": "d"}]')
+    main(['gc', path, str(meta), '--model', 'm'])
+    assert 'Removed 1 unreferenced' in capsys.readouterr().out
+    assert DocumentEmbeddingCache(path).lookup('m', ['d'])[0].tolist() == [True]
@@ -0,0 +1,60 @@
+import pytest
+import numpy as np
+from embeddings.cache import EmbeddingCache
+
+class CountingModel:
+    def __init__(self):
+        self.calls = []
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[float(len(t)), 1.0] for t in texts])
+
+def test_encode_batches_misses_and_counts_hits():
+    cache = EmbeddingCache(max_size=10)
+    model = CountingModel()
+    first = cache.encode(model, 'm', ['graph neural nets', 'rag'])
+    second = cache.encode(model, 'm', ['graph  neural nets ', 'rag', 'new query'])
+    assert model.calls == [['graph neural nets', 'rag'], ['new query']]
+    assert first.dtype == np.float32 and second.shape == (3, 2)
+    assert np.array_equal(first[0], second[0])
+    stats = cache.stats()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 3
+
+def test_model_name_is_part_of_key():
+    cache = EmbeddingCache()
+    cache.put('model-a', 'query', np.ones(2))
+    assert cache.get('model-b', 'query') is None
+    assert cache.get('model-a', 'query') is not None
+
+def test_lru_eviction():
+    cache = EmbeddingCache(max_size=2)
+    cache.put('m', 'a', np.zeros(2))
+    cache.put('m', 'b', np.zeros(2))
+    cache.get('m', 'a')
+    cache.put('m', 'c', np.zeros(2))
+    assert cache.get('m', 'b') is None
+    assert cache.get('m', 'a') is not None
+    assert cache.stats()['evictions'] == 1
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('embeddings.cache.time.time', lambda: now[0])
+    cache = EmbeddingCache(ttl=60)
+    cache.put('m', 'a', np.zeros(2))
+    now[0] += 30
+    assert cache.get('m', 'a') is not None
+    now[0] += 31
+    assert cache.get('m', 'a') is None
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = EmbeddingCache(disk_path=path)
+    cache.put('m', 'persisted query', np.array([0.5, 0.25]))
+    cache.close()
+    reopened = EmbeddingCache(disk_path=path)
+    vector = reopened.get('m', 'persisted query')
+    assert vector is not None
+    assert vector.tolist() == [0.5, 0.25]
+    assert reopened.stats()['disk_hits'] == 1
+    reopened.close()
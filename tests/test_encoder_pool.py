@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+from embeddings.encoder_pool import EncoderPool
+from tests.test_vector_store import DummyModel
+
+@pytest.fixture(scope='module')
+def pool():
+    with EncoderPool('dummy', workers=2, batch_size=3, chunk_size=5, model_factory=DummyModel) as pool:
+        yield pool
+
+def test_encode_keeps_input_order(pool):
+    texts = [f'text {i}' * (i % 4 + 1) for i in range(23)]
+    assert np.array_equal(pool.encode(texts), DummyModel(None).encode(texts))
+    assert pool.get_sentence_embedding_dimension() == 8
+
+def test_encode_stream_yields_chunks_and_pool_is_reusable(pool):
+    texts = (f'doc {i}' for i in range(12))
+    chunks = list(pool.encode_stream(texts))
+    assert [len(c) for c in chunks] == [5, 5, 2]
+    assert np.array_equal(np.vstack(chunks), DummyModel(None).encode([f'doc {i}' for i in range(12)]))
+    empty = pool.encode([])
+    assert empty.shape == (0, 8) and empty.dtype == np.float32
+
+def test_closed_pool_refuses_work():
+    pool = EncoderPool('dummy', workers=1, model_factory=DummyModel)
+    pool.close()
+    pool.close()
+    with pytest.raises(RuntimeError):
+        pool.encode(['x'])
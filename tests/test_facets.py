@@ -0,0 +1,52 @@
+import numpy as np
+import faiss
+import pytest
+from storage.facets import FacetIndex, search_filtered
+from storage.index_factory import build_index, train_index
+from storage.mmap_index import MmapFlatIndex
+
+RECORDS = [
+    {'primary_category': 'cs.AI', 'categories': ['cs.AI', 'cs.LG'], 'publication_date': '2023-01-05'},
+    {'primary_category': 'cs.CL', 'categories': ['cs.CL'], 'publication_date': '2023-06-01'},
+    {'primary_category': 'cs.AI', 'categories': ['cs.AI'], 'published': '2024-02-10T12:00:00Z'},
+    None,
+] * 10
+
+def matching(bitmap, size):
+    return set(np.flatnonzero(np.unpackbits(bitmap, bitorder='little')[:size]).tolist())
+
+def test_bitmap_combines_facets_and_dates():
+    facets = FacetIndex.build(RECORDS)
+    assert facets.bitmap() is None
+    assert matching(facets.bitmap(primary_category='cs.AI'), 40) == {i for i in range(40) if i % 4 in (0, 2)}
+    assert matching(facets.bitmap(categories=['cs.LG', 'cs.CL']), 40) == {i for i in range(40) if i % 4 in (0, 1)}
+    assert matching(facets.bitmap(primary_category='cs.AI', date_from='2024-01-01'), 40) == {i for i in range(40) if i % 4 == 2}
+    assert matching(facets.bitmap(date_to='2023-06-01'), 40) == {i for i in range(40) if i % 4 in (0, 1)}
+    assert matching(facets.bitmap(primary_category='math.CO'), 40) == set()
+
+def test_save_load_roundtrip(tmp_path):
+    path = str(tmp_path / 'facets.npz')
+    FacetIndex.build(RECORDS).save(path)
+    loaded = FacetIndex.load(path)
+    assert loaded.size == 40
+    assert matching(loaded.bitmap(categories='cs.CL', date_from='2023-01-01'), 40) == {i for i in range(40) if i % 4 == 1}
+
+@pytest.mark.parametrize('index_type', ['flat', 'ivf_flat', 'hnsw', 'mmap'])
+def test_search_filtered_returns_only_matches(index_type, tmp_path):
+    rng = np.random.default_rng(0)
+    xb = rng.standard_normal((40, 8)).astype('float32')
+    if index_type == 'mmap':
+        path = str(tmp_path / 'flat.index')
+        flat = faiss.IndexFlatL2(8)
+        flat.add(xb)
+        faiss.write_index(flat, path)
+        index = MmapFlatIndex(path)
+    else:
+        index = build_index(8, index_type, nlist=4)
+        train_index(index, xb)
+        index.add(xb)
+    bitmap = FacetIndex.build(RECORDS).bitmap(primary_category='cs.CL')
+    D, I = search_filtered(index, xb[:3], 5, bitmap)
+    hits = I[I >= 0]
+    assert len(hits) > 0
+    assert all(i % 4 == 1 for i in hits)
@@ -0,0 +1,77 @@
+import numpy as np
+from storage.graph_index import GraphIndex
+
+def paper(arxiv_id, authors, categories):
+    return {'arxiv_id': arxiv_id, 'title': f'Title {arxiv_id}', 'abstract': 'A', 'publication_date': '2024-01-01',
+            'primary_category': categories[0], 'categories': categories,
+            'authors': [{'full_name': a, 'affiliation': 'MIT' if a == 'Ada' else ''} for a in authors]}
+
+PAPERS = [
+    paper('p0', ['Ada', 'Bob'], ['cs.IR']),
+    paper('p1', ['Ada', 'Cy'], ['cs.IR', 'cs.CL']),
+    paper('p2', ['Bob', 'Ada'], ['cs.CL']),
+    paper('p3', ['Dee'], ['cs.IR', 'cs.CL']),
+    paper('p4', ['Eve'], ['math.AG']),
+]
+# p0 -> p1 -> p2 -> p4, p3 -> p0
+CITATIONS = [('p0', 'p1'), ('p1', 'p2'), ('p2', 'p4'), ('p3', 'p0'), ('p0', 'p1', 'duplicate'), ('p0', 'missing')]
+
+def test_related_papers_citations_then_topics():
+    index = GraphIndex.build(PAPERS, CITATIONS)
+    assert len(index.cites.indices) == 4  # duplicate and dangling citations dropped
+    related = index.related_papers('p0', max_depth=2, limit=10)
+    # Closest first: the hop-1 citing paper p3 ranks ahead of the hop-2 cited paper p2
+    assert [(r['id'], r['relation'], r['hops']) for r in related] == [
+        ('p1', 'cites', 1), ('p3', 'cited_by', 1), ('p2', 'cites', 2)
+    ]
+    assert related[0]['source']['title'] == 'Title p1'
+    assert index.related_papers('p0', max_depth=2, limit=2) == related[:2]
+    # Depth 1, then topic overlap fills the remaining slots by number of shared topics
+    related = index.related_papers('p1', max_depth=1, limit=10)
+    assert [(r['id'], r['relation']) for r in related] == [('p2', 'cites'), ('p0', 'cited_by'), ('p3', 'topic')]
+    assert related[2]['shared_topics'] == 2
+    assert index.related_papers('p1', max_depth=1, limit=1) == related[:1]
+    assert index.related_papers('unknown') == []
+
+def test_collaborators_and_author_papers():
+    index = GraphIndex.build(PAPERS, CITATIONS)
+    assert index.collaborators('Ada') == [
+        {'name': 'Bob', 'affiliation': '', 'collaboration_count': 2},
+        {'name': 'Cy', 'affiliation': '', 'collaboration_count': 1},
+    ]
+    assert index.collaborators('Nobody') == []
+    assert [(r['id'], r['author']) for r in index.papers_by_author('Ad')] == [('p0', 'Ada'), ('p1', 'Ada'), ('p2', 'Ada')]
+    # Matched on normalized names, like the Postgres and Neo4j author lookups
+    assert index.papers_by_author(' ADA ') == index.papers_by_author('Ad')
+    assert index.papers_by_author('') == []
+
+def test_neighbourhood_follows_both_directions():
+    index = GraphIndex.build(PAPERS, CITATIONS)
+    hood = index.neighbourhood('p1', k=2)
+    assert [(r['id'], r['hops']) for r in hood] == [('p0', 1), ('p2', 1), ('p3', 2), ('p4', 2)]
+    assert len(index.neighbourhood('p1', k=2, limit=3)) == 3
+
+def test_refresh_save_and_load(tmp_path):
+    index = GraphIndex.build(PAPERS[:3], CITATIONS)
+    assert len(index) == 3 and len(index.cites.indices) == 2
+    # New papers and edges, including citations to papers that were missing before
+    index.ingest(PAPERS[3:] + [dict(PAPERS[0], title='Renamed')], [('p2', 'p4'), ('p3', 'p0')])
+    assert len(index) == 5 and index.position('p0') == 0
+    assert index.paper(0)['title'] == 'Renamed'
+    assert [r['id'] for r in index.neighbourhood('p0', k=1)] == ['p1', 'p3']
+
+    path = str(tmp_path / 'graph.npz')
+    index.save(path)
+    loaded = GraphIndex.load(path)
+    for name in ('cites', 'authored', 'categorized', 'cited_by', 'paper_authors'):
+        assert np.array_equal(getattr(loaded, name).indices, getattr(index, name).indices)
+    assert loaded.related_papers('p1') == index.related_papers('p1')
+    assert loaded.collaborators('Ada') == index.collaborators('Ada')
+    assert loaded.paper(0)['title'] == 'Renamed'
+    loaded.ingest([paper('p5', ['Ada'], ['cs.IR'])], [('p5', 'p0')])
+    assert [r['id'] for r in loaded.related_papers('p0', max_depth=1, limit=3)] == ['p1', 'p3', 'p5']
+    # Re-adding unchanged papers (a full refresh) records no overrides; restoring a record drops its override
+    index.ingest(PAPERS[1:])
+    assert list(index._overrides) == [0]
+    index.ingest(PAPERS[:1])
+    assert index._overrides == {} and index.paper(0)['title'] == PAPERS[0]['title']
@@ -24,3 +24,104 @@ def test_graph_retriever(monkeypatch):
     results = retriever.retrieve('MATCH (n) RETURN n')
     assert isinstance(results, list)
     assert results[0]['paper'] == 'p1'
+
+class DummyAsyncResult:
+    def __init__(self, rows):
+        self.rows = rows
+    def __aiter__(self):
+        self._it = iter(self.rows)
+        return self
+    async def __anext__(self):
+        try:
+            row = next(self._it)
+        except StopIteration:
+            raise StopAsyncIteration
+        class Record:
+            def data(self):
+                return row
+        return Record()
+
+class DummyAsyncSession:
+    async def run(self, cypher_query, parameters=None):
+        return DummyAsyncResult([{'query': cypher_query, 'parameters': parameters}])
+    async def __aenter__(self):
+        return self
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+class DummyAsyncDriver:
+    closed = False
+    def session(self):
+        return DummyAsyncSession()
+    async def close(self):
+        self.closed = True
+
+def test_graph_retriever_aretrieve(monkeypatch):
+    import asyncio
+    async_driver = DummyAsyncDriver()
+    monkeypatch.setattr('neo4j.GraphDatabase.driver', lambda uri, auth: DummyDriver())
+    monkeypatch.setattr('neo4j.AsyncGraphDatabase.driver', lambda uri, auth: async_driver)
+    retriever = GraphRetriever('bolt://dummy', 'user', 'pass')
+
+    async def run():
+        results = await retriever.aretrieve('MATCH (p:Paper {arxiv_id: $id}) RETURN p', {'id': '1'})
+        await retriever.aclose()
+        return results
+
+    assert asyncio.run(run()) == [{'query': 'MATCH (p:Paper {arxiv_id: $id}) RETURN p', 'parameters': {'id': '1'}}]
+    assert async_driver.closed and retriever.async_driver is None
+
+def test_graph_retriever_csr_backend(tmp_path, monkeypatch):
+    from storage.graph_index import GraphIndex
+    papers = [{'arxiv_id': f'p{i}', 'title': f'T{i}', 'categories': ['cs.IR'],
+               'authors': [{'full_name': 'Ada'}, {'full_name': f'Co {i}'}]} for i in range(3)]
+    path = str(tmp_path / 'graph.npz')
+    GraphIndex.build(papers, [('p0', 'p1'), ('p1', 'p2')]).save(path)
+
+    retriever = GraphRetriever(backend='csr', graph_path=path)
+    assert retriever.driver is None
+    assert [r['id'] for r in retriever.papers_by_author('Ada', limit=2)] == ['p0', 'p1']
+    assert [r['id'] for r in retriever.related_papers('p1')] == ['p2', 'p0']
+    assert [r['name'] for r in retriever.collaborators('Ada')] == ['Co 0', 'Co 1', 'Co 2']
+    assert [(r['id'], r['hops']) for r in retriever.neighbourhood('p0', k=2)] == [('p1', 1), ('p2', 2)]
+    assert [r['id'] for r in retriever.neighbourhood('p0', k=4)] == ['p1', 'p2']
+    with pytest.raises(ValueError):
+        retriever.neighbourhood('p0', k=0)
+
+    import asyncio
+    assert asyncio.run(retriever.apapers_by_author('Ada', limit=2)) == retriever.papers_by_author('Ada', limit=2)
+    with pytest.raises(ValueError):
+        GraphRetriever(backend='csr', graph_path=str(tmp_path / 'missing.npz'))
+
+def test_graph_retriever_neo4j_named_queries(monkeypatch):
+    calls = []
+    class RecordingSession(DummySession):
+        def run(self, cypher_query, parameters=None):
+            calls.append((cypher_query, parameters))
+            return []
+    class RecordingDriver(DummyDriver):
+        def session(self):
+            return RecordingSession()
+    monkeypatch.setattr('neo4j.GraphDatabase.driver', lambda uri, auth: RecordingDriver())
+    retriever = GraphRetriever('bolt://dummy', 'user', 'pass')
+    retriever.papers_by_author("O'Brien", limit=3)
+    # The author name is bound as a parameter, never pasted into the Cypher text
+    assert "O'Brien" not in calls[0][0]
+    assert calls[0][1] == {'prefix': "o'brien", 'terms': "o'brien*", 'limit': 3}
+    assert retriever.papers_by_author('  ') == [] and len(calls) == 1
+    from retrievers.query_registry import QUERIES
+    QUERIES.reset_stats()
+    retriever.related_papers('p1', max_depth=3)
+    assert calls[1] == (QUERIES.get('cypher', 'related_papers_3').text, {'paper_id': 'p1', 'limit': 10})
+    assert QUERIES.stats()['cypher:related_papers_3']['calls'] == 1
+    with pytest.raises(KeyError):
+        retriever.run('no_such_query')
+    # Depths beyond the pre-registered 1-3 get their own query on first use
+    retriever.neighbourhood('p1', k=5)
+    assert '[:CITES*1..5]' in calls[2][0] and calls[2][1] == {'paper_id': 'p1', 'limit': 50}
+    for bad in (0, -1, 2.5):
+        with pytest.raises(ValueError):
+            retriever.related_papers('p1', max_depth=bad)
+        with pytest.raises(ValueError):
+            retriever.neighbourhood('p1', k=bad)
+    assert len(calls) == 3
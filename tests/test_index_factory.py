@@ -0,0 +1,34 @@
+import pytest
+import numpy as np
+import faiss
+from storage.index_factory import INDEX_TYPES, build_index, train_index, set_search_params, get_search_params
+
+@pytest.mark.parametrize('index_type', INDEX_TYPES)
+def test_build_train_and_search(index_type):
+    vectors = np.random.default_rng(0).random((300, 16)).astype('float32')
+    index = build_index(16, index_type, nlist=4, pq_m=4, pq_nbits=4)
+    train_index(index, vectors)
+    index.add(vectors)
+    set_search_params(index, nprobe=4, ef_search=64)
+    _, I = index.search(vectors[:3], 1)
+    assert I.shape == (3, 1)
+    assert index.ntotal == 300
+
+def test_search_params_persist(tmp_path):
+    vectors = np.random.default_rng(0).random((200, 8)).astype('float32')
+    ivf = build_index(8, 'ivf_flat', nlist=4)
+    train_index(ivf, vectors)
+    set_search_params(ivf, nprobe=3)
+    hnsw = build_index(8, 'hnsw')
+    set_search_params(hnsw, ef_search=77)
+    faiss.write_index(ivf, str(tmp_path / 'ivf.index'))
+    faiss.write_index(hnsw, str(tmp_path / 'hnsw.index'))
+    assert get_search_params(faiss.read_index(str(tmp_path / 'ivf.index')))['nprobe'] == 3
+    assert get_search_params(faiss.read_index(str(tmp_path / 'hnsw.index')))['ef_search'] == 77
+
+def test_rejects_unknown_type_and_small_training_set():
+    with pytest.raises(ValueError):
+        build_index(8, 'lsh')
+    index = build_index(8, 'ivf_flat', nlist=50)
+    with pytest.raises(ValueError):
+        train_index(index, np.zeros((10, 8), dtype='float32'))
@@ -3,7 +3,7 @@ from unittest.mock import patch
 from retrievers.keyword_retriever import KeywordRetriever
 
 class DummyES:
-    def search(self, index, query, size):
+    def search(self, index, query, size, **kwargs):
         return {
             'hits': {
                 'hits': [
@@ -34,4 +34,124 @@ def test_keyword_retriever(mock_elasticsearch):
     assert results[1]['score'] == 0.9
     
     # Verify that Elasticsearch was called with the correct host
-    mock_elasticsearch.assert_called_once_with('http://localhost:9200')
\ No newline at end of file
+    mock_elasticsearch.assert_called_once_with('http://localhost:9200')
+
+
+PAPERS = [
+    {'arxiv_id': '1', 'title': 'Graph neural networks', 'abstract': 'We study message passing on graphs.'},
+    {'arxiv_id': '2', 'title': 'Retrieval augmented generation', 'abstract': 'Dense retrieval of graph data for generation.'},
+    {'arxiv_id': '3', 'title': 'Attention is all you need', 'abstract': 'Transformers replace recurrence with attention.'},
+]
+
+def test_bm25_backend_ranks_and_boosts(tmp_path):
+    import json
+    meta_path = tmp_path / 'meta.json'
+    meta_path.write_text(json.dumps(PAPERS))
+    bm25_path = str(tmp_path / 'bm25.npz')
+    retriever = KeywordRetriever(backend='bm25', bm25_path=bm25_path, metadata_path=str(meta_path))
+    results = retriever.retrieve('graph', top_k=5)
+    assert [r['id'] for r in results] == ['1', '2']
+    assert results[0]['source']['title'] == 'Graph neural networks'
+    # Paper 1 matches "graph" in its title, paper 2 in its abstract: boosts decide the order
+    assert retriever.retrieve('graph', top_k=1, fields=['title^5', 'abstract'])[0]['id'] == '1'
+    assert retriever.retrieve('graph', top_k=1, fields=['title', 'abstract^5'])[0]['id'] == '2'
+    assert retriever.retrieve('nothing matches', top_k=3) == []
+
+    # Reopening uses the saved index without the source metadata
+    reopened = KeywordRetriever(backend='bm25', bm25_path=bm25_path)
+    assert [(r['id'], r['score']) for r in reopened.retrieve('attention', top_k=2)] == \
+           [(r['id'], r['score']) for r in retriever.retrieve('attention', top_k=2)]
+
+def test_bm25_score_matches_formula():
+    import math
+    from storage.bm25_index import Bm25Index
+    index = Bm25Index.build(PAPERS, fields=['title'])
+    (doc, score), = index.search('attention', top_k=1)
+    # One of three titles contains the term once; that title has 5 tokens, the average is 11/3
+    idf = math.log(1 + (3 - 1 + 0.5) / (1 + 0.5))
+    expected = idf * 1 * 2.2 / (1 + 1.2 * (1 - 0.75 + 0.75 * 5 / (11 / 3)))
+    assert doc == 2
+    assert score == pytest.approx(expected, rel=1e-5)
+
+def test_bm25_backend_needs_a_source():
+    with pytest.raises(ValueError):
+        KeywordRetriever(backend='bm25')
+
+def echo_hits(body):
+    """Stub search answer: one hit per size slot, ids derived from the query text."""
+    query = body['query']['multi_match']['query']
+    if query == 'broken':
+        return {'error': {'type': 'search_phase_execution_exception'}, 'status': 400}
+    return {'hits': {'hits': [
+        {'_score': 1.0 / (i + 1), '_id': f'{query}-{i}', '_source': {'title': query}} for i in range(body['size'])
+    ]}}
+
+def test_retrieve_many_sends_one_msearch(stub_es):
+    stub_es.handler = echo_hits
+    retriever = KeywordRetriever(stub_es.url, 'papers')
+    results = retriever.retrieve_many(['graphs', 'broken', 'attention'], top_k=2, fields=['title^3'])
+
+    assert [[r['id'] for r in rs] for rs in results] == [['graphs-0', 'graphs-1'], [], ['attention-0', 'attention-1']]
+    assert results[0][0] == {'score': 1.0, 'id': 'graphs-0', 'source': {'title': 'graphs'}}
+    (method, path, lines), = stub_es.requests
+    assert (method, path) == ('POST', '/_msearch')
+    assert lines[0] == {'index': 'papers'}
+    assert lines[1]['query']['multi_match']['fields'] == ['title^3'] and lines[1]['size'] == 2
+    # Same hit conversion as single-query retrieval
+    assert retriever.retrieve('attention', top_k=2) == results[2]
+    assert retriever.retrieve_many([]) == []
+
+def test_retrieve_many_bm25_matches_retrieve(tmp_path):
+    import json
+    meta_path = tmp_path / 'meta.json'
+    meta_path.write_text(json.dumps(PAPERS))
+    retriever = KeywordRetriever(backend='bm25', metadata_path=str(meta_path))
+    queries = ['graph', 'attention', 'nothing']
+    assert retriever.retrieve_many(queries, top_k=2) == [retriever.retrieve(q, top_k=2) for q in queries]
+
+def sorted_hits(body):
+    """Stub search answer paging through ten documents in sort order."""
+    docs = [{'_id': f'd{i}', '_score': 1.0, '_source': {'arxiv_id': f'd{i}', 'title': f'T{i}', 'full_text': 'long'},
+             'sort': [1.0, f'd{i}']} for i in range(10)]
+    if 'search_after' in body:
+        docs = [d for d in docs if d['sort'] > body['search_after']]
+    includes = body.get('_source', {}).get('includes')
+    if includes:
+        docs = [dict(d, _source={k: v for k, v in d['_source'].items() if k in includes}) for d in docs]
+    return {'hits': {'hits': docs[:body['size']]}}
+
+def test_lean_source_and_search_after(stub_es):
+    stub_es.handler = sorted_hits
+    retriever = KeywordRetriever(stub_es.url, 'papers', source_fields=['arxiv_id', 'title'])
+    first = retriever.retrieve('t', top_k=4)
+    second = retriever.retrieve('t', top_k=4, search_after=first[-1]['sort'])
+    assert [r['id'] for r in first + second] == [f'd{i}' for i in range(8)]
+    assert first[0]['source'] == {'arxiv_id': 'd0', 'title': 'T0'}
+    method, path, body = stub_es.requests[-1]
+    assert body['_source'] == {'includes': ['arxiv_id', 'title']}
+    assert body['search_after'] == [1.0, 'd3']
+    assert body['sort'] == [{'_score': 'desc'}, {'arxiv_id': 'asc'}]
+    # Batched requests carry the same source filter
+    assert retriever.retrieve_many(['t'], top_k=4)[0] == first
+
+def test_bm25_source_fields(tmp_path):
+    import json
+    meta_path = tmp_path / 'meta.json'
+    meta_path.write_text(json.dumps(PAPERS))
+    retriever = KeywordRetriever(backend='bm25', metadata_path=str(meta_path), source_fields=['title'])
+    assert retriever.retrieve('attention', top_k=1)[0]['source'] == {'title': 'Attention is all you need'}
+
+def test_aretrieve_matches_retrieve(stub_es):
+    import asyncio
+    stub_es.handler = echo_hits
+    retriever = KeywordRetriever(stub_es.url, 'papers')
+
+    async def run():
+        await retriever.aconnect()
+        try:
+            return await asyncio.gather(*(retriever.aretrieve(q, top_k=2) for q in ['graphs', 'attention']))
+        finally:
+            await retriever.aclose()
+
+    assert asyncio.run(run()) == [retriever.retrieve('graphs', top_k=2), retriever.retrieve('attention', top_k=2)]
+    assert retriever.async_es is None
@@ -0,0 +1,90 @@
+import pytest
+from storage.knowledge_graph import KnowledgeGraph
+
+class DummyTx:
+    def __init__(self, log):
+        self.log = log
+    def run(self, query, **params):
+        self.log.append((' '.join(query.split()), params))
+
+class DummySession:
+    def __init__(self, driver):
+        self.driver = driver
+    def run(self, query, parameters=None):
+        self.driver.statements.append(query)
+        if 'name_normalized IS NULL' in query:
+            return [{'name': name} for name in self.driver.unnormalized]
+        return []
+    def execute_write(self, work, *args):
+        statements = []
+        work(DummyTx(statements), *args)
+        self.driver.transactions.append(statements)
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+class DummyDriver:
+    def __init__(self):
+        self.transactions = []
+        self.statements = []
+        self.unnormalized = []
+    def session(self):
+        return DummySession(self)
+    def close(self):
+        pass
+
+def paper(i, n_authors=10):
+    return {
+        'arxiv_id': f'p{i}', 'title': f'T{i}', 'abstract': 'A', 'publication_date': '2024-01-01',
+        'primary_category': 'cs.IR', 'categories': ['cs.IR', 'cs.CL'],
+        'authors': [{'full_name': f'Author {j}', 'affiliation': 'MIT' if j % 2 else ''} for j in range(n_authors)]
+    }
+
+@pytest.fixture
+def graph(monkeypatch):
+    driver = DummyDriver()
+    monkeypatch.setattr('storage.knowledge_graph.GraphDatabase.driver', lambda uri, auth: driver)
+    return KnowledgeGraph('bolt://dummy', 'user', 'pass', batch_size=2)
+
+def test_add_papers_unwinds_batches_in_transactions(graph):
+    stats = graph.add_papers(paper(i) for i in range(5))
+    assert stats['papers'] == 5 and stats['batches'] == 3 and stats['per_second'] > 0
+
+    transactions = graph.driver.transactions
+    # Batches of 2, 2 and 1 papers; four statements each regardless of 10 authors per paper
+    assert len(transactions) == 3 and all(len(t) == 4 for t in transactions)
+    papers, authors, institutions, topics = transactions[0]
+    assert all(query.startswith('UNWIND $rows AS row') for query, _ in transactions[0])
+    assert [r['arxiv_id'] for r in papers[1]['rows']] == ['p0', 'p1']
+    assert papers[1]['rows'][0]['date_published'] == '2024-01-01'
+    assert len(authors[1]['rows']) == 20 and authors[1]['rows'][0] == {'name': 'Author 0', 'name_normalized': 'author 0', 'affiliation': '', 'arxiv_id': 'p0'}
+    assert len(institutions[1]['rows']) == 10 and institutions[1]['rows'][0] == {'institution': 'MIT', 'author_name': 'Author 1'}
+    assert topics[1]['rows'] == [{'category': c, 'arxiv_id': p} for p in ('p0', 'p1') for c in ('cs.IR', 'cs.CL')]
+
+def test_add_paper_without_authors_sends_one_statement(graph):
+    graph.add_paper(dict(paper(0, n_authors=0), categories=[]))
+    (statement,), = graph.driver.transactions
+    assert 'MERGE (p:Paper {arxiv_id: row.arxiv_id})' in statement[0]
+
+def test_add_citations(graph):
+    stats = graph.add_citations([('p0', 'p1'), ('p0', 'p2', 'see [2]'), ('p1', 'p2')], batch_size=10)
+    assert stats == {'citations': 3, 'batches': 1, 'seconds': stats['seconds'], 'per_second': stats['per_second']}
+    (statement,), = graph.driver.transactions
+    assert statement[1]['rows'] == [
+        {'citing_id': 'p0', 'cited_id': 'p1', 'context': ''},
+        {'citing_id': 'p0', 'cited_id': 'p2', 'context': 'see [2]'},
+        {'citing_id': 'p1', 'cited_id': 'p2', 'context': ''},
+    ]
+    graph.add_citation('p2', 'p0')
+    assert len(graph.driver.transactions) == 2
+
+def test_author_lookup_indexes_and_backfill(graph):
+    assert any('FULLTEXT INDEX author_names' in q for q in graph.driver.statements)
+    assert any('ON (a.name_normalized)' in q for q in graph.driver.statements)
+    graph.driver.unnormalized = ['José  García', 'Ada']
+    stats = graph.backfill_normalized_names()
+    assert stats['authors'] == 2 and stats['batches'] == 1
+    (statement,), = graph.driver.transactions
+    assert statement[1]['rows'] == [{'name': 'José  García', 'name_normalized': 'jose garcia'},
+                                    {'name': 'Ada', 'name_normalized': 'ada'}]
@@ -0,0 +1,67 @@
+import json
+import pickle
+import pytest
+from storage.metadata_store import MetadataStore, write_metadata_store, convert, arxiv_key
+
+PAPERS = [
+    {'arxiv_id': '2401.00001v1', 'title': 'First', 'abstract': 'Alpha'},
+    {'arxiv_id': '2401.00002v2', 'title': 'Second', 'abstract': 'Beta é'},
+    {'arxiv_id': 'cs/9308101v1', 'title': 'Third', 'abstract': 'Gamma'},
+]
+
+def test_roundtrip_and_lookups(tmp_path):
+    path = str(tmp_path / 'meta.cmeta')
+    assert write_metadata_store(path, iter(PAPERS)) == 3
+    store = MetadataStore(path)
+    assert len(store) == 3
+    assert store[1] == PAPERS[1]
+    assert store.get(3) is None
+    assert store.arxiv_id(2) == 'cs/9308101v1'
+    assert store.position_of('2401.00002v1') == 1
+    assert store.position_of('9999.99999') is None
+    with pytest.raises(IndexError):
+        store[5]
+    store.close()
+
+def test_extend_and_save(tmp_path):
+    path = str(tmp_path / 'meta.cmeta')
+    store = MetadataStore(path)
+    store.extend(PAPERS[:2])
+    assert store[1]['title'] == 'Second'
+    store.save()
+    store.extend(PAPERS[2:])
+    store.save()
+    reopened = MetadataStore(path)
+    assert [r['title'] for r in reopened] == ['First', 'Second', 'Third']
+    store.close()
+    reopened.close()
+
+@pytest.mark.parametrize('fmt', ['json', 'pkl'])
+def test_convert_legacy_files(tmp_path, fmt):
+    src = tmp_path / f'meta.{fmt}'
+    if fmt == 'json':
+        src.write_text(json.dumps(PAPERS), encoding='utf-8')
+    else:
+        src.write_bytes(pickle.dumps(PAPERS))
+    dst = str(tmp_path / 'meta.cmeta')
+    assert convert(str(src), dst) == 3
+    assert list(MetadataStore(dst)) == PAPERS
+
+def test_arxiv_key_ignores_version():
+    assert arxiv_key('2401.00001v1') == arxiv_key('2401.00001v3') == arxiv_key('2401.00001')
+    assert arxiv_key('2401.00001') != arxiv_key('2401.00002')
+    assert arxiv_key('2401.00001') >= 0
+
+def test_keyed_store_overlays_snapshot(tmp_path):
+    from storage.metadata_store import KeyedMetadataStore
+    path = str(tmp_path / 'meta.cmeta')
+    write_metadata_store(path, PAPERS)
+    store = KeyedMetadataStore(MetadataStore(path))
+    store.upsert([{'arxiv_id': '2401.00001v2', 'title': 'First revised'}])
+    assert store.delete([arxiv_key('cs/9308101')]) == 1
+    assert len(store) == 2
+    assert store.get(arxiv_key('2401.00001'))['title'] == 'First revised'
+    assert arxiv_key('cs/9308101') not in store
+    store.save(path)
+    assert sorted(r['title'] for r in store) == ['First revised', 'Second']
+    store.close()
@@ -0,0 +1,73 @@
+import numpy as np
+import faiss
+import pytest
+
+pytest.importorskip('onnxruntime')
+pytest.importorskip('onnx')
+from embeddings.onnx_backend import OnnxEncoder, export_onnx, load_embedding_model, parity_check
+
+WORDS = ('the a of graph neural network learning model data search retrieval paper language '
+         'attention transformer vector index query').split()
+
+@pytest.fixture(scope='module')
+def tiny_model(tmp_path_factory):
+    """A randomly initialised 2-layer BERT wrapped as a SentenceTransformer, so no download is needed."""
+    import torch
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+    from sentence_transformers import SentenceTransformer, models
+    root = tmp_path_factory.mktemp('tiny')
+    vocab = root / 'vocab.txt'
+    vocab.write_text('\n'.join(['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + WORDS))
+    torch.manual_seed(0)
+    bert = BertModel(BertConfig(vocab_size=len(WORDS) + 5, hidden_size=32, num_hidden_layers=2,
+                                num_attention_heads=2, intermediate_size=64, max_position_embeddings=64))
+    bert.save_pretrained(root / 'bert')
+    BertTokenizerFast(str(vocab)).save_pretrained(root / 'bert')
+    st = SentenceTransformer(modules=[models.Transformer(str(root / 'bert'), max_seq_length=32),
+                                      models.Pooling(32, 'mean'), models.Normalize()])
+    st.save(str(root / 'st'))
+    export_onnx(str(root / 'st'), str(root / 'onnx'))
+    return SentenceTransformer(str(root / 'st')), str(root / 'onnx')
+
+def sentences(n):
+    rng = np.random.default_rng(0)
+    return [' '.join(rng.choice(WORDS, size=rng.integers(1, 12))) for _ in range(n)]
+
+def test_onnx_matches_pytorch(tiny_model):
+    st, onnx_dir = tiny_model
+    encoder = OnnxEncoder(onnx_dir, quantized=False)
+    assert encoder.variant == 'onnx'
+    assert encoder.get_sentence_embedding_dimension() == 32
+    corpus = st.encode(sentences(200))
+    index = faiss.IndexFlatL2(32)
+    index.add(corpus)
+    result = parity_check(st, encoder, sentences(50), index, k=5)
+    assert result['min_cosine'] > 0.9999
+    assert result['overlap'] > 0.99
+
+def test_int8_model_stays_close(tiny_model):
+    st, onnx_dir = tiny_model
+    encoder = load_embedding_model('unused', backend='onnx', onnx_dir=onnx_dir)
+    assert encoder.variant == 'onnx-int8'
+    result = parity_check(st, encoder, sentences(50))
+    assert result['mean_cosine'] > 0.95
+
+def test_vector_retriever_onnx_backend(tiny_model, tmp_path):
+    from retrievers.vector_retriever import VectorRetriever
+    st, onnx_dir = tiny_model
+    index = faiss.IndexFlatL2(32)
+    index.add(st.encode(sentences(20)))
+    faiss.write_index(index, str(tmp_path / 'faiss.index'))
+    retriever = VectorRetriever(str(tmp_path / 'faiss.index'), backend='onnx', onnx_dir=onnx_dir, onnx_quantized=False)
+    assert retriever.cache_name.endswith('#onnx')
+    assert VectorRetriever(str(tmp_path / 'faiss.index'), backend='onnx', onnx_dir=onnx_dir).cache_name.endswith('#onnx-int8')
+    # Without the int8 file the fp32 model is loaded, and its vectors must not be cached as int8 ones
+    import shutil
+    from embeddings.onnx_backend import QUANTIZED_MODEL_FILE
+    fp32_dir = shutil.copytree(onnx_dir, tmp_path / 'fp32-only')
+    (fp32_dir / QUANTIZED_MODEL_FILE).unlink()
+    assert VectorRetriever(str(tmp_path / 'faiss.index'), backend='onnx', onnx_dir=str(fp32_dir)).cache_name.endswith('#onnx')
+    query = sentences(20)[3]
+    assert retriever.retrieve(query, top_k=1)[0]['index'] == 3
+    with pytest.raises(ValueError):
+        VectorRetriever(str(tmp_path / 'faiss.index'), backend='tensorrt')
@@ -0,0 +1,115 @@
+import pytest
+from unittest.mock import patch
+from orchestrator import Orchestrator
+
+class DummyVectorRetriever:
+    def __init__(self, *args, **kwargs):
+        self.batches = []
+    def retrieve(self, query, top_k=5):
+        return self.retrieve_many([query], top_k=top_k)[0]
+    def retrieve_many(self, queries, top_k=5):
+        self.batches.append(list(queries))
+        return [[{"index": i, "score": 0.1, "metadata": {"title": q}}] for i, q in enumerate(queries)]
+
+class DummyKeywordRetriever:
+    def __init__(self, *args, **kwargs):
+        self.batches = []
+    def retrieve(self, query, top_k=5):
+        return [{"id": query, "score": 1.0, "source": {"title": query}}]
+    def retrieve_many(self, queries, top_k=5):
+        self.batches.append(list(queries))
+        return [self.retrieve(query, top_k=top_k) for query in queries]
+
+class DummyBackend:
+    def __init__(self, *args, **kwargs):
+        pass
+    def retrieve(self, query, parameters=None):
+        return [{"query": query}]
+    def papers_by_author(self, author, limit=10):
+        return [{"query": author}]
+    def run(self, name, **parameters):
+        return [{"query": name, **parameters}]
+
+@patch('orchestrator.DatabaseRetriever', new=DummyBackend)
+@patch('orchestrator.GraphRetriever', new=DummyBackend)
+@patch('orchestrator.KeywordRetriever', new=DummyKeywordRetriever)
+@patch('orchestrator.VectorRetriever', new=DummyVectorRetriever)
+def test_process_queries_batches_vector_search():
+    orchestrator = Orchestrator({}, {}, {}, {})
+    results = orchestrator.process_queries(["q1", "q2"], top_k=3)
+    assert orchestrator.vector.batches == [["q1", "q2"]]
+    assert orchestrator.keyword.batches == [["q1", "q2"]]
+    assert len(results) == 2
+    assert results[1]["vector"][0]["metadata"]["title"] == "q2"
+    assert results[1]["keyword"][0]["id"] == "q2"
+
+class AsyncDummyBackend(DummyBackend):
+    """Backend whose aretrieve only returns once every backend of the query has started."""
+    started = []
+    async def aretrieve(self, query, parameters=None, top_k=5):
+        import asyncio
+        AsyncDummyBackend.started.append(query)
+        while len(AsyncDummyBackend.started) < 2:
+            await asyncio.sleep(0)
+        return [{"query": query}]
+    async def apapers_by_author(self, author, limit=10):
+        return await self.aretrieve(author)
+    async def arun(self, name, **parameters):
+        return await self.aretrieve(" ".join(map(str, [name, *parameters.values()])))
+    async def aconnect(self):
+        pass
+    async def aclose(self):
+        pass
+
+class AsyncDummyKeywordRetriever(DummyKeywordRetriever):
+    async def aretrieve(self, query, top_k=5):
+        return self.retrieve(query, top_k=top_k)
+    async def aconnect(self):
+        pass
+    async def aclose(self):
+        pass
+
+@patch('orchestrator.DatabaseRetriever', new=AsyncDummyBackend)
+@patch('orchestrator.GraphRetriever', new=AsyncDummyBackend)
+@patch('orchestrator.KeywordRetriever', new=AsyncDummyKeywordRetriever)
+@patch('orchestrator.VectorRetriever', new=DummyVectorRetriever)
+def test_aprocess_query_awaits_backends_concurrently():
+    import asyncio
+    AsyncDummyBackend.started = []
+    orchestrator = Orchestrator({}, {}, {}, {})
+
+    async def run():
+        await orchestrator.aconnect()
+        author = await asyncio.wait_for(orchestrator.aprocess_query("author: Lewis", query_type="author"), timeout=5)
+        default = await orchestrator.aprocess_query("rag", top_k=3)
+        await orchestrator.aclose()
+        return author, default
+
+    author, default = asyncio.run(run())
+    assert set(author) == {"graph", "database"}
+    assert "Lewis" in author["graph"][0]["query"] and "Lewis" in author["database"][0]["query"]
+    assert default == orchestrator.process_query("rag", top_k=3)
+
+@patch('orchestrator.DatabaseRetriever', new=DummyBackend)
+@patch('orchestrator.GraphRetriever', new=DummyBackend)
+@patch('orchestrator.KeywordRetriever', new=DummyKeywordRetriever)
+@patch('orchestrator.VectorRetriever', new=DummyVectorRetriever)
+def test_process_query_routes_database_queries():
+    orchestrator = Orchestrator({}, {}, {}, {})
+    author = orchestrator.process_query("author: O'Brien", query_type="author")
+    assert author["database"] == author["graph"] == [{"query": "O'Brien"}]
+    recent = orchestrator.process_query("new rag papers", query_type="recent")
+    assert recent["database"] == [{"query": "recent_papers", "limit": 10}]
+
+class DummyDatabase(DummyBackend):
+    def search(self, query, top_k=5, source_fields=None):
+        return [{"score": 1.0, "id": query, "source": {"fields": source_fields}}]
+
+@patch('orchestrator.DatabaseRetriever', new=DummyDatabase)
+@patch('orchestrator.GraphRetriever', new=DummyBackend)
+@patch('orchestrator.KeywordRetriever', side_effect=AssertionError("Elasticsearch client created"))
+@patch('orchestrator.VectorRetriever', new=DummyVectorRetriever)
+def test_keyword_backend_postgres_routes_to_database_full_text(_):
+    orchestrator = Orchestrator({}, {}, {}, {"backend": "postgres", "source_fields": ["title"]})
+    results = orchestrator.process_query("rag", top_k=3)
+    assert results["keyword"] == [{"score": 1.0, "id": "rag", "source": {"fields": ["title"]}}]
@@ -0,0 +1,115 @@
+import csv
+import pytest
+from types import SimpleNamespace
+from storage.pg_bulk_loader import PostgresBulkLoader, STAGING_TABLES, TARGET_TABLES
+
+class RecordingCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = -1
+    def execute(self, statement, params=None):
+        self.conn.statements.append(' '.join(statement.split()))
+        self.rowcount = 7
+    def copy_expert(self, statement, f):
+        self.conn.statements.append(statement)
+        self.conn.copied[statement.split()[1]] = list(csv.reader(f))
+    def fetchall(self):
+        return self.conn.indexes
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+class RecordingConnection:
+    def __init__(self, indexes=()):
+        self.statements, self.copied, self.indexes = [], {}, list(indexes)
+        self.committed = self.rolled_back = False
+    def cursor(self):
+        return RecordingCursor(self)
+    def commit(self):
+        self.committed = True
+    def rollback(self):
+        self.rolled_back = True
+    def close(self):
+        pass
+
+class RecordingEngine:
+    dialect = SimpleNamespace(name='postgresql', driver='psycopg2')
+    def __init__(self, **kwargs):
+        self.connections = []
+        self.kwargs = kwargs
+    def raw_connection(self):
+        self.connections.append(RecordingConnection(**self.kwargs))
+        return self.connections[-1]
+
+PAPERS = [
+    {'arxiv_id': 'p0', 'title': 'RAG, revisited', 'abstract': 'Line one\nline two', 'publication_date': '2024-01-01',
+     'primary_category': 'cs.IR', 'categories': ['cs.IR', 'cs.CL'],
+     'authors': [{'full_name': 'José García', 'affiliation': 'MIT'}, {'full_name': 'Ada'}]},
+    {'arxiv_id': 'p1', 'title': 'Plain record', 'abstract': None, 'authors': ['Ada']},
+]
+
+def test_stage_writes_one_csv_per_staging_table():
+    loader = PostgresBulkLoader(engine=RecordingEngine())
+    staged = loader.stage(PAPERS, [('p0', 'p1'), ('p1', 'p0', 'see [1]')])
+    assert set(staged) == set(STAGING_TABLES)
+    rows = {table: list(csv.reader(f)) for table, (f, _) in staged.items()}
+    assert {table: n for table, (_, n) in staged.items()} == {table: len(r) for table, r in rows.items()}
+    assert rows['stage_papers'] == [['p0', 'RAG, revisited', 'Line one\nline two', '', '2024-01-01', 'cs.IR'],
+                                     ['p1', 'Plain record', '', '', '', '']]
+    assert rows['stage_paper_authors'] == [['p0', 'José García', 'jose garcia', 'MIT', '0'],
+                                           ['p0', 'Ada', 'ada', '', '1'], ['p1', 'Ada', 'ada', '', '0']]
+    assert rows['stage_paper_topics'] == [['p0', 'cs.IR'], ['p0', 'cs.CL']]
+    assert rows['stage_citations'] == [['p0', 'p1', '', ''], ['p1', 'p0', 'see [1]', '']]
+
+def test_load_copies_then_upserts_in_one_transaction():
+    engine = RecordingEngine()
+    stats = PostgresBulkLoader(engine=engine).load(PAPERS, [('p0', 'p1')])
+    load, = engine.connections
+    assert load.committed and not load.rolled_back
+    copies = [s for s in load.statements if s.startswith('COPY')]
+    assert copies == [f'COPY {table} FROM STDIN WITH (FORMAT csv)' for table in STAGING_TABLES]
+    inserts = [s.split()[2] for s in load.statements if s.startswith('INSERT INTO')]
+    assert inserts == list(TARGET_TABLES)
+    assert not any(s.startswith('DROP INDEX') for s in load.statements)  # small load keeps its indexes
+    assert stats['copy']['stage_papers']['rows'] == 2 and stats['tables']['papers']['rows'] == 7
+    assert stats['tables']['citations']['per_second'] > 0
+    assert load.statements[-len(TARGET_TABLES):] == [f'ANALYZE {table}' for table in TARGET_TABLES]
+
+def test_large_load_drops_and_rebuilds_secondary_indexes():
+    index = ('ix_papers_category', 'CREATE INDEX ix_papers_category ON public.papers USING btree (category)')
+    engine = RecordingEngine(indexes=[index])
+    stats = PostgresBulkLoader(engine=engine, defer_indexes_over=2).load(PAPERS)
+    statements = engine.connections[0].statements
+    dropped = statements.index('DROP INDEX "ix_papers_category"')
+    assert dropped < statements.index(next(s for s in statements if s.startswith('INSERT INTO papers')))
+    assert statements.index(index[1]) > statements.index(next(s for s in statements if s.startswith('INSERT INTO citations')))
+    assert stats['indexes']['rebuilt'] == ['ix_papers_category']
+
+def test_loader_requires_psycopg2_postgres():
+    with pytest.raises(ValueError):
+        PostgresBulkLoader('sqlite://')
+
+def test_setup_database_migrates_legacy_papers_table(tmp_path):
+    from sqlalchemy import create_engine, inspect, text
+    from storage.db_setup import setup_database
+    db_url = f"sqlite:///{tmp_path / 'legacy.db'}"
+    with create_engine(db_url).begin() as conn:
+        conn.execute(text("CREATE TABLE papers (arxiv_id TEXT PRIMARY KEY, title TEXT, abstract TEXT)"))
+        conn.execute(text("INSERT INTO papers VALUES ('p0', 'RAG', 'A'), ('p1', NULL, NULL)"))
+    engine = setup_database(db_url)
+    assert {'id', 'full_text', 'category'} <= {c['name'] for c in inspect(engine).get_columns('papers')}
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT arxiv_id, title, abstract FROM papers ORDER BY arxiv_id")).fetchall()
+        assert [tuple(row) for row in rows] == [('p0', 'RAG', 'A'), ('p1', '', None)]
+        assert conn.execute(text("SELECT count(*) FROM papers_legacy")).scalar() == 2
+    setup_database(db_url)  # already migrated: nothing to do
+
+def test_setup_database_rejects_unknown_papers_table(tmp_path):
+    from sqlalchemy import create_engine, text
+    from storage.db_setup import setup_database
+    db_url = f"sqlite:///{tmp_path / 'other.db'}"
+    with create_engine(db_url).begin() as conn:
+        conn.execute(text("CREATE TABLE papers (doi TEXT PRIMARY KEY)"))
+    with pytest.raises(RuntimeError, match="cannot be migrated"):
+        setup_database(db_url)
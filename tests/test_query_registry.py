@@ -0,0 +1,35 @@
+import pytest
+from retrievers.query_registry import QueryRegistry, NamedQuery, QUERIES
+
+def test_positional_numbers_each_parameter_once():
+    query = NamedQuery('q', 'sql', "SELECT * FROM t WHERE a = :a AND b::text = :b OR c = :a AND d = '12:30'")
+    text, names = query.positional()
+    assert text == "SELECT * FROM t WHERE a = $1 AND b::text = $2 OR c = $1 AND d = '12:30'"
+    assert names == ['a', 'b']
+
+def test_registry_lookup_and_stats():
+    registry = QueryRegistry()
+    cypher = registry.register('papers', 'cypher', """
+        MATCH (p:Paper)
+        RETURN p LIMIT $limit
+    """)
+    registry.register('papers', 'sql', 'SELECT * FROM papers LIMIT :limit')
+    assert cypher.text == 'MATCH (p:Paper) RETURN p LIMIT $limit'
+    assert registry.get('sql', 'papers').text == 'SELECT * FROM papers LIMIT :limit'
+    with pytest.raises(KeyError):
+        registry.get('cypher', 'missing')
+    with pytest.raises(ValueError):
+        registry.register('bad', 'gremlin', 'g.V()')
+    for rows in (3, 5):
+        with registry.timed(cypher) as timer:
+            timer.rows = rows
+    stats = registry.stats()['cypher:papers']
+    assert stats['calls'] == 2 and stats['rows'] == 8
+    assert stats['mean_ms'] == pytest.approx(stats['total_ms'] / 2)
+    registry.reset_stats()
+    assert registry.stats() == {}
+
+def test_builtin_queries_take_only_parameters():
+    assert {'author_papers', 'collaborators', 'related_papers_2', 'neighbourhood_3'} <= set(QUERIES.names('cypher'))
+    assert QUERIES.names('sql') == ['author_papers', 'author_papers_prefix', 'fulltext_papers', 'recent_papers']
+    assert 'full_text' not in QUERIES.get('sql', 'fulltext_papers').text.split('WHERE')[0]
@@ -0,0 +1,107 @@
+from storage.search_engine import SearchEngine
+
+def answer(body):
+    """Stub search answer echoing which kind of query was sent."""
+    query = body['query']
+    if 'nested' in query:
+        name = query['nested']['query']['match']['authors.full_name']
+        return {'hits': {'hits': [{'_score': 2.0, '_source': {'arxiv_id': f'author:{name}'}}]}}
+    if 'should' in query['bool']:
+        topic = query['bool']['should'][0]['term']['topics']
+        if topic == 'missing':
+            return {'error': {'type': 'index_not_found_exception'}, 'status': 404}
+        return {'hits': {'hits': [{'_score': 1.5, '_source': {'arxiv_id': f'topic:{topic}'}}]}}
+    text = query['bool']['must'][0]['multi_match']['query']
+    return {'hits': {'hits': [
+        {'_score': 1.0, '_source': {'arxiv_id': f'text:{text}'}, 'highlight': {'title': [f'<strong>{text}</strong>']}}
+    ]}}
+
+def msearch_requests(stub_es):
+    return [lines for method, path, lines in stub_es.requests if path.endswith('/_msearch')]
+
+def test_batched_variants_use_one_round_trip(stub_es):
+    stub_es.handler = answer
+    engine = SearchEngine([stub_es.url], index_name='papers')
+
+    results = engine.search_many(['rag', 'gnn'], filters={'primary_category': 'cs.CL'}, size=3)
+    assert [r[0]['arxiv_id'] for r in results] == ['text:rag', 'text:gnn']
+    assert results[0][0]['highlights'] == {'title': ['<strong>rag</strong>']}
+    lines, = msearch_requests(stub_es)
+    assert lines[0] == {'index': 'papers'}
+    assert lines[1]['size'] == 3
+    assert lines[1]['query']['bool']['filter'] == [{'term': {'primary_category': 'cs.CL'}}]
+
+    assert engine.search_by_authors(['Lewis', 'Vaswani']) == [
+        [{'arxiv_id': 'author:Lewis', 'score': 2.0}], [{'arxiv_id': 'author:Vaswani', 'score': 2.0}]]
+    assert engine.search_by_topics(['cs.IR', 'missing']) == [[{'arxiv_id': 'topic:cs.IR', 'score': 1.5}], []]
+    assert len(msearch_requests(stub_es)) == 3
+
+def test_multi_search_mixes_intents_and_matches_single_searches(stub_es):
+    stub_es.handler = answer
+    engine = SearchEngine([stub_es.url], index_name='papers')
+    batched = engine.multi_search([('text', {'query': 'rag'}), ('author', {'author_name': 'Lewis'}),
+                                   ('topic', {'topic': 'cs.IR', 'size': 5})])
+    assert len(msearch_requests(stub_es)) == 1
+    assert batched == [engine.search('rag'), engine.search_by_author('Lewis'), engine.search_by_topic('cs.IR', size=5)]
+    assert engine.multi_search([]) == []
+
+def make_papers(n, text_size=0):
+    for i in range(n):
+        yield {'arxiv_id': f'p{i}', 'title': f'Paper {i}', 'abstract': 'A', 'publication_date': '2024-01-01',
+               'primary_category': 'cs.IR', 'full_text': 'x' * text_size}
+
+def test_bulk_index_streams_chunks_and_reports_failures(stub_es):
+    stub_es.reject = lambda doc_id, source: {'type': 'mapper_parsing_exception'} if doc_id == 'p7' else None
+    stub_es.settings['refresh_interval'] = '5s'
+    engine = SearchEngine([stub_es.url], index_name='papers')
+
+    # A generator is consumed lazily; ~2 KB documents with a 5 KB limit give several bulk requests
+    report = engine.bulk_index_papers(make_papers(20, text_size=2000), thread_count=2, max_chunk_bytes=5000)
+    assert report['indexed'] == 19
+    assert report['failed'] == [{'id': 'p7', 'status': 400, 'error': {'type': 'mapper_parsing_exception'}}]
+    assert len(stub_es.documents) == 19 and stub_es.documents['p0']['full_text'] == 'x' * 2000
+
+    calls = [(method, path) for method, path, _ in stub_es.requests if method != 'HEAD']
+    bulk_calls = [i for i, call in enumerate(calls) if call[1] == '/_bulk']
+    assert len(bulk_calls) > 2
+    # Refresh is switched off before the first bulk request and restored, then refreshed once, after the last
+    puts = [body for method, path, body in stub_es.requests if path.endswith('/_settings') and method == 'PUT']
+    assert puts == [{'index': {'refresh_interval': '-1'}}, {'index': {'refresh_interval': '5s'}}]
+    assert calls.index(('PUT', '/papers/_settings')) < bulk_calls[0]
+    assert calls[-1] == ('POST', '/papers/_refresh') and calls.count(('POST', '/papers/_refresh')) == 1
+    assert stub_es.settings == {'refresh_interval': '5s'}
+
+def test_bulk_index_restores_default_refresh_interval(stub_es):
+    engine = SearchEngine([stub_es.url], index_name='papers')
+    assert engine.bulk_index_papers(make_papers(3)) == {'indexed': 3, 'failed': []}
+    puts = [body for method, path, body in stub_es.requests if path.endswith('/_settings') and method == 'PUT']
+    assert puts[-1] == {'index': {'refresh_interval': None}}
+    assert stub_es.settings == {}
+
+def test_lean_mode_limits_source_and_highlights(stub_es):
+    from storage.search_engine import LEAN_SOURCE_FIELDS
+    stub_es.handler = answer
+    engine = SearchEngine([stub_es.url], index_name='papers', source_fields=LEAN_SOURCE_FIELDS, highlight_fragments=1)
+
+    engine.search('rag', size=5, search_after=[1.0, '2401.00001'])
+    body = stub_es.requests[-1][2]
+    assert body['_source'] == {'includes': LEAN_SOURCE_FIELDS}
+    assert 'full_text' not in LEAN_SOURCE_FIELDS
+    assert body['highlight']['fields']['full_text'] == {'fragment_size': 150, 'number_of_fragments': 1}
+    assert body['search_after'] == [1.0, '2401.00001']
+    assert body['sort'] == [{'_score': 'desc'}, {'arxiv_id': 'asc'}]
+
+    results = engine.search('rag', highlight=False)
+    assert 'highlight' not in stub_es.requests[-1][2]
+    assert 'highlights' not in results[0]
+    engine.search_by_author('Lewis')
+    assert stub_es.requests[-1][2]['_source'] == {'includes': LEAN_SOURCE_FIELDS}
+
+    # The search_after cursor stays out of the paper documents
+    stub_es.handler = lambda body: {'hits': {'hits': [
+        {'_score': 1.0, '_source': {'arxiv_id': a}, 'sort': [1.0, a]} for a in ('2401.00002', '2401.00003')]}}
+    page = engine.search('rag', highlight=False)
+    assert page == [{'arxiv_id': '2401.00002', 'score': 1.0}, {'arxiv_id': '2401.00003', 'score': 1.0}]
+    assert page.next_search_after == [1.0, '2401.00003']
+    engine.search('rag', search_after=page.next_search_after)
+    assert stub_es.requests[-1][2]['search_after'] == [1.0, '2401.00003']
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from embeddings.cache import EmbeddingCache
+from storage.sharded_store import ShardedVectorStore, merge_top_k
+from storage.vector_store import VectorStore
+from tests.test_vector_store import DummyModel
+
+@pytest.fixture(autouse=True)
+def dummy_model(monkeypatch):
+    monkeypatch.setattr('storage.vector_store.SentenceTransformer', DummyModel)
+
+def records(n):
+    return [{'arxiv_id': f'2401.{i:05d}', 'title': f'T{i}', 'publication_date': f'{2020 + i % 5}-03-01'} for i in range(n)]
+
+def vectors(n):
+    return np.random.default_rng(0).standard_normal((n, 8)).astype('float32')
+
+def test_merge_top_k_is_exact():
+    D, I, S = merge_top_k([np.array([[0.1, 0.5]]), np.array([[0.2, np.inf]])],
+                          [np.array([[1, 2]]), np.array([[3, -1]])], 3)
+    assert I.tolist() == [[1, 3, 2]]
+    assert S.tolist() == [[0, 1, 0]]
+
+def test_sharded_search_matches_single_store(tmp_path):
+    xb = vectors(60)
+    single = VectorStore(index_path=str(tmp_path / 'one.index'), metadata_path=str(tmp_path / 'one.cmeta'), cache=EmbeddingCache())
+    single.upsert_embeddings(xb, records(60))
+    sharded = ShardedVectorStore(str(tmp_path / 'shards'), n_shards=3, cache=EmbeddingCache())
+    sharded.upsert_embeddings(xb, records(60))
+    assert len(sharded) == 60
+    assert all(len(shard.metadata) > 0 for shard in sharded.shards)
+    D_ref, I_ref = single.search_vectors(xb[:5], 7)
+    D, I, _ = sharded.search_vectors(xb[:5], 7)
+    assert np.array_equal(I, I_ref)
+    assert np.allclose(D, D_ref)
+    sharded.close()
+
+def test_time_shards_prune_and_move(tmp_path):
+    store = ShardedVectorStore(str(tmp_path / 'shards'), shard_by='time', time_boundaries=['2022-01-01', '2024-01-01'],
+                               cache=EmbeddingCache())
+    assert store.n_shards == 3
+    store.upsert_embeddings(vectors(20), records(20))
+    assert store._shards_for_dates('2024-02-01', None) == [2]
+    _, I, S = store.search_vectors(vectors(20)[:1], 20, date_from='2024-01-01')
+    assert set(S[0][I[0] >= 0]) == {2}
+    moved = dict(records(1)[0], publication_date='2025-01-01')
+    store.upsert_embeddings(vectors(1), [moved])
+    assert len(store) == 20
+    assert [r['publication_date'] for r in store.shards[2].metadata].count('2025-01-01') == 1
+    store.close()
+
+def test_rebuild_shard_and_reopen(tmp_path):
+    base = str(tmp_path / 'shards')
+    store = ShardedVectorStore(base, n_shards=2, cache=EmbeddingCache())
+    xb = vectors(30)
+    store.upsert_embeddings(xb, records(30))
+    store.save()
+    _, before, _ = store.search_vectors(xb[:3], 5)
+    store.rebuild_shard(1, index_type='fp16')
+    _, after, _ = store.search_vectors(xb[:3], 5)
+    assert np.array_equal(before, after)
+
+    # A rebuild that dies part-way leaves the shard's files in place
+    def killed(*args, **kwargs):
+        raise RuntimeError('killed')
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(VectorStore, 'upsert_embeddings', killed)
+        with pytest.raises(RuntimeError):
+            store.rebuild_shard(0, index_type='sq8')
+    store.close()
+    survivor = ShardedVectorStore(base, n_shards=2, cache=EmbeddingCache())
+    assert len(survivor.shards[0].metadata) == len(store.shards[0].metadata) > 0
+    survivor.close()
+    reopened = ShardedVectorStore(base, n_shards=8, cache=EmbeddingCache())
+    assert reopened.n_shards == 2
+    assert len(reopened) == 30
+    with pytest.raises(ValueError):
+        reopened.rebuild_shard(0, ['text'], [r for r in records(30) if reopened.shard_for(r) == 1][:1])
+    reopened.close()
@@ -23,3 +23,51 @@ def test_vector_retriever_retrieve(monkeypatch):
     results = retriever.retrieve('test', top_k=2)
     assert len(results) == 2
     assert results[0]['metadata']['title'] == 'Test Paper 1'
+
+def test_vector_retriever_retrieve_many(monkeypatch):
+    class DummyIndex:
+        def search(self, x, k):
+            assert x.shape[0] == 3
+            return np.array([[0.9, 0.8]] * 3), np.array([[1, 2], [2, -1], [1, 2]])
+    monkeypatch.setattr('faiss.read_index', lambda path: DummyIndex())
+    monkeypatch.setattr('sentence_transformers.SentenceTransformer', lambda name: type('DummyModel', (), {'encode': lambda self, x: np.zeros((len(x), 768))})())
+    retriever = VectorRetriever('dummy.index')
+    retriever.metadata = {1: {'title': 'Test Paper 1'}, 2: {'title': 'Test Paper 2'}}
+    results = retriever.retrieve_many(['a', 'b', 'c'], top_k=2)
+    assert len(results) == 3
+    assert [r['index'] for r in results[0]] == [1, 2]
+    assert [r['index'] for r in results[1]] == [2]
+    assert results[2][1]['metadata']['title'] == 'Test Paper 2'
+    assert retriever.retrieve_many([], top_k=2) == []
+
+def test_vector_retriever_mmap_matches_in_memory():
+    import os
+    import faiss
+    index_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'faiss.index')
+    in_memory = faiss.read_index(index_path)
+    retriever = VectorRetriever(index_path, mmap=True)
+    assert retriever._model is None
+    assert retriever.index.ntotal == in_memory.ntotal
+    queries = in_memory.reconstruct_n(0, 3)
+    D_ref, I_ref = in_memory.search(queries, 4)
+    D, I = retriever.index.search(queries, 4)
+    assert np.array_equal(I, I_ref)
+    assert np.allclose(D, D_ref, atol=1e-4)
+
+def test_vector_retriever_filters_by_facets(tmp_path):
+    import json
+    import faiss
+    index = faiss.IndexFlatL2(4)
+    index.add(np.eye(4, dtype='float32'))
+    index_path = str(tmp_path / 'faiss.index')
+    faiss.write_index(index, index_path)
+    meta_path = str(tmp_path / 'meta.json')
+    with open(meta_path, 'w') as f:
+        json.dump([{'title': f'P{i}', 'primary_category': 'cs.AI' if i % 2 else 'cs.CL',
+                    'publication_date': f'202{i}-01-01'} for i in range(4)], f)
+    retriever = VectorRetriever(index_path, meta_path, mmap=True)
+    retriever.model = type('DummyModel', (), {'encode': lambda self, x, **kw: np.tile(np.eye(4, dtype='float32')[:1], (len(x), 1))})()
+    results = retriever.retrieve('q', top_k=4, primary_category='cs.AI')
+    assert [r['metadata']['title'] for r in results] == ['P1', 'P3']
+    results = retriever.retrieve('q', top_k=4, date_from='2022-01-01')
+    assert [r['metadata']['title'] for r in results] == ['P2', 'P3']
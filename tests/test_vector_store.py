@@ -0,0 +1,188 @@
+import os
+import pickle
+import pytest
+import numpy as np
+import faiss
+from storage.vector_store import VectorStore
+
+class DummyModel:
+    """Deterministic 8-d embeddings so nearest neighbours are predictable."""
+    def __init__(self, name):
+        pass
+    def get_sentence_embedding_dimension(self):
+        return 8
+    def encode(self, texts, show_progress_bar=False):
+        vectors = np.zeros((len(texts), 8), dtype='float32')
+        for i, text in enumerate(texts):
+            vectors[i, sum(map(ord, text)) % 8] = 1.0
+            vectors[i, 0] += len(text) / 100.0
+        return vectors
+
+@pytest.fixture
+def store_paths(tmp_path, monkeypatch):
+    monkeypatch.setattr('storage.vector_store.SentenceTransformer', DummyModel)
+    return str(tmp_path / 'store.index'), str(tmp_path / 'store.cmeta')
+
+def make_store(paths, **kwargs):
+    from embeddings.cache import EmbeddingCache
+    return VectorStore(index_path=paths[0], metadata_path=paths[1], cache=EmbeddingCache(), **kwargs)
+
+def test_upsert_replaces_by_arxiv_id(store_paths):
+    store = make_store(store_paths)
+    store.add_documents(['alpha', 'beta'], [{'arxiv_id': '2401.1v1', 'title': 'A'}, {'arxiv_id': '2401.2v1', 'title': 'B'}])
+    store.upsert(['alpha revised'], [{'arxiv_id': '2401.1v2', 'title': 'A2'}])
+    assert len(store.metadata) == 2
+    assert store.index.ntotal == 2
+    titles = {r['title'] for r in store.search('alpha revised', k=5)}
+    assert titles == {'A2', 'B'}
+
+def test_delete_and_log_replay(store_paths):
+    store = make_store(store_paths)
+    store.add_documents(['alpha', 'beta'], [{'arxiv_id': '1', 'title': 'A'}, {'arxiv_id': '2', 'title': 'B'}])
+    store.save()
+    store.delete(['2'])
+    store.upsert(['gamma'], [{'arxiv_id': '3', 'title': 'C'}])
+    # Not saved: a fresh store must rebuild the same state from snapshot + change log
+    reopened = make_store(store_paths)
+    assert sorted(r['title'] for r in reopened.metadata) == ['A', 'C']
+    assert reopened.index.ntotal == 2
+    reopened.save()
+    assert not os.path.exists(store_paths[0] + '.log')
+    assert sorted(r['title'] for r in make_store(store_paths).metadata) == ['A', 'C']
+
+def test_migrates_positional_index(store_paths, tmp_path):
+    index_path = str(tmp_path / 'legacy.index')
+    meta_path = str(tmp_path / 'legacy.pkl')
+    legacy = faiss.IndexFlatL2(8)
+    legacy.add(DummyModel(None).encode(['alpha', 'beta']))
+    faiss.write_index(legacy, index_path)
+    with open(meta_path, 'wb') as f:
+        pickle.dump([{'arxiv_id': '1', 'title': 'A'}, {'arxiv_id': '2', 'title': 'B'}], f)
+    store = make_store((index_path, meta_path))
+    assert isinstance(store.index, faiss.IndexIDMap2)
+    assert store.search('beta', k=1)[0]['title'] == 'B'
+    store.delete(['1'])
+    assert [r['title'] for r in store.search('alpha', k=2)] == ['B']
+
+def test_records_without_arxiv_id_get_stable_generated_ids(store_paths):
+    store = make_store(store_paths)
+    metadata = [{'title': 'no id'}]
+    store.add_documents(['alpha'], metadata)
+    store.add_documents(['alpha', 'beta'], [{'title': 'no id again'}, {'title': 'other'}])
+    assert metadata == [{'title': 'no id'}]  # caller's records are not modified
+    assert len(store.metadata) == 2
+    generated = store.search('alpha', k=1)[0]['arxiv_id']
+    assert generated.startswith('doc-')
+    # The id is recorded in the change log, so a reopened store keeps it
+    reopened = make_store(store_paths)
+    assert sorted(r['title'] for r in reopened.metadata) == ['no id again', 'other']
+    assert reopened.delete([generated]) == 1
+
+def test_ivf_delete_upsert_and_filtered_search_keep_keys_aligned(store_paths):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(60, 8)).astype('float32')
+    metadata = [{'arxiv_id': f'p{i}', 'title': f'T{i}', 'primary_category': 'cs.IR' if i % 2 else 'cs.CL'}
+                for i in range(60)]
+    store = make_store(store_paths, index_type='ivf_flat', nlist=4, nprobe=4, dimension=8)
+    store.upsert_embeddings(vectors, metadata)
+    store.delete(['p0', 'p1', 'p2'])
+    moved = rng.normal(size=8).astype('float32')
+    store.upsert_embeddings(moved.reshape(1, -1), [dict(metadata[10], title='T10b')])
+
+    def titles(s, vector, k=1, **filters):
+        distances, keys = s.search_vectors(vector.reshape(1, -1), k=k, **filters)
+        return [r['title'] for r in s.build_results(distances[0], keys[0])]
+
+    for s in (store, make_store(store_paths)):  # the second replays the change log
+        assert all(titles(s, vectors[i]) == [f'T{i}'] for i in range(3, 60) if i != 10)
+        assert titles(s, moved) == ['T10b']
+        assert titles(s, vectors[41], primary_category='cs.IR') == ['T41']
+        assert titles(s, vectors[42], primary_category='cs.IR')[0] != 'T42'
+        assert set(titles(s, vectors[5], k=30, primary_category='cs.CL')) <= {f'T{i}' for i in range(0, 60, 2)} | {'T10b'}
+    store.save()
+    reopened = make_store(store_paths)
+    assert titles(reopened, vectors[41], primary_category='cs.IR') == ['T41'] and titles(reopened, moved) == ['T10b']
+    from storage.metadata_store import arxiv_key
+    assert np.allclose(reopened.reconstruct([arxiv_key('p41'), arxiv_key('p10')]), np.vstack([vectors[41], moved]))
+
+def test_converts_idmap_wrapped_ivf_index(store_paths):
+    from storage.index_factory import build_index
+    from storage.metadata_store import arxiv_key, write_metadata_store
+    vectors = np.random.default_rng(1).normal(size=(40, 8)).astype('float32')
+    metadata = [{'arxiv_id': f'p{i}', 'title': f'T{i}'} for i in range(40)]
+    # Layout written by earlier versions: IDMap2 over IVF, then a removal that left id_map out of step
+    wrapped = faiss.IndexIDMap2(build_index(8, 'ivf_flat', nlist=4))
+    wrapped.train(vectors)
+    wrapped.add_with_ids(vectors, np.array([arxiv_key(r['arxiv_id']) for r in metadata], dtype='int64'))
+    wrapped.remove_ids(np.array([arxiv_key('p0'), arxiv_key('p1')], dtype='int64'))
+    faiss.write_index(wrapped, store_paths[0])
+    write_metadata_store(store_paths[1], metadata[2:])
+    store = make_store(store_paths, nprobe=4)
+    assert not isinstance(store.index, faiss.IndexIDMap2)
+    for i in (2, 20, 39):
+        distances, keys = store.search_vectors(vectors[i:i + 1], k=1)
+        assert store.build_results(distances[0], keys[0])[0]['title'] == f'T{i}'
+
+    # A row added after the removal reused an IVF row id: the mapping cannot be recovered
+    wrapped.add_with_ids(vectors[:1], np.array([arxiv_key('p0')], dtype='int64'))
+    faiss.write_index(wrapped, store_paths[0])
+    with pytest.raises(ValueError, match='rebuild'):
+        make_store(store_paths)
+
+def test_compressed_index_rescoring_survives_save(store_paths):
+    texts = [f'paper number {i}' for i in range(40)]
+    metadata = [{'arxiv_id': f'2401.{i:05d}', 'title': text} for i, text in enumerate(texts)]
+    store = make_store(store_paths, index_type='sq8', rescore=True)
+    store.add_documents(texts, metadata)
+    assert store.exact is not None
+    before = [r['title'] for r in store.search('paper number 7', k=3)]
+    store.save()
+    reopened = make_store(store_paths, rescore=True)
+    assert os.path.exists(store_paths[0] + '.exact.npy')
+    assert [r['title'] for r in reopened.search('paper number 7', k=3)] == before
+    assert before[0] == 'paper number 7'
+    reopened.delete(['2401.00007'])
+    assert 'paper number 7' not in [r['title'] for r in reopened.search('paper number 7', k=3)]
+
+def test_filtered_search_survives_upsert_and_reload(store_paths):
+    store = make_store(store_paths)
+    store.add_documents(['alpha', 'beta', 'gamma'], [
+        {'arxiv_id': '1', 'title': 'A', 'primary_category': 'cs.AI', 'publication_date': '2023-01-01'},
+        {'arxiv_id': '2', 'title': 'B', 'primary_category': 'cs.CL', 'publication_date': '2024-01-01'},
+        {'arxiv_id': '3', 'title': 'C', 'primary_category': 'cs.AI', 'publication_date': '2024-05-01'},
+    ])
+    assert {r['title'] for r in store.search('alpha', k=5, primary_category='cs.AI')} == {'A', 'C'}
+    store.upsert(['delta'], [{'arxiv_id': '4', 'title': 'D', 'primary_category': 'cs.AI', 'publication_date': '2024-07-01'}])
+    store.delete(['3'])
+    assert {r['title'] for r in store.search('alpha', k=5, primary_category='cs.AI')} == {'A', 'D'}
+    store.save()
+    reopened = make_store(store_paths)
+    assert reopened._facets is not None
+    assert [r['title'] for r in reopened.search('alpha', k=5, primary_category='cs.AI', date_from='2024-01-01')] == ['D']
+
+def test_opens_baseline_store_at_default_paths(tmp_path, monkeypatch):
+    from embeddings.cache import EmbeddingCache
+    monkeypatch.setattr('storage.vector_store.SentenceTransformer', DummyModel)
+    monkeypatch.chdir(tmp_path)
+    # Baseline layout: positional flat index plus pickled metadata list, at the default file names
+    legacy = faiss.IndexFlatL2(8)
+    legacy.add(DummyModel(None).encode(['alpha', 'beta', 'gamma']))
+    faiss.write_index(legacy, 'faiss_index_m.idx')
+    with open('faiss_metadata_m.pkl', 'wb') as f:
+        pickle.dump([{'arxiv_id': str(i), 'title': t} for i, t in enumerate('ABC')], f)
+
+    store = VectorStore(model_name='m', cache=EmbeddingCache())
+    assert store.metadata_path == 'faiss_metadata_m.pkl'
+    assert store.index.ntotal == 3 and len(store.metadata) == 3
+    store.save()
+    reopened = VectorStore(model_name='m', cache=EmbeddingCache())
+    assert reopened.index.ntotal == 3
+    assert sorted(r['title'] for r in reopened.metadata) == ['A', 'B', 'C']
+
+def test_refuses_to_replace_index_without_metadata(tmp_path, monkeypatch):
+    from embeddings.cache import EmbeddingCache
+    monkeypatch.setattr('storage.vector_store.SentenceTransformer', DummyModel)
+    monkeypatch.chdir(tmp_path)
+    faiss.write_index(faiss.IndexFlatL2(8), 'faiss_index_m.idx')
+    with pytest.raises(FileNotFoundError):
+        VectorStore(model_name='m', cache=EmbeddingCache())